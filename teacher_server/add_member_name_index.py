@@ -0,0 +1,54 @@
+"""
+为小组成员表添加姓名检索索引的数据库迁移脚本
+- 添加 name_initials（拼音首字母）字段并回填现有数据
+- 为 member_name、name_initials 创建索引
+
+运行方法：
+    python add_member_name_index.py
+
+注意：服务器启动时会自动执行同样的迁移，一般不需要手动运行；字段和索引已存在时自动跳过
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import create_app, db
+from app.services.member_service import ensure_member_name_index
+
+def migrate_database():
+    """执行数据库迁移"""
+    # 创建应用时已自动执行迁移，这里再执行一次以输出结果
+    app = create_app()
+
+    with app.app_context():
+        try:
+            count = ensure_member_name_index()
+            print("✓ 字段 name_initials 和索引已就绪")
+            print(f"✓ 已回填 {count} 条成员的拼音首字母")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ 数据库迁移失败: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("茶文化课程 - 数据库迁移脚本")
+    print("添加成员姓名检索索引")
+    print("=" * 60)
+    print()
+
+    success = migrate_database()
+
+    print()
+    if success:
+        print("✓ 迁移完成！教师端现在可以按姓名或拼音首字母快速查找学生。")
+    else:
+        print("✗ 迁移失败，请检查错误信息并重试。")
+    print()
+    sys.exit(0 if success else 1)
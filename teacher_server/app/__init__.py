@@ -37,6 +37,48 @@ def create_app(config_name=None):
     db.init_app(app)
     cors.init_app(app, resources={r"/api/*": {"origins": "*"}})
     
+    # 初始化响应缓存
+    from app.utils.cache import response_cache
+    response_cache.init_app(app)
+    
+    # 初始化导出文件缓存、PDF报告缓存和缩略图缓存
+    from app.utils.disk_cache import export_cache, pdf_cache, thumb_cache
+    export_cache.init_app(app.config['EXPORT_CACHE_FOLDER'], app.config['EXPORT_CACHE_MAX_BYTES'])
+    pdf_cache.init_app(app.config['PDF_CACHE_FOLDER'], app.config['PDF_CACHE_MAX_BYTES'])
+    thumb_cache.init_app(app.config['THUMB_CACHE_FOLDER'], app.config['THUMB_CACHE_MAX_BYTES'])
+    
+    # 照片存储（本机文件、打包文件或S3兼容对象存储）
+    from app.utils.photo_storage import photo_storage
+    photo_storage.init_app(app)
+    
+    # 初始化后台导出任务线程池
+    from app.services.job_service import job_manager
+    job_manager.init_app(app)
+    
+    # 批量PDF报告进程池（首次使用时创建）
+    from app.services.pdf_batch_service import pdf_batch
+    pdf_batch.init_app(app)
+    
+    # PDF报告后台预生成（可选）
+    from app.services.pdf_cache_service import pdf_prerenderer
+    pdf_prerenderer.init_app(app)
+    
+    # 注册数据变更捕获（写入 change_log）
+    from app.services.change_service import register_change_capture, get_latest_cursor
+    register_change_capture()
+    
+    # 响应缓存的数据版本取自变更日志（多进程、多台服务器部署时其他进程写入的数据也会使缓存失效）
+    from app.utils.cache import data_version
+    data_version.init_app(get_latest_cursor)
+    
+    # 照片文件与数据库事务同步（提交后删除被替换的旧照片，回滚后删除新写入的照片）
+    from app.services.photo_service import register_photo_file_cleanup
+    register_photo_file_cleanup()
+    
+    # 孤立照片定时回收
+    from app.services.photo_gc_service import photo_reconciler
+    photo_reconciler.init_app(app)
+    
     # 注册蓝图
     from app.routes.api import api_bp
     from app.routes.web import web_bp
@@ -47,6 +89,28 @@ def create_app(config_name=None):
     # 创建数据库表
     with app.app_context():
         db.create_all()
+        
+        # 旧数据库首次启用成员姓名检索时添加字段、索引并回填拼音首字母
+        from app.services.member_service import ensure_member_name_index
+        try:
+            count = ensure_member_name_index()
+            if count:
+                print(f"[成员检索] 已回填 {count} 名成员的拼音首字母")
+        except Exception as e:
+            db.session.rollback()
+            print(f"[成员检索] 数据库升级失败: {e}")
+        
+        # 旧数据库首次启用班级统计汇总表时回填
+        from app.services.stats_service import ensure_class_stats
+        try:
+            ensure_class_stats()
+        except Exception as e:
+            db.session.rollback()
+            print(f"[班级统计] 重建失败: {e}")
+    
+    # 变更日志按保留期限清理（启动时一次，之后定时）
+    from app.services.change_service import change_log_pruner
+    change_log_pruner.init_app(app)
     
     return app
 
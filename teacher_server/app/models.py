@@ -102,7 +102,8 @@ class GroupMember(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     group_id = db.Column(db.Integer, db.ForeignKey('student_groups.id', ondelete='CASCADE'), nullable=False)
     member_index = db.Column(db.Integer, nullable=False)
-    member_name = db.Column(db.String(50), nullable=False)
+    member_name = db.Column(db.String(50), nullable=False, index=True)
+    name_initials = db.Column(db.String(50), index=True)  # 姓名拼音首字母（写入时计算）
     
     __table_args__ = (db.UniqueConstraint('group_id', 'member_index', name='uq_group_member'),)
     
@@ -284,3 +285,72 @@ class ChatMessage(db.Model):
             'submit_time': self.submit_time.isoformat() if self.submit_time else None
         }
 
+
+
+class ClassStats(db.Model):
+    """班级统计汇总表（每次提交/删除后按班级增量刷新）"""
+    __tablename__ = 'class_stats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    school = db.Column(db.String(100), nullable=False, index=True)
+    grade = db.Column(db.String(10), nullable=False)
+    class_number = db.Column(db.String(10), nullable=False)
+    activity_date = db.Column(db.Date, nullable=False)
+    group_count = db.Column(db.Integer, default=0)  # 提交组数
+    task1_count = db.Column(db.Integer, default=0)  # 任务一完成组数
+    task2_count = db.Column(db.Integer, default=0)  # 任务二完成组数
+    thinking1_count = db.Column(db.Integer, default=0)
+    thinking2_count = db.Column(db.Integer, default=0)
+    creative_count = db.Column(db.Integer, default=0)
+    user_question_count = db.Column(db.Integer, default=0)  # 茶助教学生提问总数
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('school', 'grade', 'class_number', 'activity_date', name='uq_class_stats'),
+    )
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'school': self.school,
+            'grade': self.grade,
+            'class_number': self.class_number,
+            'activity_date': self.activity_date.isoformat() if self.activity_date else None,
+            'groups': self.group_count,
+            'task1': self.task1_count,
+            'task2': self.task2_count,
+            'thinking1': self.thinking1_count,
+            'thinking2': self.thinking2_count,
+            'creative': self.creative_count,
+            'user_questions': self.user_question_count
+        }
+
+
+class ChangeLog(db.Model):
+    """数据变更日志表（供下游增量同步，id 即游标，单调递增）"""
+    __tablename__ = 'change_log'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)  # 变更的表名
+    row_id = db.Column(db.Integer)  # 变更行的主键
+    group_id = db.Column(db.Integer, index=True)  # 所属学生组（不设外键，删除后仍保留日志）
+    submission_id = db.Column(db.String(64), index=True)
+    operation = db.Column(db.String(10), nullable=False)  # insert/update/delete
+    payload = db.Column(db.Text)  # 变更后的数据快照（JSON格式，删除时为空）
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # SQLite 使用 AUTOINCREMENT，保证删除后游标不会被复用
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'cursor': self.id,
+            'table': self.table_name,
+            'row_id': self.row_id,
+            'group_id': self.group_id,
+            'submission_id': self.submission_id,
+            'operation': self.operation,
+            'data': json.loads(self.payload) if self.payload else None,
+            'changed_at': self.changed_at.isoformat() if self.changed_at else None
+        }
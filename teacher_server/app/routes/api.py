@@ -3,6 +3,7 @@ API路由 - 接收学生数据
 """
 from flask import Blueprint, request, jsonify
 from app.services.data_service import save_all_data
+from app.services.pdf_cache_service import pdf_prerenderer
 
 api_bp = Blueprint('api', __name__)
 
@@ -49,6 +50,9 @@ def submit_data():
         success, message, result_submission_id = save_all_data(data, submission_id)
         
         if success:
+            # 提交稳定后在后台预先生成PDF报告（未启用时不做任何事）
+            pdf_prerenderer.schedule(result_submission_id)
+            
             return jsonify({
                 'success': True,
                 'message': message,
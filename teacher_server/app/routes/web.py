@@ -1,17 +1,36 @@
 """
 Web路由 - 教师查看界面
 """
-from flask import Blueprint, render_template, request, jsonify, send_from_directory, redirect, url_for, send_file
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, send_file, Response, current_app, stream_with_context
 from app import db
 from app.models import StudentGroup, GroupMember, Task1Data, Task2Data, ThinkingQuestion, Photo, ChatMessage
 from app.services.data_service import delete_student_data
-from app.services.export_service import DataExportService
-from app.services.pdf_service import PDFExportService
+from app.services.member_service import search_members
+from app.services.change_service import get_changes, get_latest_cursor, get_oldest_cursor
+from app.services.live_service import live_feed, format_sse, parse_date_filters
+from app.services.stats_service import get_class_stats, get_class_summary
+from app.services.export_service import DataExportService, EXPORT_FORMATS
+from app.services.export_loader import count_export_groups, iter_export_groups, iter_export_rows, PDF_RELATIONS
+from app.services.photo_service import get_thumbnail
+from app.services.photo_gc_service import photo_reconciler, GC_MODES
+from app.services.pdf_cache_service import PDF_SUFFIX, pdf_cache_key, load_pdf_group, render_cached_pdf
+from app.services.pdf_batch_service import pdf_batch, write_class_report
+from app.services.job_service import job_manager, DONE as JOB_DONE
+from app.utils.helpers import make_etag, make_content_disposition, make_export_filename, make_pdf_filename
+from app.utils.cache import cached_response
+from app.utils.disk_cache import export_cache, pdf_cache
+from app.utils.photo_storage import photo_storage
+from app.utils.singleflight import SingleFlight
+from app.utils.streaming import iter_writer
 from pathlib import Path
 from sqlalchemy import case
 from datetime import datetime
+from urllib.parse import quote
+import io
+import os
 import sys
-import tempfile
+import queue
+import time
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from config import Config
@@ -19,6 +38,7 @@ from config import Config
 web_bp = Blueprint('web', __name__)
 
 @web_bp.route('/')
+@cached_response
 def index():
     """学生列表页"""
     from datetime import datetime
@@ -95,6 +115,7 @@ def student_detail(submission_id):
     return render_template('student_detail.html', group=group)
 
 @web_bp.route('/api/students')
+@cached_response
 def api_students():
     """API: 获取学生列表"""
     from datetime import datetime
@@ -156,9 +177,32 @@ def api_students():
     })
 
 @web_bp.route('/api/students/<submission_id>')
+@cached_response
 def api_student_detail(submission_id):
-    """API: 获取学生详情"""
-    group = StudentGroup.query.filter_by(submission_id=submission_id).first()
+    """API: 获取学生详情（支持 ETag / 304 协商缓存）"""
+    # 先只查询更新时间，客户端缓存仍有效时直接返回304，不加载任何关联数据
+    version_row = db.session.query(StudentGroup.updated_at).filter_by(submission_id=submission_id).first()
+    
+    if not version_row:
+        return jsonify({
+            'success': False,
+            'message': '学生数据不存在'
+        }), 404
+    
+    etag = make_etag(submission_id, version_row.updated_at)
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+    
+    # 一次性预加载全部关联数据：一对一关系用JOIN，集合关系用IN查询，避免笛卡尔积
+    from sqlalchemy.orm import joinedload, selectinload
+    group = StudentGroup.query.options(
+        joinedload(StudentGroup.task1),
+        joinedload(StudentGroup.task2),
+        selectinload(StudentGroup.members),
+        selectinload(StudentGroup.thinking_questions),
+        selectinload(StudentGroup.photos),
+        selectinload(StudentGroup.chat_messages)
+    ).filter_by(submission_id=submission_id).first()
     
     if not group:
         return jsonify({
@@ -166,49 +210,224 @@ def api_student_detail(submission_id):
             'message': '学生数据不存在'
         }), 404
     
+    # 照片按类型分组（只遍历一次）
+    photos_by_type = {}
+    for p in group.photos:
+        name = Path(p.file_path).name
+        photos_by_type.setdefault(p.photo_type, []).append(
+            {'url': f'/static/photos/{name}', 'thumbnail_url': f'/thumbs/200/{name}'}
+        )
+    
     # 构建完整数据
     data = group.to_dict()
     
     # 添加成员信息
-    data['members'] = [m.to_dict() for m in group.members]
+    data['members'] = [m.to_dict() for m in sorted(group.members, key=lambda m: m.member_index)]
     
     # 添加任务一数据
     if group.task1:
         data['task1'] = group.task1.to_dict()
-        data['task1']['photos'] = [
-            {'url': f'/static/photos/{Path(p.file_path).name}'}
-            for p in group.photos if p.photo_type == 'task1'
-        ]
+        data['task1']['photos'] = photos_by_type.get('task1', [])
     
     # 添加任务二数据
     if group.task2:
         data['task2'] = group.task2.to_dict()
-        data['task2']['photos'] = [
-            {'url': f'/static/photos/{Path(p.file_path).name}'}
-            for p in group.photos if p.photo_type == 'task2'
-        ]
+        data['task2']['photos'] = photos_by_type.get('task2', [])
     
     # 添加思考题数据
     data['thinking_questions'] = {}
     for thinking in group.thinking_questions:
         data['thinking_questions'][thinking.question_type] = thinking.to_dict()
-        data['thinking_questions'][thinking.question_type]['photos'] = [
-            {'url': f'/static/photos/{Path(p.file_path).name}'}
-            for p in group.photos if p.photo_type == thinking.question_type
-        ]
+        data['thinking_questions'][thinking.question_type]['photos'] = photos_by_type.get(thinking.question_type, [])
     
     # 添加茶助教问答记录
-    chat_messages = ChatMessage.query.filter_by(group_id=group.id).order_by(ChatMessage.message_index).all()
+    chat_messages = sorted(group.chat_messages, key=lambda x: x.message_index)
     data['chat_messages'] = [msg.to_dict() for msg in chat_messages]
     
     # 统计学生提问数量
-    user_questions = [msg for msg in chat_messages if msg.role == 'user']
-    data['user_questions_count'] = len(user_questions)
+    data['user_questions_count'] = sum(1 for msg in chat_messages if msg.role == 'user')
     
-    return jsonify({
+    response = jsonify({
         'success': True,
         'data': data
     })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _not_modified(etag):
+    """构建304响应"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@web_bp.route('/api/live')
+def api_live():
+    """SSE: 实时推送新提交/更新的小组和班级统计"""
+    school = request.args.get('school', '').strip()
+    grade = request.args.get('grade', '').strip()
+    class_number = request.args.get('class_number', '').strip()
+    start_datetime, end_datetime = parse_date_filters(
+        request.args.get('start_date', ''),
+        request.args.get('end_date', '')
+    )
+    
+    # 连接建立时发送一次当前的班级统计
+    initial_counters = get_class_summary(school, grade, class_number)
+    subscriber = live_feed.subscribe(
+        school=school,
+        grade=grade,
+        class_number=class_number,
+        start_date=start_datetime,
+        end_date=end_datetime
+    )
+    
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            for counters in initial_counters:
+                yield format_sse('stats', counters)
+            
+            while True:
+                try:
+                    message = subscriber.queue.get(timeout=Config.LIVE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    # 心跳，保持连接并及时发现断开的客户端
+                    yield ': ping\n\n'
+                    continue
+                
+                yield message
+                
+                if subscriber.overflowed:
+                    # 消息积压过多，通知页面整体刷新
+                    yield format_sse('reload', {})
+                    return
+        finally:
+            live_feed.unsubscribe(subscriber)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@web_bp.route('/api/changes')
+def api_changes():
+    """API: 按游标增量拉取数据变更（since=上次返回的 next_cursor）"""
+    since = request.args.get('since', 0, type=int)
+    limit = request.args.get('limit', 500, type=int)
+    limit = max(1, min(limit, 5000))
+    
+    changes, next_cursor, has_more = get_changes(since, limit)
+    
+    # 先拉取再检查：拉取之后才被清理的变更不影响本次结果
+    oldest_cursor = get_oldest_cursor()
+    if since < oldest_cursor:
+        return jsonify({
+            'success': False,
+            'message': '游标过旧，之后的部分变更已被清理，请重新全量同步',
+            'oldest_cursor': oldest_cursor,
+            'latest_cursor': get_latest_cursor()
+        }), 410
+    
+    return jsonify({
+        'success': True,
+        'data': changes,
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    })
+
+@web_bp.route('/api/photos/reconcile', methods=['GET', 'POST'])
+def api_photo_reconcile():
+    """
+    API: 孤立照片回收
+    
+    GET 返回最近一次回收的报告；POST 立即执行一次（mode=report/quarantine/delete，full=1 处理全部分片）
+    """
+    if request.method == 'GET':
+        return jsonify({
+            'success': True,
+            'data': photo_reconciler.last_report
+        })
+    
+    mode = request.values.get('mode') or None
+    if mode is not None and mode not in GC_MODES:
+        return jsonify({
+            'success': False,
+            'message': f'不支持的处理方式: {mode}'
+        }), 400
+    
+    try:
+        report = photo_reconciler.run(mode=mode, full=request.values.get('full') in ('1', 'true'))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'message': f'照片回收失败: {str(e)}'
+        }), 500
+    
+    if report is None:
+        return jsonify({
+            'success': False,
+            'message': '照片回收正在进行，请稍后再试'
+        }), 409
+    
+    return jsonify({
+        'success': True,
+        'data': report
+    })
+
+@web_bp.route('/api/stats')
+def api_stats():
+    """API: 班级统计（读取 class_stats 汇总表）"""
+    school = request.args.get('school', '')
+    grade = request.args.get('grade', '')
+    class_number = request.args.get('class_number', '')
+    group_by = request.args.get('group_by', 'class')
+    
+    # 按活动日期筛选
+    start_date = None
+    end_date = None
+    try:
+        if request.args.get('start_date'):
+            start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d').date()
+        if request.args.get('end_date'):
+            end_date = datetime.strptime(request.args.get('end_date'), '%Y-%m-%d').date()
+    except ValueError:
+        pass  # 忽略无效的日期格式
+    
+    if group_by == 'date':
+        stats = get_class_stats(school, grade, class_number, start_date, end_date)
+    else:
+        stats = get_class_summary(school, grade, class_number, start_date, end_date)
+    
+    return jsonify({
+        'success': True,
+        'data': stats
+    })
+
+@web_bp.route('/api/members/search')
+def api_member_search():
+    """API: 按姓名或拼音首字母查找学生所在小组"""
+    keyword = request.args.get('q', '')
+    limit = request.args.get('limit', Config.ITEMS_PER_PAGE, type=int)
+    school = request.args.get('school', '')
+    grade = request.args.get('grade', '')
+    class_number = request.args.get('class_number', '')
+
+    results = search_members(
+        keyword,
+        school=school,
+        grade=grade,
+        class_number=class_number,
+        limit=max(1, min(limit, 100))
+    )
+
+    return jsonify({
+        'success': True,
+        'data': results
+    })
 
 @web_bp.route('/api/students/<submission_id>/delete', methods=['POST', 'DELETE'])
 def delete_student(submission_id):
@@ -235,76 +454,225 @@ def delete_student(submission_id):
 
 @web_bp.route('/static/photos/<filename>')
 def serve_photo(filename):
-    """提供照片文件"""
-    return send_from_directory(Config.UPLOAD_FOLDER, filename)
+    """提供照片文件（文件名包含 submission_id、时间戳和随机后缀，不会被重用，内容不会变化，允许浏览器长期缓存）"""
+    stat = photo_storage.stat(filename)
+    if stat is None:
+        return jsonify({
+            'success': False,
+            'message': '照片不存在'
+        }), 404
+    
+    url = photo_storage.url(filename)
+    if url is not None:
+        # 对象存储：重定向到预签名URL或公开地址，照片内容由存储服务发送
+        response = redirect(url)
+        max_age = photo_storage.url_max_age
+        if max_age is None:
+            # 公开地址不会过期
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config['PHOTO_CACHE_MAX_AGE']
+        else:
+            # 预签名URL在有效期内缓存
+            response.cache_control.private = True
+            response.cache_control.max_age = max_age
+        return response
+    
+    etag = make_etag('photo', filename, *stat)
+    path = photo_storage.local_path(filename)
+    if path is None:
+        # 打包存储或不重定向的对象存储：只在需要发送内容时才读取
+        return _send_immutable_file(lambda: _open_stored_photo(filename), etag, 'image/jpeg')
+    
+    accel_prefix = current_app.config.get('PHOTO_X_ACCEL_PREFIX')
+    return _send_immutable_file(
+        path,
+        etag,
+        'image/jpeg',
+        accel_uri=accel_prefix.rstrip('/') + '/' + quote(filename) if accel_prefix else None
+    )
+
+def _send_immutable_file(path, etag, mimetype, accel_uri=None):
+    """
+    发送内容不会变化的文件：长期缓存（immutable）+ 强ETag + 条件请求304 + Range分段请求
+    
+    - 配置了 PHOTO_X_ACCEL_PREFIX 时只返回 X-Accel-Redirect 头，由 nginx 发送文件
+    - USE_X_SENDFILE 为真时由 Flask 返回 X-Sendfile 头，由 Apache/lighttpd 发送文件
+    - 否则由 WSGI 服务器的 file_wrapper 发送（支持时使用零拷贝 sendfile）
+    
+    path 也可以是返回 BytesIO 的函数（不在本机文件中的照片），304时不调用；函数返回None时返回404
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif accel_uri:
+        response = Response(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = accel_uri
+    else:
+        source = path() if callable(path) else path
+        if source is None:
+            return jsonify({
+                'success': False,
+                'message': '照片不存在'
+            }), 404
+        response = send_file(source, mimetype=mimetype, etag=etag, conditional=True)
+        response.headers['Accept-Ranges'] = 'bytes'
+    
+    response.set_etag(etag)
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['PHOTO_CACHE_MAX_AGE']
+    response.cache_control.immutable = True
+    return response
+
+def _open_stored_photo(filename):
+    """读取不在本机文件中的照片（检查存在后又被删除时返回None）"""
+    data = photo_storage.get(filename)
+    return io.BytesIO(data) if data is not None else None
+
+@web_bp.route('/thumbs/<int:size>/<filename>')
+def serve_thumbnail(size, filename):
+    """提供照片缩略图（size 为最长边像素数，按允许的尺寸向上取整；首次请求时生成并缓存）"""
+    path, cache_key = get_thumbnail(filename, size)
+    if path is None:
+        return jsonify({
+            'success': False,
+            'message': '照片不存在'
+        }), 404
+    
+    return _send_immutable_file(path, make_etag(*cache_key), 'image/jpeg')
+
+# 进行中的导出（相同请求只计算一次）
+export_flights = SingleFlight()
 
 @web_bp.route('/export/excel')
 def export_excel():
     """导出Excel文件"""
+    return _export_file('excel')
+
+@web_bp.route('/export/json')
+def export_json():
+    """导出JSON文件（适合AI分析），从分批读取的数据库游标直接流式输出"""
+    return _export_file('json')
+
+@web_bp.route('/export/ndjson')
+def export_ndjson():
+    """导出NDJSON文件（每行一个小组），适合逐行处理的AI分析流水线"""
+    return _export_file('ndjson')
+
+@web_bp.route('/export/csv')
+def export_csv():
+    """导出CSV压缩包（学生信息、任务一、任务二、思考题、问答记录各一个CSV），逐个条目流式输出"""
+    return _export_file('csv')
+
+@web_bp.route('/export/jsonl-shards')
+def export_jsonl_shards():
+    """
+    导出JSONL分片压缩包：按 max_bytes（未压缩字节数）或 max_tokens（估算token数）切分的
+    gzip压缩JSONL分片，附带列出各分片范围和校验和的 manifest.json，适合分批提交给AI分析
+    """
+    options, error = _shard_options(request.args)
+    if error:
+        return jsonify({
+            'success': False,
+            'message': error
+        }), 400
+    return _export_file('jsonl_shards', options)
+
+def _shard_options(values):
+    """
+    读取JSONL分片参数（未提供时使用配置的默认值）
+    
+    Returns:
+        (参数字典, 错误信息)
+    """
+    options = {}
+    for name, config_name in (('max_bytes', 'EXPORT_SHARD_MAX_BYTES'), ('max_tokens', 'EXPORT_SHARD_MAX_TOKENS')):
+        value = values.get(name)
+        if value in (None, ''):
+            options[name] = current_app.config[config_name]
+            continue
+        try:
+            options[name] = int(value)
+        except (TypeError, ValueError):
+            return None, f'{name} 必须是整数'
+        if options[name] < 0:
+            return None, f'{name} 不能为负数'
+    return options, None
+
+def _export_file(export_format, options=None):
+    """
+    导出文件
+    
+    缓存键为 (格式, 筛选条件, 格式参数, 数据版本)：数据未变化时直接返回缓存的文件；
+    否则流式生成，发送给客户端的同时写入导出缓存
+    """
     try:
         # 获取筛选条件
-        school = request.args.get('school', '')
-        grade = request.args.get('grade', '')
-        class_number = request.args.get('class_number', '')
-        
-        # 查询数据
-        from sqlalchemy.orm import joinedload
-        query = StudentGroup.query.options(
-            joinedload(StudentGroup.members),
-            joinedload(StudentGroup.task1),
-            joinedload(StudentGroup.task2),
-            joinedload(StudentGroup.thinking_questions),
-            joinedload(StudentGroup.chat_messages)
-        )
-        
-        if school:
-            query = query.filter(StudentGroup.school.contains(school))
-        if grade:
-            query = query.filter(StudentGroup.grade == grade)
-        if class_number:
-            query = query.filter(StudentGroup.class_number == class_number)
-        
-        groups = query.order_by(
-            case((StudentGroup.group_number.is_(None), 999999), else_=StudentGroup.group_number).asc(),
-            StudentGroup.submit_time.desc()
-        ).all()
-        
-        if not groups:
-            return jsonify({
-                'success': False,
-                'message': '没有数据可导出'
-            }), 400
-        
-        # 导出Excel
-        export_service = DataExportService()
-        
-        # 使用临时文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-            output_path = tmp.name
-        
-        export_service.export_to_excel(groups, output_path)
-        
-        # 生成下载文件名
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        # 根据筛选条件生成文件名
-        filename_parts = ['茶文化课程数据']
-        if school:
-            filename_parts.append(school)
-        if grade:
-            filename_parts.append(grade)
-        if class_number:
-            filename_parts.append(f'{class_number}班')
-        filename_parts.append(timestamp)
-        
-        download_name = '_'.join(filename_parts) + '.xlsx'
-        
-        return send_file(
-            output_path,
-            as_attachment=True,
-            download_name=download_name,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        school = request.args.get('school', '').strip()
+        grade = request.args.get('grade', '').strip()
+        class_number = request.args.get('class_number', '').strip()
+        
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        download_name = make_export_filename(school, grade, class_number, extension)
+        
+        # 变更日志的最新游标作为持久化的数据版本号（重启后缓存仍然有效）
+        version = get_latest_cursor()
+        cache_key = ('export', export_format, school, grade, class_number, version)
+        if options:
+            cache_key += (tuple(sorted(options.items())),)
+        
+        # 相同的导出正在生成时等待其完成，然后直接使用它写入的缓存文件
+        while True:
+            cached_path = export_cache.get(cache_key, extension)
+            if cached_path is not None:
+                return send_file(
+                    cached_path,
+                    mimetype=mimetype,
+                    as_attachment=True,
+                    download_name=download_name,
+                    etag=make_etag(*cache_key)
+                )
+            
+            flight, is_leader = export_flights.begin(cache_key)
+            if is_leader:
+                break
+            if not flight.wait(current_app.config['EXPORT_WAIT_SECONDS']):
+                # 等待超时则自行生成（不写入 single-flight 登记）
+                flight = None
+                break
+        
+        handed_off = False
+        try:
+            total = count_export_groups(school, grade, class_number)
+            
+            if not total:
+                return jsonify({
+                    'success': False,
+                    'message': '没有数据可导出'
+                }), 400
+            
+            chunks = _export_chunks(export_format, school, grade, class_number, total, options)
+            
+            # 生成期间数据发生变化时不写入缓存
+            chunks = export_cache.tee(
+                cache_key, chunks, extension,
+                validate=lambda: get_latest_cursor() == version
+            )
+            
+            response = Response(
+                stream_with_context(chunks),
+                mimetype=mimetype,
+                headers={'Content-Disposition': make_content_disposition(download_name)}
+            )
+            
+            # 响应发送完毕（或客户端断开）后唤醒等待的请求：
+            # 生成成功时它们命中缓存，失败时其中一个重新生成
+            if flight is not None:
+                response.call_on_close(lambda: export_flights.finish(cache_key, flight))
+                handed_off = True
+            return response
+        finally:
+            if flight is not None and not handed_off:
+                export_flights.finish(cache_key, flight)
         
     except Exception as e:
         import traceback
@@ -314,119 +682,226 @@ def export_excel():
             'message': f'导出失败: {str(e)}'
         }), 500
 
-@web_bp.route('/export/json')
-def export_json():
-    """导出JSON文件（适合AI分析）"""
-    try:
-        # 获取筛选条件
-        school = request.args.get('school', '')
-        grade = request.args.get('grade', '')
-        class_number = request.args.get('class_number', '')
-        
-        # 查询数据
-        from sqlalchemy.orm import joinedload
-        query = StudentGroup.query.options(
-            joinedload(StudentGroup.members),
-            joinedload(StudentGroup.task1),
-            joinedload(StudentGroup.task2),
-            joinedload(StudentGroup.thinking_questions),
-            joinedload(StudentGroup.chat_messages)
+def _export_chunks(export_format, school, grade, class_number, total, options=None):
+    """按格式流式生成导出文件内容"""
+    export_service = DataExportService()
+    
+    if export_format == 'class_pdf':
+        # 各小组在后台线程中分批读取，边读取边排版
+        return iter_writer(
+            lambda f: write_class_report(f, school, grade, class_number),
+            app=current_app._get_current_object()
         )
-        
-        if school:
-            query = query.filter(StudentGroup.school.contains(school))
-        if grade:
-            query = query.filter(StudentGroup.grade == grade)
-        if class_number:
-            query = query.filter(StudentGroup.class_number == class_number)
-        
-        groups = query.order_by(
-            case((StudentGroup.group_number.is_(None), 999999), else_=StudentGroup.group_number).asc(),
-            StudentGroup.submit_time.desc()
-        ).all()
-        
-        if not groups:
-            return jsonify({
-                'success': False,
-                'message': '没有数据可导出'
-            }), 400
-        
-        # 导出JSON
-        export_service = DataExportService()
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.json', mode='w', encoding='utf-8') as tmp:
-            output_path = tmp.name
-        
-        export_service.export_to_json(groups, output_path)
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        # 根据筛选条件生成文件名
-        filename_parts = ['茶文化课程数据']
-        if school:
-            filename_parts.append(school)
-        if grade:
-            filename_parts.append(grade)
-        if class_number:
-            filename_parts.append(f'{class_number}班')
-        filename_parts.append(timestamp)
-        
-        download_name = '_'.join(filename_parts) + '.json'
-        
-        return send_file(
-            output_path,
-            as_attachment=True,
-            download_name=download_name,
-            mimetype='application/json'
+    
+    if export_format == 'pdf_zip':
+        # 各小组的PDF在工作进程中并行生成，先完成的先写入压缩包
+        return pdf_batch.iter_zip(
+            iter_export_groups(school, grade, class_number, relations=PDF_RELATIONS),
+            app=current_app._get_current_object()
         )
-        
+    
+    if export_format == 'jsonl_shards':
+        # 分片在后台线程中序列化，压缩和校验和计算由线程池并行完成
+        return export_service.iter_jsonl_shards(
+            iter_export_rows(school, grade, class_number),
+            app=current_app._get_current_object(),
+            workers=current_app.config['EXPORT_SHARD_WORKERS'],
+            **(options or {})
+        )
+    
+    if export_format == 'excel':
+        # 摘要页直接使用 class_stats 汇总表，无需在内存中统计
+        class_stats = get_class_summary(school, grade, class_number)
+        
+        # 只写模式逐行写出，生成的文件内容边打包边发送；数据在后台线程中分批读取
+        return export_service.iter_excel(
+            iter_export_rows(school, grade, class_number),
+            class_stats=class_stats,
+            total=total,
+            app=current_app._get_current_object()
+        )
+    
+    if export_format == 'csv':
+        # 每个CSV文件在后台线程中重新分批读取一次数据库，不在内存中保留全部数据
+        return export_service.iter_csv_zip(
+            lambda: iter_export_rows(school, grade, class_number),
+            app=current_app._get_current_object()
+        )
+    
+    groups = iter_export_rows(school, grade, class_number)
+    if export_format == 'ndjson':
+        return export_service.iter_ndjson(groups)
+    return export_service.iter_json(groups, total=total)
+
+@web_bp.route('/api/jobs', methods=['POST'])
+def api_create_job():
+    """
+    提交后台导出任务
+    
+    参数（JSON或表单）：type = excel/json/ndjson/csv/jsonl_shards/pdf_zip/class_pdf（按 school/grade/class_number 筛选，
+    jsonl_shards 可另外指定 max_bytes / max_tokens）或 type = pdf（需要 submission_id）
+    """
+    data = request.get_json(silent=True) or request.form
+    job_type = (data.get('type') or '').strip()
+    
+    try:
+        if job_type == 'pdf':
+            job, error = job_manager.submit_pdf((data.get('submission_id') or '').strip())
+        else:
+            job, options, error = None, None, None
+            if job_type == 'jsonl_shards':
+                options, error = _shard_options(data)
+            if not error:
+                job, error = job_manager.submit_export(
+                    job_type,
+                    school=(data.get('school') or '').strip(),
+                    grade=(data.get('grade') or '').strip(),
+                    class_number=(data.get('class_number') or '').strip(),
+                    options=options
+                )
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({
             'success': False,
-            'message': f'导出失败: {str(e)}'
+            'message': f'提交导出任务失败: {str(e)}'
         }), 500
+    
+    if job is None:
+        status = 503 if error == '导出任务过多，请稍后再试' else 400
+        return jsonify({
+            'success': False,
+            'message': error
+        }), status
+    
+    return jsonify({
+        'success': True,
+        'job': job.to_dict()
+    }), 202
+
+@web_bp.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """查询后台导出任务的进度（轮询）"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': '导出任务不存在或已过期'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job.to_dict()
+    })
+
+@web_bp.route('/api/jobs/<job_id>/events')
+def api_job_events(job_id):
+    """SSE: 推送后台导出任务的进度，任务结束后关闭连接"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': '导出任务不存在或已过期'
+        }), 404
+    
+    def stream():
+        revision = None
+        while True:
+            if revision != job.revision:
+                revision = job.revision
+                yield format_sse('progress', job.to_dict())
+                if job.finished:
+                    return
+            
+            # 进度更新较频繁时合并推送，最多每0.5秒一次
+            time.sleep(0.5)
+            if job.wait_for_update(revision, timeout=Config.LIVE_KEEPALIVE_SECONDS) == revision:
+                yield ': ping\n\n'
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@web_bp.route('/api/jobs/<job_id>/download')
+def api_job_download(job_id):
+    """下载后台导出任务生成的文件"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': '导出任务不存在或已过期'
+        }), 404
+    
+    if job.status != JOB_DONE:
+        return jsonify({
+            'success': False,
+            'message': job.message or '导出任务尚未完成',
+            'job': job.to_dict()
+        }), 409
+    
+    path = job.cache.get(job.cache_key, job.suffix)
+    if path is None:
+        return jsonify({
+            'success': False,
+            'message': '导出文件已被清理，请重新导出'
+        }), 410
+    
+    return send_file(
+        path,
+        mimetype=job.mimetype,
+        as_attachment=True,
+        download_name=job.download_name,
+        etag=make_etag(*job.cache_key)
+    )
+
+@web_bp.route('/export/pdf/batch')
+def export_pdf_batch():
+    """批量导出PDF报告：按筛选条件（学校/年级/班级）为每个小组生成报告，打包为ZIP边生成边输出"""
+    return _export_file('pdf_zip')
+
+@web_bp.route('/export/pdf/class')
+def export_pdf_class():
+    """导出合并的班级报告：封面为班级统计汇总，之后每个小组一节，生成一个PDF文档"""
+    return _export_file('class_pdf')
 
 @web_bp.route('/export/pdf/<submission_id>')
 def export_pdf(submission_id):
-    """导出单个小组的PDF报告"""
+    """导出单个小组的PDF报告（按 submission_id + updated_at 缓存，重复下载直接发送缓存文件）"""
     try:
-        # 查询学生组数据
-        from sqlalchemy.orm import joinedload
-        group = StudentGroup.query.options(
-            joinedload(StudentGroup.members),
-            joinedload(StudentGroup.task1),
-            joinedload(StudentGroup.task2),
-            joinedload(StudentGroup.thinking_questions),
-            joinedload(StudentGroup.chat_messages),
-            joinedload(StudentGroup.photos)
+        # 先只查询更新时间：报告已缓存时不加载任何关联数据
+        version_row = db.session.query(
+            StudentGroup.updated_at, StudentGroup.school, StudentGroup.grade,
+            StudentGroup.class_number, StudentGroup.group_number
         ).filter_by(submission_id=submission_id).first()
         
-        if not group:
+        if not version_row:
             return jsonify({
                 'success': False,
                 'message': '学生数据不存在'
             }), 404
         
-        # 生成PDF
-        pdf_service = PDFExportService()
+        cache_key = pdf_cache_key(submission_id, version_row.updated_at)
+        path = pdf_cache.get(cache_key, PDF_SUFFIX)
         
-        # 使用临时文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-            output_path = tmp.name
-        
-        pdf_service.generate_group_pdf(group, output_path)
-        
-        # 生成下载文件名
-        group_num = f"小组{group.group_number}" if group.group_number else "未设置编号"
-        download_name = f"茶文化课程报告_{group.school}_{group.grade}{group.class_number}班_{group_num}.pdf"
+        if path is None:
+            group = load_pdf_group(submission_id)
+            if not group:
+                return jsonify({
+                    'success': False,
+                    'message': '学生数据不存在'
+                }), 404
+            
+            # 生成并写入缓存（同一报告同时被多次请求时只生成一次）
+            path = render_cached_pdf(group, timeout=current_app.config['EXPORT_WAIT_SECONDS'])
+            cache_key = pdf_cache_key(submission_id, group.updated_at)
         
         return send_file(
-            output_path,
+            path,
             as_attachment=True,
-            download_name=download_name,
-            mimetype='application/pdf'
+            download_name=make_pdf_filename(version_row),
+            mimetype='application/pdf',
+            etag=make_etag(*cache_key)
         )
         
     except Exception as e:
@@ -0,0 +1,272 @@
+"""
+数据变更捕获服务（CDC）
+在与业务数据相同的事务中写入 change_log，下游可按游标增量拉取变更
+
+变更日志按配置保留（CHANGE_LOG_RETENTION_DAYS / CHANGE_LOG_MAX_ROWS），启动时和定时清理旧变更；
+最新的一条始终保留（其ID同时作为数据版本号）。游标早于已清理的变更时拉取返回“游标过旧”
+"""
+from datetime import datetime, timedelta
+import json
+import threading
+import traceback
+from sqlalchemy import event, select, func, or_
+from sqlalchemy.orm import Session
+from app import db
+from app.models import (
+    StudentGroup, GroupMember, Task1Data, Task2Data,
+    ThinkingQuestion, Photo, ChatMessage, ChangeLog
+)
+
+# 需要记录变更的模型
+TRACKED_MODELS = (
+    StudentGroup, GroupMember, Task1Data, Task2Data,
+    ThinkingQuestion, Photo, ChatMessage
+)
+
+
+def _group_id_of(obj):
+    """获取对象所属的学生组ID"""
+    if isinstance(obj, StudentGroup):
+        return obj.id
+    return obj.group_id
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _snapshot(obj):
+    """生成变更后的数据快照"""
+    data = obj.to_dict()
+    if not isinstance(obj, StudentGroup):
+        data['group_id'] = obj.group_id
+    return json.dumps(data, ensure_ascii=False, default=_json_default)
+
+
+def _lookup_submission_ids(connection, group_ids, known):
+    """补全 group_id → submission_id 映射（会话中没有的学生组再查数据库）"""
+    missing = [gid for gid in group_ids if gid is not None and gid not in known]
+    if missing:
+        table = StudentGroup.__table__
+        rows = connection.execute(
+            select(table.c.id, table.c.submission_id).where(table.c.id.in_(missing))
+        )
+        for group_id, submission_id in rows:
+            known[group_id] = submission_id
+    return known
+
+
+def _write_changes(session, changes, known_submission_ids):
+    """写入变更日志（使用会话当前连接，与业务数据同一事务）"""
+    if not changes:
+        return
+
+    connection = session.connection()
+    known = _lookup_submission_ids(
+        connection, {c['group_id'] for c in changes}, known_submission_ids
+    )
+    now = datetime.utcnow()
+    for change in changes:
+        change['submission_id'] = known.get(change['group_id'])
+        change['changed_at'] = now
+
+    connection.execute(ChangeLog.__table__.insert(), changes)
+
+
+def _after_flush(session, flush_context):
+    """记录本次flush中ORM对象的新增、修改、删除"""
+    changes = []
+    known = {}
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, StudentGroup):
+            known[obj.id] = obj.submission_id
+
+    for obj in session.new:
+        if isinstance(obj, TRACKED_MODELS):
+            changes.append({
+                'table_name': obj.__tablename__,
+                'row_id': obj.id,
+                'group_id': _group_id_of(obj),
+                'operation': 'insert',
+                'payload': _snapshot(obj)
+            })
+
+    for obj in session.dirty:
+        if isinstance(obj, TRACKED_MODELS) and session.is_modified(obj, include_collections=False):
+            changes.append({
+                'table_name': obj.__tablename__,
+                'row_id': obj.id,
+                'group_id': _group_id_of(obj),
+                'operation': 'update',
+                'payload': _snapshot(obj)
+            })
+
+    for obj in session.deleted:
+        if isinstance(obj, TRACKED_MODELS):
+            changes.append({
+                'table_name': obj.__tablename__,
+                'row_id': obj.id,
+                'group_id': _group_id_of(obj),
+                'operation': 'delete',
+                'payload': None
+            })
+
+    _write_changes(session, changes, known)
+
+
+def _before_bulk_delete(orm_execute_state):
+    """记录 Query.delete() 批量删除的行（先查出将被删除的行再记录）"""
+    if not orm_execute_state.is_delete:
+        return
+
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in TRACKED_MODELS or mapper.class_ is StudentGroup:
+        return
+
+    table = mapper.class_.__table__
+    statement = orm_execute_state.statement
+    query = select(table.c.id, table.c.group_id)
+    if statement.whereclause is not None:
+        query = query.where(statement.whereclause)
+
+    session = orm_execute_state.session
+    changes = [
+        {
+            'table_name': table.name,
+            'row_id': row_id,
+            'group_id': group_id,
+            'operation': 'delete',
+            'payload': None
+        }
+        for row_id, group_id in session.connection().execute(query)
+    ]
+    _write_changes(session, changes, {})
+
+
+def register_change_capture():
+    """注册变更捕获监听器（重复调用不会重复注册）"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+    if not event.contains(Session, 'do_orm_execute', _before_bulk_delete):
+        event.listen(Session, 'do_orm_execute', _before_bulk_delete)
+
+
+def get_changes(since=0, limit=500):
+    """
+    按游标分页获取变更
+
+    Args:
+        since: 上次拉取得到的游标（返回 id 大于该值的变更）
+        limit: 每页条数
+
+    Returns:
+        (变更列表, 下一页游标, 是否还有更多)
+    """
+    rows = ChangeLog.query.filter(
+        ChangeLog.id > since
+    ).order_by(ChangeLog.id).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = rows[-1].id if rows else since
+
+    return [row.to_dict() for row in rows], next_cursor, has_more
+
+
+def get_latest_cursor():
+    """获取最新的变更游标（可作为持久化的数据版本号）"""
+    return db.session.query(func.max(ChangeLog.id)).scalar() or 0
+
+
+def get_oldest_cursor():
+    """
+    仍可用于增量拉取的最早游标
+
+    更早的变更已被清理；since 小于该值时无法保证不遗漏变更
+    """
+    oldest_id = db.session.query(func.min(ChangeLog.id)).scalar()
+    return oldest_id - 1 if oldest_id else 0
+
+
+def prune_change_log(retention_days=0, max_rows=0):
+    """
+    清理旧的变更日志（需要在应用上下文中调用）
+
+    Args:
+        retention_days: 保留的天数，0表示不按时间清理
+        max_rows: 最多保留的条数，0表示不限
+
+    Returns:
+        删除的条数
+    """
+    latest = get_latest_cursor()
+    if not latest:
+        return 0
+
+    # 最新的一条不删除：清空后数据版本号会回到0，与旧的缓存键重复
+    conditions = []
+    if retention_days:
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        conditions.append((ChangeLog.changed_at < cutoff) & (ChangeLog.id < latest))
+    if max_rows:
+        conditions.append(ChangeLog.id <= latest - max_rows)
+    if not conditions:
+        return 0
+
+    deleted = ChangeLog.query.filter(or_(*conditions)).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+class ChangeLogPruner:
+    """变更日志定期清理"""
+
+    def __init__(self):
+        self._app = None
+        self._timer = None
+        self.retention_days = 0
+        self.max_rows = 0
+        self.interval = 0
+
+    def init_app(self, app):
+        """读取配置；设置了保留期限时立即清理一次，并按间隔定时清理"""
+        self._app = app
+        self.retention_days = app.config.get('CHANGE_LOG_RETENTION_DAYS', 0)
+        self.max_rows = app.config.get('CHANGE_LOG_MAX_ROWS', 0)
+        self.interval = app.config.get('CHANGE_LOG_PRUNE_INTERVAL_SECONDS', 0)
+        if not (self.retention_days or self.max_rows):
+            return
+
+        self.run()
+        if self.interval and self._timer is None:
+            self._schedule()
+
+    def _schedule(self):
+        self._timer = threading.Timer(self.interval, self._tick)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _tick(self):
+        try:
+            self.run()
+        finally:
+            self._schedule()
+
+    def run(self):
+        """执行一次清理，返回删除的条数"""
+        try:
+            with self._app.app_context():
+                deleted = prune_change_log(self.retention_days, self.max_rows)
+        except Exception:
+            traceback.print_exc()
+            return 0
+        if deleted:
+            print(f"[变更日志] 已清理 {deleted} 条旧变更")
+        return deleted
+
+
+# 变更日志清理
+change_log_pruner = ChangeLogPruner()
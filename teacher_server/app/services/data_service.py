@@ -8,7 +8,11 @@ from app.models import (
     ThinkingQuestion, Photo, ChatMessage
 )
 from app.utils.validators import *
-from app.services.photo_service import save_photo_from_base64
+from app.utils.pinyin import get_name_initials
+from app.utils.cache import data_version
+from app.services.photo_service import save_photo_from_base64, discard_photos, discard_photo_files
+from app.services.live_service import publish_group_update, publish_group_deleted
+from app.services.stats_service import refresh_class_stats
 from pathlib import Path
 import os
 import sys
@@ -134,7 +138,8 @@ def find_or_create_student_group(data, submission_id=None):
                         member = GroupMember(
                             group_id=group.id,
                             member_index=index + 1,
-                            member_name=name
+                            member_name=name,
+                            name_initials=get_name_initials(name)
                         )
                         db.session.add(member)
                     
@@ -191,7 +196,8 @@ def find_or_create_student_group(data, submission_id=None):
             member = GroupMember(
                 group_id=group.id,
                 member_index=index + 1,
-                member_name=name
+                member_name=name,
+                name_initials=get_name_initials(name)
             )
             db.session.add(member)
         
@@ -246,7 +252,7 @@ def save_task1_data(group_id, data, submission_id, update_existing=False):
                 existing_task1.set_sensory_records(sensory_records)
                 
                 # 删除旧照片
-                Photo.query.filter_by(group_id=group_id, photo_type='task1').delete()
+                discard_photos(group_id, 'task1')
                 
                 # 保存新照片
                 photos = task1_data.get('photos', [])
@@ -309,7 +315,7 @@ def save_task2_data(group_id, data, submission_id, update_existing=False):
                 existing_task2.reflection_answer = task2_data.get('reflectionAnswer', '')
                 
                 # 删除旧照片
-                Photo.query.filter_by(group_id=group_id, photo_type='task2').delete()
+                discard_photos(group_id, 'task2')
                 
                 # 保存新照片
                 photos = task2_data.get('photos', [])
@@ -367,7 +373,7 @@ def save_thinking_question(group_id, question_type, answer, photos, submission_i
                 existing_thinking.answer = answer or ''
                 
                 # 删除旧照片
-                Photo.query.filter_by(group_id=group_id, photo_type=question_type).delete()
+                discard_photos(group_id, question_type)
                 
                 # 保存新照片
                 for index, photo_base64 in enumerate(photos):
@@ -511,8 +517,15 @@ def save_all_data(data, submission_id=None):
             chat_history = data.get('chatHistory', [])
             save_chat_messages(group.id, chat_history, update_existing=is_update)
         
+        # 刷新该班级的统计汇总（与业务数据同一事务提交）
+        refresh_class_stats(group.school, group.grade, group.class_number, group.activity_date)
+        
         # 提交事务
         db.session.commit()
+        data_version.bump()
+        
+        # 推送给正在查看列表页的教师
+        publish_group_update(group)
         
         final_message = "数据更新成功" if is_update else "数据保存成功"
         return True, final_message, result_submission_id
@@ -541,18 +554,21 @@ def delete_student_data(submission_id):
         if not group:
             return False, "学生数据不存在"
         
-        # 删除所有照片文件
-        for photo in group.photos:
-            try:
-                photo_path = Path(Config.UPLOAD_FOLDER) / Path(photo.file_path).name
-                if photo_path.exists():
-                    photo_path.unlink()
-            except Exception as e:
-                print(f"删除照片文件失败: {photo.file_path}, 错误: {e}")
+        # 照片文件在事务提交成功后删除（提交失败时照片仍然完整）
+        discard_photo_files(group.photos)
+        
+        # 记录班级信息，用于刷新统计和删除后推送
+        school, grade, class_number = group.school, group.grade, group.class_number
+        activity_date = group.activity_date
         
         # 删除数据库记录（级联删除会自动删除关联数据）
         db.session.delete(group)
+        db.session.flush()
+        refresh_class_stats(school, grade, class_number, activity_date)
         db.session.commit()
+        data_version.bump()
+        
+        publish_group_deleted(submission_id, school, grade, class_number)
         
         return True, "删除成功"
         
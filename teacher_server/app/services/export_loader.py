@@ -0,0 +1,183 @@
+"""
+导出数据加载服务
+先用一次查询按导出顺序取出全部学生组ID（只排序一次），再按ID分批读取学生组，
+每批的关联数据用 selectinload 以 IN 查询加载，写出后立即从会话中移除；
+每批都是按主键的短查询，查询次数和内存占用随数据量线性增长，不会因多个集合JOIN产生笛卡尔积，
+流式输出导出文件期间也不会一直占用数据库游标（SQLite上即一直持有读事务）
+
+导出文件使用 iter_export_rows：同样的分批方式，但直接执行 Core select()，
+结果构建为轻量的 ExportGroup 数据行，不创建ORM对象
+"""
+from datetime import datetime
+from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload
+from app import db
+from app.models import StudentGroup, GroupMember, Task1Data, Task2Data, ThinkingQuestion, ChatMessage
+from app.services.export_rows import ExportGroup, ExportTask1, ExportTask2
+
+# 每批加载的学生组数量
+DEFAULT_CHUNK_SIZE = 100
+
+# 排序键：未设置编号的小组排在最后；提交时间为空时视为最早
+_GROUP_NUMBER_KEY = func.coalesce(StudentGroup.group_number, 999999)
+_SUBMIT_TIME_KEY = func.coalesce(StudentGroup.submit_time, datetime(1970, 1, 1))
+
+# 导出时需要的关联数据
+_EXPORT_RELATIONS = (
+    StudentGroup.members,
+    StudentGroup.task1,
+    StudentGroup.task2,
+    StudentGroup.thinking_questions,
+    StudentGroup.chat_messages
+)
+
+# PDF报告还需要照片
+PDF_RELATIONS = _EXPORT_RELATIONS + (StudentGroup.photos,)
+
+
+def filter_export_query(query, school='', grade='', class_number=''):
+    """应用与列表页一致的筛选条件"""
+    if school:
+        query = query.filter(StudentGroup.school.contains(school))
+    if grade:
+        query = query.filter(StudentGroup.grade == grade)
+    if class_number:
+        query = query.filter(StudentGroup.class_number == class_number)
+    return query
+
+
+def count_export_groups(school='', grade='', class_number=''):
+    """统计符合筛选条件的学生组数量"""
+    query = filter_export_query(
+        db.session.query(func.count(StudentGroup.id)), school, grade, class_number
+    )
+    return query.scalar() or 0
+
+
+def _ordered_group_ids(school, grade, class_number):
+    """按导出顺序（编号升序、提交时间降序、ID降序）取出符合筛选条件的全部学生组ID"""
+    query = filter_export_query(db.session.query(StudentGroup.id), school, grade, class_number)
+    return [group_id for (group_id,) in query.order_by(
+        _GROUP_NUMBER_KEY.asc(),
+        _SUBMIT_TIME_KEY.desc(),
+        StudentGroup.id.desc()
+    )]
+
+
+def _id_batches(school, grade, class_number, chunk_size):
+    group_ids = _ordered_group_ids(school, grade, class_number)
+    for start in range(0, len(group_ids), chunk_size):
+        yield group_ids[start:start + chunk_size]
+
+
+def iter_export_groups(school='', grade='', class_number='', chunk_size=DEFAULT_CHUNK_SIZE, relations=_EXPORT_RELATIONS):
+    """
+    按导出顺序逐批产出学生组（关联数据已加载）
+
+    每批按ID取出 chunk_size 个小组，再对每个关联集合各执行一次 IN 查询；
+    一批产出完毕后将这些对象从会话中移除，下一批不会在身份映射中累积
+
+    Args:
+        school: 学校（模糊匹配）
+        grade: 年级
+        class_number: 班级
+        chunk_size: 每批数量
+        relations: 需要预加载的关联关系
+
+    Yields:
+        StudentGroup
+    """
+    options = [selectinload(relation) for relation in relations]
+
+    for group_ids in _id_batches(school, grade, class_number, chunk_size):
+        groups = StudentGroup.query.options(*options).filter(StudentGroup.id.in_(group_ids)).all()
+        groups_by_id = {group.id: group for group in groups}
+
+        # 按导出顺序产出（读取期间被删除的小组跳过）
+        for group_id in group_ids:
+            if group_id in groups_by_id:
+                yield groups_by_id[group_id]
+
+        # 释放本批对象（级联移除已加载的关联数据）
+        for group in groups:
+            if group in db.session:
+                db.session.expunge(group)
+        del groups, groups_by_id
+
+
+def _load_group_rows(group_ids):
+    """取出一批学生组的基本信息（Core查询，返回元组）"""
+    groups = StudentGroup.__table__.c
+    return db.session.execute(
+        select(
+            groups.id, groups.group_number, groups.school, groups.grade, groups.class_number,
+            groups.activity_date, groups.member_count, groups.submit_time
+        ).where(groups.id.in_(group_ids))
+    ).all()
+
+
+def _fill_chunk(rows_by_id):
+    """为一批学生组加载关联数据（每张表一次 IN 查询）"""
+    group_ids = list(rows_by_id)
+
+    members = GroupMember.__table__.c
+    for group_id, member_name in db.session.execute(
+        select(members.group_id, members.member_name)
+        .where(members.group_id.in_(group_ids))
+        .order_by(members.group_id, members.member_index)
+    ):
+        rows_by_id[group_id].members.append(member_name)
+
+    task1 = Task1Data.__table__.c
+    for row in db.session.execute(
+        select(
+            task1.group_id, task1.id, task1.tea_name, task1.teacher_tea_name, task1.tea_category,
+            task1.water_temperature, task1.brewing_duration, task1.sensory_records,
+            task1.reflection_answer, task1.submit_time
+        ).where(task1.group_id.in_(group_ids))
+    ):
+        rows_by_id[row[0]].task1 = ExportTask1(*row[1:])
+
+    task2 = Task2Data.__table__.c
+    for row in db.session.execute(
+        select(
+            task2.group_id, task2.id, task2.tea_name, task2.water_temperature, task2.steeping_duration,
+            task2.tea_color, task2.tea_aroma, task2.tea_taste, task2.meets_expectation,
+            task2.not_meets_expectation, task2.reflection_answer, task2.submit_time
+        ).where(task2.group_id.in_(group_ids))
+    ):
+        rows_by_id[row[0]].task2 = ExportTask2(*row[1:])
+
+    thinking = ThinkingQuestion.__table__.c
+    for group_id, question_type, answer in db.session.execute(
+        select(thinking.group_id, thinking.question_type, thinking.answer)
+        .where(thinking.group_id.in_(group_ids))
+        .order_by(thinking.id)
+    ):
+        rows_by_id[group_id].thinking[question_type] = answer
+
+    messages = ChatMessage.__table__.c
+    for group_id, message_index, role, content, submit_time in db.session.execute(
+        select(messages.group_id, messages.message_index, messages.role, messages.content, messages.submit_time)
+        .where(messages.group_id.in_(group_ids))
+        .order_by(messages.group_id, messages.message_index)
+    ):
+        rows_by_id[group_id].add_chat_message(message_index, role, content, submit_time)
+
+
+def iter_export_rows(school='', grade='', class_number='', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    按导出顺序逐批产出导出数据行（ExportGroup）
+
+    每批执行 1 + 5 次 Core 查询，不创建ORM对象；一批产出完毕后即可被回收
+
+    Yields:
+        ExportGroup
+    """
+    for group_ids in _id_batches(school, grade, class_number, chunk_size):
+        rows_by_id = {row[0]: ExportGroup(*row) for row in _load_group_rows(group_ids)}
+        _fill_chunk(rows_by_id)
+
+        for group_id in group_ids:
+            if group_id in rows_by_id:
+                yield rows_by_id[group_id]
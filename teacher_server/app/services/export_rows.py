@@ -0,0 +1,209 @@
+"""
+导出数据行模型
+不依赖ORM的轻量数据行（__slots__），由数据库查询结果直接构建；
+感官记录解析、思考题查找、提问数统计、字数统计等在构建时只计算一次，
+Excel、JSON、CSV 导出共用同一份数据
+"""
+import json
+
+# 感官记录的形态与属性（与任务一表头顺序一致）
+SENSORY_FORMS = ('dryTea', 'teaLiquor', 'spentLeaves')
+SENSORY_ATTRIBUTES = ('color', 'aroma', 'shape', 'taste')
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def _parse_sensory_records(text):
+    """解析感官记录JSON（格式错误时返回空字典）"""
+    if text:
+        try:
+            return json.loads(text)
+        except (TypeError, ValueError):
+            return {}
+    return {}
+
+
+class ExportTask1:
+    """任务一数据"""
+
+    __slots__ = (
+        'id', 'tea_name', 'teacher_tea_name', 'tea_category', 'water_temperature',
+        'brewing_duration', 'sensory_records', 'reflection_answer', 'submit_time',
+        'sensory', 'char_count'
+    )
+
+    def __init__(self, id, tea_name, teacher_tea_name, tea_category, water_temperature,
+                 brewing_duration, sensory_records, reflection_answer, submit_time):
+        self.id = id
+        self.tea_name = tea_name
+        self.teacher_tea_name = teacher_tea_name
+        self.tea_category = tea_category
+        self.water_temperature = water_temperature
+        self.brewing_duration = brewing_duration
+        self.sensory_records = _parse_sensory_records(sensory_records)
+        self.reflection_answer = reflection_answer
+        self.submit_time = submit_time
+
+        # 按表头顺序展开的12项感官记录
+        records = self.sensory_records
+        self.sensory = [
+            records.get(form, {}).get(attribute, '')
+            for form in SENSORY_FORMS
+            for attribute in SENSORY_ATTRIBUTES
+        ]
+
+        # 总字符数（与 StudentGroup.get_task1_char_count 的规则一致）
+        count = 0
+        for text in (tea_name, teacher_tea_name, reflection_answer):
+            if text:
+                count += len(text)
+        for value in records.values():
+            if value:
+                for sub_value in value.values():
+                    if sub_value:
+                        count += len(sub_value)
+        self.char_count = count
+
+    def to_dict(self):
+        """转换为字典（与 Task1Data.to_dict 一致）"""
+        return {
+            'id': self.id,
+            'tea_name': self.tea_name,
+            'teacher_tea_name': self.teacher_tea_name,
+            'tea_category': self.tea_category,
+            'water_temperature': self.water_temperature,
+            'brewing_duration': self.brewing_duration,
+            'sensory_records': self.sensory_records,
+            'reflection_answer': self.reflection_answer,
+            'submit_time': _isoformat(self.submit_time)
+        }
+
+
+class ExportTask2:
+    """任务二数据"""
+
+    __slots__ = (
+        'id', 'tea_name', 'water_temperature', 'steeping_duration',
+        'tea_color', 'tea_aroma', 'tea_taste',
+        'meets_expectation', 'not_meets_expectation',
+        'reflection_answer', 'submit_time', 'char_count'
+    )
+
+    def __init__(self, id, tea_name, water_temperature, steeping_duration, tea_color, tea_aroma,
+                 tea_taste, meets_expectation, not_meets_expectation, reflection_answer, submit_time):
+        self.id = id
+        self.tea_name = tea_name
+        self.water_temperature = water_temperature
+        self.steeping_duration = steeping_duration
+        self.tea_color = tea_color
+        self.tea_aroma = tea_aroma
+        self.tea_taste = tea_taste
+        self.meets_expectation = meets_expectation
+        self.not_meets_expectation = not_meets_expectation
+        self.reflection_answer = reflection_answer
+        self.submit_time = submit_time
+
+        # 总字符数（与 StudentGroup.get_task2_char_count 的规则一致）
+        self.char_count = sum(
+            len(text)
+            for text in (tea_name, tea_color, tea_aroma, tea_taste, reflection_answer)
+            if text
+        )
+
+    def to_dict(self):
+        """转换为字典（与 Task2Data.to_dict 一致）"""
+        return {
+            'id': self.id,
+            'tea_name': self.tea_name,
+            'water_temperature': self.water_temperature,
+            'steeping_duration': self.steeping_duration,
+            'tea_color': self.tea_color,
+            'tea_aroma': self.tea_aroma,
+            'tea_taste': self.tea_taste,
+            'meets_expectation': self.meets_expectation,
+            'not_meets_expectation': self.not_meets_expectation,
+            'reflection_answer': self.reflection_answer,
+            'submit_time': _isoformat(self.submit_time)
+        }
+
+
+class ExportGroup:
+    """
+    单个学生组的导出数据
+
+    members: 成员姓名列表（按成员序号）
+    thinking: {question_type: answer}
+    chat_messages: [(message_index, role, content, submit_time), ...]（按对话顺序）
+    """
+
+    __slots__ = (
+        'id', 'group_number', 'school', 'grade', 'class_number', 'activity_date',
+        'member_count', 'submit_time', 'members', 'task1', 'task2', 'thinking',
+        'chat_messages', 'user_question_count', 'assistant_count'
+    )
+
+    def __init__(self, id, group_number, school, grade, class_number, activity_date, member_count, submit_time):
+        self.id = id
+        self.group_number = group_number
+        self.school = school
+        self.grade = grade
+        self.class_number = class_number
+        self.activity_date = activity_date
+        self.member_count = member_count
+        self.submit_time = submit_time
+        self.members = []
+        self.task1 = None
+        self.task2 = None
+        self.thinking = {}
+        self.chat_messages = []
+        self.user_question_count = 0
+        self.assistant_count = 0
+
+    def add_chat_message(self, message_index, role, content, submit_time):
+        """追加一条对话（需按对话顺序调用）"""
+        self.chat_messages.append((message_index, role, content, submit_time))
+        if role == 'user':
+            self.user_question_count += 1
+        elif role == 'assistant':
+            self.assistant_count += 1
+
+    @classmethod
+    def from_model(cls, group):
+        """由已加载关联数据的 StudentGroup 对象构建（用于传入ORM对象的调用方）"""
+        row = cls(
+            group.id, group.group_number, group.school, group.grade, group.class_number,
+            group.activity_date, group.member_count, group.submit_time
+        )
+        row.members = [m.member_name for m in sorted(group.members, key=lambda m: m.member_index)]
+
+        task1 = group.task1
+        if task1:
+            row.task1 = ExportTask1(
+                task1.id, task1.tea_name, task1.teacher_tea_name, task1.tea_category,
+                task1.water_temperature, task1.brewing_duration, task1.sensory_records,
+                task1.reflection_answer, task1.submit_time
+            )
+
+        task2 = group.task2
+        if task2:
+            row.task2 = ExportTask2(
+                task2.id, task2.tea_name, task2.water_temperature, task2.steeping_duration,
+                task2.tea_color, task2.tea_aroma, task2.tea_taste, task2.meets_expectation,
+                task2.not_meets_expectation, task2.reflection_answer, task2.submit_time
+            )
+
+        row.thinking = {t.question_type: t.answer for t in group.thinking_questions}
+
+        for msg in sorted(group.chat_messages, key=lambda m: m.message_index):
+            row.add_chat_message(msg.message_index, msg.role, msg.content, msg.submit_time)
+
+        return row
+
+
+def as_export_group(group):
+    """统一转换为 ExportGroup（已是 ExportGroup 时原样返回）"""
+    if isinstance(group, ExportGroup):
+        return group
+    return ExportGroup.from_model(group)
@@ -1,14 +1,120 @@
 """
 数据导出服务
 支持导出为Excel、CSV、JSON格式
+Excel使用只写模式（write-only）和预定义命名样式，逐行写出，内存占用与数据量无关
+CSV按数据表分别生成，打包为ZIP逐个条目流式写出
+JSONL分片按字节数或估算的token数切分，各分片并行压缩并计算校验和，附带清单文件（manifest.json）
+各格式共用 ExportGroup 数据行（见 export_rows），传入ORM对象时自动转换
 """
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.utils import get_column_letter
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 import csv
+import gzip
+import hashlib
+import io
 import json
-from app.models import StudentGroup, ChatMessage
+import zipfile
+from app.services.export_rows import as_export_group
+from app.utils.streaming import iter_writer
+
+# 各工作表表头
+STUDENT_INFO_HEADERS = [
+    '小组编号', '学校', '年级', '班级', '活动日期', '成员人数', 
+    '成员姓名', '提交时间', '任务一完成', '任务二完成', 
+    '思考题一完成', '思考题二完成', '创意题完成', '茶助教提问数'
+]
+TASK1_HEADERS = [
+    '小组编号', '学校', '年级', '班级', '茶品名', '老师茶品名', '茶类',
+    '水温', '冲泡时长', 
+    '干茶-色泽', '干茶-香气', '干茶-形状', '干茶-滋味',
+    '茶汤-色泽', '茶汤-香气', '茶汤-形状', '茶汤-滋味',
+    '叶底-色泽', '叶底-香气', '叶底-形状', '叶底-滋味',
+    '思考题答案', '答案字数'
+]
+TASK2_HEADERS = [
+    '小组编号', '学校', '年级', '班级', '茶品名', '水温', '出汤时长',
+    '茶汤-色泽', '茶汤-香气', '茶汤-滋味',
+    '符合预期', '不符合预期', '思考题答案', '答案字数'
+]
+THINKING_HEADERS = [
+    '小组编号', '学校', '年级', '班级',
+    '思考题一答案', '思考题一字数',
+    '思考题二答案', '思考题二字数',
+    '创意题答案', '创意题字数',
+    '总字数'
+]
+CHAT_HEADERS = [
+    '小组编号', '学校', '年级', '班级', '对话序号', 
+    '角色', '消息内容', '消息长度', '提交时间'
+]
+SUMMARY_HEADERS = ['学校', '年级', '班级', '提交组数', '任务一完成', '任务二完成', '平均提问数']
+
+# 各工作表列宽
+STUDENT_INFO_WIDTHS = [12, 20, 10, 10, 15, 12, 30, 20, 15, 15, 15, 15, 15, 15]
+TASK1_WIDTHS = [15] * 21 + [50, 15]  # 思考题答案列加宽
+TASK2_WIDTHS = [15] * 12 + [50, 15]  # 思考题答案列加宽
+THINKING_WIDTHS = [12, 20, 10, 10, 50, 12, 50, 12, 50, 12, 12]
+CHAT_WIDTHS = [12, 20, 10, 10, 12, 12, 80, 12, 20]  # 消息内容列加宽
+SUMMARY_WIDTHS = [20, 12, 12, 12, 15, 15, 15]
+
+# 各导出格式：(MIME类型, 文件扩展名)
+EXPORT_FORMATS = {
+    'excel': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
+    'json': ('application/json', '.json'),
+    'ndjson': ('application/x-ndjson', '.ndjson'),
+    'csv': ('application/zip', '_csv.zip'),
+    'jsonl_shards': ('application/zip', '_jsonl.zip'),
+    'pdf_zip': ('application/zip', '_pdf.zip'),  # 各小组PDF报告（由 pdf_batch_service 生成）
+    'class_pdf': ('application/pdf', '_班级报告.pdf'),  # 合并的班级报告（由 pdf_service 生成）
+}
+
+# CSV导出包含的数据表：(ZIP内文件名, 表头, 行生成方法名)
+CSV_TABLES = [
+    ('students.csv', STUDENT_INFO_HEADERS, '_student_info_rows'),
+    ('task1.csv', TASK1_HEADERS, '_task1_rows'),
+    ('task2.csv', TASK2_HEADERS, '_task2_rows'),
+    ('thinking_questions.csv', THINKING_HEADERS, '_thinking_rows'),
+    ('chat_messages.csv', CHAT_HEADERS, '_chat_rows'),
+]
+
+
+def estimate_tokens(text):
+    """
+    估算文本的token数（不依赖具体分词器的保守估计）
+    中日韩文字及全角符号每个字符按1个token计，其余字符按每4个字符1个token计
+    """
+    wide = sum(1 for ch in text if ch >= '\u2e80')
+    return wide + (len(text) - wide + 3) // 4
+
+
+def _build_shard(index, lines, tokens=None):
+    """
+    压缩一个分片并计算校验和（未限制token数时在此估算）（在线程池中执行，zlib和hashlib计算时释放GIL）
+    
+    Returns:
+        (分片清单信息, 压缩后的内容)
+    """
+    data = b''.join(lines)
+    if tokens is None:
+        tokens = estimate_tokens(data.decode('utf-8'))
+    compressed = gzip.compress(data, compresslevel=6, mtime=0)
+    return {
+        'file': f'shard-{index:05d}.jsonl.gz',
+        'index': index,
+        'group_count': len(lines),
+        'bytes': len(data),
+        'compressed_bytes': len(compressed),
+        'estimated_tokens': tokens,
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'compressed_sha256': hashlib.sha256(compressed).hexdigest()
+    }, compressed
+
 
 class DataExportService:
     """数据导出服务类"""
@@ -21,495 +127,571 @@ class DataExportService:
             bottom=Side(style='thin')
         )
         self.header_fill = PatternFill(start_color='4CAF50', end_color='4CAF50', fill_type='solid')
+        self.chat_header_fill = PatternFill(start_color='9C27B0', end_color='9C27B0', fill_type='solid')
         self.header_font = Font(bold=True, color='FFFFFF', size=11)
     
-    def export_to_excel(self, groups, output_path=None):
-        """导出为Excel格式（推荐）"""
-        wb = Workbook()
-        
-        # 删除默认工作表
-        wb.remove(wb.active)
-        
-        # 1. 数据统计摘要
-        self._create_summary_sheet(wb, groups)
-        
-        # 2. 学生基本信息
-        self._create_student_info_sheet(wb, groups)
-        
-        # 3. 任务一数据
-        self._create_task1_sheet(wb, groups)
-        
-        # 4. 任务二数据
-        self._create_task2_sheet(wb, groups)
-        
-        # 5. 思考题数据
-        self._create_thinking_sheet(wb, groups)
-        
-        # 6. 茶助教问答记录
-        self._create_chat_sheet(wb, groups)
-        
-        # 保存文件
+    def write_export(self, export_format, groups_factory, fileobj, class_stats=None, total=None, options=None):
+        """
+        按格式将导出文件写入文件对象（用于后台导出任务）
+        
+        Args:
+            export_format: excel / json / ndjson / csv / jsonl_shards
+            groups_factory: 无参函数，每次调用返回一个新的学生组迭代器（CSV每个文件遍历一次）
+            fileobj: 可写的二进制文件对象
+            class_stats: Excel摘要页使用的班级统计
+            total: 数据总数
+            options: 格式相关的参数（JSONL分片：max_bytes / max_tokens / workers）
+        """
+        if export_format == 'excel':
+            self.write_excel(groups_factory(), fileobj, class_stats=class_stats, total=total)
+        elif export_format == 'csv':
+            self.write_csv_zip(groups_factory, fileobj)
+        elif export_format == 'jsonl_shards':
+            self.write_jsonl_shards(groups_factory(), fileobj, **(options or {}))
+        elif export_format == 'ndjson':
+            for chunk in self.iter_ndjson(groups_factory()):
+                fileobj.write(chunk.encode('utf-8'))
+        elif export_format == 'json':
+            for chunk in self.iter_json(groups_factory(), total=total):
+                fileobj.write(chunk.encode('utf-8'))
+        else:
+            raise ValueError(f'不支持的导出格式: {export_format}')
+    
+    def export_to_excel(self, groups, output_path=None, class_stats=None, total=None):
+        """
+        导出为Excel格式（推荐）
+        
+        Args:
+            groups: ExportGroup或StudentGroup对象的列表或迭代器
+            output_path: 输出路径，如果为None则自动生成
+            class_stats: 按班级汇总的统计（来自 class_stats 汇总表），为None时根据groups计算
+            total: 数据总数，groups为迭代器时需要提供
+        """
         if output_path is None:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             output_path = f'茶文化课程数据_{timestamp}.xlsx'
         
-        wb.save(output_path)
+        with open(output_path, 'wb') as f:
+            self.write_excel(groups, f, class_stats=class_stats, total=total)
+        
         return output_path
     
-    def _create_summary_sheet(self, wb, groups):
-        """创建数据统计摘要工作表"""
-        ws = wb.create_sheet('数据统计摘要', 0)  # 放在第一个位置
+    def iter_excel(self, groups, class_stats=None, total=None, app=None):
+        """
+        流式生成Excel文件内容（用于HTTP流式响应）
+        
+        Args:
+            app: Flask应用，groups在生成过程中需要访问数据库时提供
+        
+        Yields:
+            bytes
+        """
+        return iter_writer(
+            lambda f: self.write_excel(groups, f, class_stats=class_stats, total=total),
+            app=app
+        )
+    
+    def write_excel(self, groups, fileobj, class_stats=None, total=None):
+        """
+        将Excel写入文件对象（只写模式，所有工作表在一次遍历中逐行写出）
+        
+        Args:
+            groups: ExportGroup或StudentGroup对象的列表或迭代器
+            fileobj: 可写的文件对象（支持不可seek的流）
+            class_stats: 按班级汇总的统计，为None时根据groups计算
+            total: 数据总数，为None时使用len(groups)
+        """
+        groups = map(as_export_group, groups)
+        if class_stats is None or total is None:
+            groups = list(groups)
+            if class_stats is None:
+                class_stats = self._collect_class_stats(groups)
+            if total is None:
+                total = len(groups)
+        
+        wb = Workbook(write_only=True)
+        self._register_styles(wb)
         
-        # 标题
-        ws.merge_cells('A1:D1')
-        title_cell = ws['A1']
-        title_cell.value = '茶文化课程数据统计摘要'
-        title_cell.font = Font(bold=True, size=16, color='2E7D32')
-        title_cell.alignment = Alignment(horizontal='center', vertical='center')
-        ws.row_dimensions[1].height = 30
+        # 1. 数据统计摘要
+        self._write_summary_sheet(wb, class_stats, total)
+        
+        # 2-6. 各数据工作表：(工作表, 行生成函数)
+        sheets = [
+            (self._create_sheet(wb, '学生基本信息', STUDENT_INFO_HEADERS, STUDENT_INFO_WIDTHS),
+             self._student_info_rows),
+            (self._create_sheet(wb, '任务一-泡茶体验', TASK1_HEADERS, TASK1_WIDTHS),
+             self._task1_rows),
+            (self._create_sheet(wb, '任务二-泡出心中茶', TASK2_HEADERS, TASK2_WIDTHS),
+             self._task2_rows),
+            (self._create_sheet(wb, '思考题', THINKING_HEADERS, THINKING_WIDTHS),
+             self._thinking_rows),
+            (self._create_sheet(wb, '茶助教问答记录', CHAT_HEADERS, CHAT_WIDTHS, header_style='chat_header'),
+             self._chat_rows),
+        ]
         
-        # 导出信息
-        ws['A3'] = '导出时间：'
-        ws['B3'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        ws['A4'] = '数据总数：'
-        ws['B4'] = len(groups)
-        ws['A3'].font = Font(bold=True)
-        ws['A4'].font = Font(bold=True)
-        
-        # 按班级统计
-        ws['A7'] = '按班级统计'
-        ws['A7'].font = Font(bold=True, size=14, color='2E7D32')
-        
-        headers = ['学校', '年级', '班级', '提交组数', '任务一完成', '任务二完成', '平均提问数']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(8, col)
-            cell.value = header
-            cell.font = self.header_font
-            cell.fill = self.header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = self.thin_border
-        
-        # 按班级分组统计
+        for group in groups:
+            for ws, build_rows in sheets:
+                for row in build_rows(group):
+                    ws.append(self._styled_row(ws, row, 'data_cell'))
+        
+        wb.save(fileobj)
+    
+    def _register_styles(self, wb):
+        """注册命名样式（每个单元格只引用样式名，不再逐个创建样式对象）"""
+        center = Alignment(horizontal='center', vertical='center')
+        
+        header = NamedStyle(name='header')
+        header.font = self.header_font
+        header.fill = self.header_fill
+        header.alignment = center
+        header.border = self.thin_border
+        wb.add_named_style(header)
+        
+        chat_header = NamedStyle(name='chat_header')
+        chat_header.font = self.header_font
+        chat_header.fill = self.chat_header_fill
+        chat_header.alignment = center
+        chat_header.border = self.thin_border
+        wb.add_named_style(chat_header)
+        
+        data_cell = NamedStyle(name='data_cell')
+        data_cell.border = self.thin_border
+        data_cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        wb.add_named_style(data_cell)
+        
+        summary_cell = NamedStyle(name='summary_cell')
+        summary_cell.border = self.thin_border
+        summary_cell.alignment = center
+        wb.add_named_style(summary_cell)
+        
+        title = NamedStyle(name='title')
+        title.font = Font(bold=True, size=16, color='2E7D32')
+        title.alignment = Alignment(horizontal='left', vertical='center')
+        wb.add_named_style(title)
+        
+        section = NamedStyle(name='section')
+        section.font = Font(bold=True, size=14, color='2E7D32')
+        wb.add_named_style(section)
+        
+        label = NamedStyle(name='label')
+        label.font = Font(bold=True)
+        wb.add_named_style(label)
+    
+    def _styled_row(self, ws, values, style):
+        """将一行数据包装为带命名样式的只写单元格"""
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style
+            row.append(cell)
+        return row
+    
+    def _create_sheet(self, wb, title, headers, widths, header_style='header'):
+        """创建工作表，设置列宽并写入表头"""
+        ws = wb.create_sheet(title)
+        for col, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(col)].width = width
+        ws.append(self._styled_row(ws, headers, header_style))
+        return ws
+    
+    def _collect_class_stats(self, groups):
+        """根据已加载的学生组在内存中按班级统计（未提供汇总统计时使用）"""
         class_stats = {}
         for group in groups:
             key = (group.school, group.grade, group.class_number)
             if key not in class_stats:
                 class_stats[key] = {
-                    'count': 0,
+                    'school': group.school,
+                    'grade': group.grade,
+                    'class_number': group.class_number,
+                    'groups': 0,
                     'task1': 0,
                     'task2': 0,
-                    'questions': 0
+                    'user_questions': 0
                 }
             
-            class_stats[key]['count'] += 1
+            class_stats[key]['groups'] += 1
             if group.task1:
                 class_stats[key]['task1'] += 1
             if group.task2:
                 class_stats[key]['task2'] += 1
-            class_stats[key]['questions'] += len([m for m in group.chat_messages if m.role == 'user'])
-        
-        row_num = 9
-        for (school, grade, class_num), stats in sorted(class_stats.items()):
-            avg_questions = stats['questions'] / stats['count'] if stats['count'] > 0 else 0
-            ws.cell(row_num, 1).value = school
-            ws.cell(row_num, 2).value = grade
-            ws.cell(row_num, 3).value = class_num
-            ws.cell(row_num, 4).value = stats['count']
-            ws.cell(row_num, 5).value = stats['task1']
-            ws.cell(row_num, 6).value = stats['task2']
-            ws.cell(row_num, 7).value = round(avg_questions, 1)
-            
-            # 设置边框
-            for col in range(1, 8):
-                ws.cell(row_num, col).border = self.thin_border
-                ws.cell(row_num, col).alignment = Alignment(horizontal='center', vertical='center')
-            
-            row_num += 1
-        
-        # 调整列宽
-        ws.column_dimensions['A'].width = 20
-        ws.column_dimensions['B'].width = 12
-        ws.column_dimensions['C'].width = 12
-        ws.column_dimensions['D'].width = 12
-        ws.column_dimensions['E'].width = 15
-        ws.column_dimensions['F'].width = 15
-        ws.column_dimensions['G'].width = 15
+            class_stats[key]['user_questions'] += group.user_question_count
+        
+        return [class_stats[key] for key in sorted(class_stats)]
     
-    def _create_student_info_sheet(self, wb, groups):
-        """创建学生基本信息工作表"""
-        ws = wb.create_sheet('学生基本信息')
-        
-        # 表头
-        headers = [
-            '小组编号', '学校', '年级', '班级', '活动日期', '成员人数', 
-            '成员姓名', '提交时间', '任务一完成', '任务二完成', 
-            '思考题一完成', '思考题二完成', '创意题完成', '茶助教提问数'
-        ]
-        ws.append(headers)
+    def _write_summary_sheet(self, wb, class_stats, total):
+        """创建数据统计摘要工作表"""
+        ws = wb.create_sheet('数据统计摘要')
+        for col, width in enumerate(SUMMARY_WIDTHS, 1):
+            ws.column_dimensions[get_column_letter(col)].width = width
         
-        # 设置表头样式
-        for col in range(1, len(headers) + 1):
-            cell = ws.cell(1, col)
-            cell.font = self.header_font
-            cell.fill = self.header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = self.thin_border
+        # 标题
+        ws.append(self._styled_row(ws, ['茶文化课程数据统计摘要'], 'title'))
+        ws.append([])
         
-        # 数据行
-        for group in groups:
-            member_names = ', '.join([m.member_name for m in group.members])
-            
-            # 统计完成情况
-            task1_done = '是' if group.task1 else '否'
-            task2_done = '是' if group.task2 else '否'
-            thinking1_done = '是' if any(t.question_type == 'thinking1' for t in group.thinking_questions) else '否'
-            thinking2_done = '是' if any(t.question_type == 'thinking2' for t in group.thinking_questions) else '否'
-            creative_done = '是' if any(t.question_type == 'creative' for t in group.thinking_questions) else '否'
-            
-            # 茶助教提问数
-            chat_count = len([m for m in group.chat_messages if m.role == 'user'])
-            
-            row = [
-                group.group_number or '',
-                group.school,
-                group.grade,
-                group.class_number,
-                group.activity_date.strftime('%Y-%m-%d') if group.activity_date else '',
-                group.member_count,
-                member_names,
-                group.submit_time.strftime('%Y-%m-%d %H:%M:%S') if group.submit_time else '',
-                task1_done,
-                task2_done,
-                thinking1_done,
-                thinking2_done,
-                creative_done,
-                chat_count
-            ]
-            ws.append(row)
-            
-            # 设置数据行样式
-            row_num = ws.max_row
-            for col in range(1, len(headers) + 1):
-                cell = ws.cell(row_num, col)
-                cell.border = self.thin_border
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        # 调整列宽
-        ws.column_dimensions['A'].width = 12
-        ws.column_dimensions['B'].width = 20
-        ws.column_dimensions['C'].width = 10
-        ws.column_dimensions['D'].width = 10
-        ws.column_dimensions['E'].width = 15
-        ws.column_dimensions['F'].width = 12
-        ws.column_dimensions['G'].width = 30
-        ws.column_dimensions['H'].width = 20
-        ws.column_dimensions['I'].width = 15
-        ws.column_dimensions['J'].width = 15
-        ws.column_dimensions['K'].width = 15
-        ws.column_dimensions['L'].width = 15
-        ws.column_dimensions['M'].width = 15
-        ws.column_dimensions['N'].width = 15
+        # 导出信息
+        ws.append(self._styled_row(ws, ['导出时间：'], 'label') + [datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
+        ws.append(self._styled_row(ws, ['数据总数：'], 'label') + [total])
+        ws.append([])
+        ws.append([])
+        
+        # 按班级统计（优先使用 class_stats 汇总表的SQL聚合结果）
+        ws.append(self._styled_row(ws, ['按班级统计'], 'section'))
+        ws.append(self._styled_row(ws, SUMMARY_HEADERS, 'header'))
+        
+        for stats in class_stats:
+            avg_questions = stats['user_questions'] / stats['groups'] if stats['groups'] > 0 else 0
+            ws.append(self._styled_row(ws, [
+                stats['school'],
+                stats['grade'],
+                stats['class_number'],
+                stats['groups'],
+                stats['task1'],
+                stats['task2'],
+                round(avg_questions, 1)
+            ], 'summary_cell'))
     
-    def _create_task1_sheet(self, wb, groups):
-        """创建任务一数据工作表"""
-        ws = wb.create_sheet('任务一-泡茶体验')
-        
-        headers = [
-            '小组编号', '学校', '年级', '班级', '茶品名', '老师茶品名', '茶类',
-            '水温', '冲泡时长', 
-            '干茶-色泽', '干茶-香气', '干茶-形状', '干茶-滋味',
-            '茶汤-色泽', '茶汤-香气', '茶汤-形状', '茶汤-滋味',
-            '叶底-色泽', '叶底-香气', '叶底-形状', '叶底-滋味',
-            '思考题答案', '答案字数'
+    def _student_info_rows(self, group):
+        """学生基本信息工作表的数据行"""
+        question_types = group.thinking
+        
+        yield [
+            group.group_number or '',
+            group.school,
+            group.grade,
+            group.class_number,
+            group.activity_date.strftime('%Y-%m-%d') if group.activity_date else '',
+            group.member_count,
+            ', '.join(group.members),
+            group.submit_time.strftime('%Y-%m-%d %H:%M:%S') if group.submit_time else '',
+            '是' if group.task1 else '否',
+            '是' if group.task2 else '否',
+            '是' if 'thinking1' in question_types else '否',
+            '是' if 'thinking2' in question_types else '否',
+            '是' if 'creative' in question_types else '否',
+            group.user_question_count
         ]
-        ws.append(headers)
-        
-        # 设置表头样式
-        for col in range(1, len(headers) + 1):
-            cell = ws.cell(1, col)
-            cell.font = self.header_font
-            cell.fill = self.header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = self.thin_border
-        
-        # 数据行
-        for group in groups:
-            if not group.task1:
-                continue
-            
-            task1 = group.task1
-            records = task1.get_sensory_records()
-            
-            row = [
-                group.group_number or '',
-                group.school,
-                group.grade,
-                group.class_number,
-                task1.tea_name or '',
-                task1.teacher_tea_name or '',
-                task1.tea_category or '',
-                task1.water_temperature or '',
-                task1.brewing_duration or '',
-                records.get('dryTea', {}).get('color', ''),
-                records.get('dryTea', {}).get('aroma', ''),
-                records.get('dryTea', {}).get('shape', ''),
-                records.get('dryTea', {}).get('taste', ''),
-                records.get('teaLiquor', {}).get('color', ''),
-                records.get('teaLiquor', {}).get('aroma', ''),
-                records.get('teaLiquor', {}).get('shape', ''),
-                records.get('teaLiquor', {}).get('taste', ''),
-                records.get('spentLeaves', {}).get('color', ''),
-                records.get('spentLeaves', {}).get('aroma', ''),
-                records.get('spentLeaves', {}).get('shape', ''),
-                records.get('spentLeaves', {}).get('taste', ''),
-                task1.reflection_answer or '',
-                len(task1.reflection_answer) if task1.reflection_answer else 0
-            ]
-            ws.append(row)
-            
-            # 设置数据行样式
-            row_num = ws.max_row
-            for col in range(1, len(headers) + 1):
-                cell = ws.cell(row_num, col)
-                cell.border = self.thin_border
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        # 调整列宽
-        for col in range(1, 22):
-            ws.column_dimensions[chr(64 + col)].width = 15
-        ws.column_dimensions['V'].width = 50  # 思考题答案列
     
-    def _create_task2_sheet(self, wb, groups):
-        """创建任务二数据工作表"""
-        ws = wb.create_sheet('任务二-泡出心中茶')
-        
-        headers = [
-            '小组编号', '学校', '年级', '班级', '茶品名', '水温', '出汤时长',
-            '茶汤-色泽', '茶汤-香气', '茶汤-滋味',
-            '符合预期', '不符合预期', '思考题答案', '答案字数'
+    def _task1_rows(self, group):
+        """任务一工作表的数据行"""
+        if not group.task1:
+            return
+        
+        task1 = group.task1
+        
+        yield [
+            group.group_number or '',
+            group.school,
+            group.grade,
+            group.class_number,
+            task1.tea_name or '',
+            task1.teacher_tea_name or '',
+            task1.tea_category or '',
+            task1.water_temperature or '',
+            task1.brewing_duration or '',
+            *task1.sensory,
+            task1.reflection_answer or '',
+            len(task1.reflection_answer) if task1.reflection_answer else 0
         ]
-        ws.append(headers)
-        
-        # 设置表头样式
-        for col in range(1, len(headers) + 1):
-            cell = ws.cell(1, col)
-            cell.font = self.header_font
-            cell.fill = self.header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = self.thin_border
-        
-        # 数据行
-        for group in groups:
-            if not group.task2:
-                continue
-            
-            task2 = group.task2
-            
-            row = [
-                group.group_number or '',
-                group.school,
-                group.grade,
-                group.class_number,
-                task2.tea_name or '',
-                task2.water_temperature or '',
-                task2.steeping_duration or '',
-                task2.tea_color or '',
-                task2.tea_aroma or '',
-                task2.tea_taste or '',
-                '是' if task2.meets_expectation else '否',
-                '是' if task2.not_meets_expectation else '否',
-                task2.reflection_answer or '',
-                len(task2.reflection_answer) if task2.reflection_answer else 0
-            ]
-            ws.append(row)
-            
-            # 设置数据行样式
-            row_num = ws.max_row
-            for col in range(1, len(headers) + 1):
-                cell = ws.cell(row_num, col)
-                cell.border = self.thin_border
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        # 调整列宽
-        for col in range(1, len(headers) + 1):
-            ws.column_dimensions[chr(64 + col)].width = 15
-        ws.column_dimensions['M'].width = 50  # 思考题答案列
     
-    def _create_thinking_sheet(self, wb, groups):
-        """创建思考题数据工作表"""
-        ws = wb.create_sheet('思考题')
-        
-        headers = [
-            '小组编号', '学校', '年级', '班级',
-            '思考题一答案', '思考题一字数',
-            '思考题二答案', '思考题二字数',
-            '创意题答案', '创意题字数',
-            '总字数'
+    def _task2_rows(self, group):
+        """任务二工作表的数据行"""
+        if not group.task2:
+            return
+        
+        task2 = group.task2
+        
+        yield [
+            group.group_number or '',
+            group.school,
+            group.grade,
+            group.class_number,
+            task2.tea_name or '',
+            task2.water_temperature or '',
+            task2.steeping_duration or '',
+            task2.tea_color or '',
+            task2.tea_aroma or '',
+            task2.tea_taste or '',
+            '是' if task2.meets_expectation else '否',
+            '是' if task2.not_meets_expectation else '否',
+            task2.reflection_answer or '',
+            len(task2.reflection_answer) if task2.reflection_answer else 0
         ]
-        ws.append(headers)
-        
-        # 设置表头样式
-        for col in range(1, len(headers) + 1):
-            cell = ws.cell(1, col)
-            cell.font = self.header_font
-            cell.fill = self.header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = self.thin_border
-        
-        # 数据行
-        for group in groups:
-            thinking1 = next((t for t in group.thinking_questions if t.question_type == 'thinking1'), None)
-            thinking2 = next((t for t in group.thinking_questions if t.question_type == 'thinking2'), None)
-            creative = next((t for t in group.thinking_questions if t.question_type == 'creative'), None)
-            
-            thinking1_answer = thinking1.answer if thinking1 else ''
-            thinking2_answer = thinking2.answer if thinking2 else ''
-            creative_answer = creative.answer if creative else ''
-            
-            thinking1_len = len(thinking1_answer)
-            thinking2_len = len(thinking2_answer)
-            creative_len = len(creative_answer)
-            total_len = thinking1_len + thinking2_len + creative_len
+    
+    def _thinking_rows(self, group):
+        """思考题工作表的数据行"""
+        answers = group.thinking
+        
+        thinking1_answer = answers.get('thinking1') or ''
+        thinking2_answer = answers.get('thinking2') or ''
+        creative_answer = answers.get('creative') or ''
+        
+        thinking1_len = len(thinking1_answer)
+        thinking2_len = len(thinking2_answer)
+        creative_len = len(creative_answer)
+        total_len = thinking1_len + thinking2_len + creative_len
+        
+        yield [
+            group.group_number or '',
+            group.school,
+            group.grade,
+            group.class_number,
+            thinking1_answer,
+            thinking1_len,
+            thinking2_answer,
+            thinking2_len,
+            creative_answer,
+            creative_len,
+            total_len
+        ]
+    
+    def _chat_rows(self, group):
+        """茶助教问答记录工作表的数据行"""
+        for message_index, role, content, submit_time in group.chat_messages:
+            role_name = '学生' if role == 'user' else '茶助教'
             
-            row = [
+            yield [
                 group.group_number or '',
                 group.school,
                 group.grade,
                 group.class_number,
-                thinking1_answer,
-                thinking1_len,
-                thinking2_answer,
-                thinking2_len,
-                creative_answer,
-                creative_len,
-                total_len
+                message_index + 1,
+                role_name,
+                content,
+                len(content),
+                submit_time.strftime('%Y-%m-%d %H:%M:%S') if submit_time else ''
             ]
-            ws.append(row)
-            
-            # 设置数据行样式
-            row_num = ws.max_row
-            for col in range(1, len(headers) + 1):
-                cell = ws.cell(row_num, col)
-                cell.border = self.thin_border
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        # 调整列宽
-        ws.column_dimensions['A'].width = 12
-        ws.column_dimensions['B'].width = 20
-        ws.column_dimensions['C'].width = 10
-        ws.column_dimensions['D'].width = 10
-        ws.column_dimensions['E'].width = 50
-        ws.column_dimensions['F'].width = 12
-        ws.column_dimensions['G'].width = 50
-        ws.column_dimensions['H'].width = 12
-        ws.column_dimensions['I'].width = 50
-        ws.column_dimensions['J'].width = 12
-        ws.column_dimensions['K'].width = 12
     
-    def _create_chat_sheet(self, wb, groups):
-        """创建茶助教问答记录工作表"""
-        ws = wb.create_sheet('茶助教问答记录')
-        
-        headers = [
-            '小组编号', '学校', '年级', '班级', '对话序号', 
-            '角色', '消息内容', '消息长度', '提交时间'
-        ]
-        ws.append(headers)
+    def export_to_csv_zip(self, groups, output_path=None):
+        """
+        导出为CSV压缩包（每个数据表一个CSV文件）
+        
+        Args:
+            groups: ExportGroup或StudentGroup对象的列表
+            output_path: 输出路径，如果为None则自动生成
+        """
+        if output_path is None:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            output_path = f'茶文化课程数据_{timestamp}.zip'
         
-        # 设置表头样式
-        for col in range(1, len(headers) + 1):
-            cell = ws.cell(1, col)
-            cell.font = self.header_font
-            cell.fill = PatternFill(start_color='9C27B0', end_color='9C27B0', fill_type='solid')
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = self.thin_border
+        with open(output_path, 'wb') as f:
+            self.write_csv_zip(lambda: groups, f)
         
-        # 数据行
-        for group in groups:
-            chat_messages = sorted(group.chat_messages, key=lambda x: x.message_index)
-            
-            for msg in chat_messages:
-                role_name = '学生' if msg.role == 'user' else '茶助教'
-                
-                row = [
-                    group.group_number or '',
-                    group.school,
-                    group.grade,
-                    group.class_number,
-                    msg.message_index + 1,
-                    role_name,
-                    msg.content,
-                    len(msg.content),
-                    msg.submit_time.strftime('%Y-%m-%d %H:%M:%S') if msg.submit_time else ''
-                ]
-                ws.append(row)
+        return output_path
+    
+    def iter_csv_zip(self, groups_factory, app=None):
+        """
+        流式生成CSV压缩包内容（用于HTTP流式响应）
+        
+        Args:
+            groups_factory: 无参函数，每次调用返回一个新的ExportGroup/StudentGroup迭代器（每个CSV文件遍历一次）
+            app: Flask应用，groups_factory需要访问数据库时提供
+        
+        Yields:
+            bytes
+        """
+        return iter_writer(lambda f: self.write_csv_zip(groups_factory, f), app=app)
+    
+    def write_csv_zip(self, groups_factory, fileobj):
+        """
+        将各数据表的CSV依次写入ZIP（逐个条目写出，支持不可seek的流）
+        
+        Args:
+            groups_factory: 无参函数，每次调用返回一个新的学生组迭代器
+            fileobj: 可写的文件对象
+        """
+        with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for filename, headers, rows_method in CSV_TABLES:
+                build_rows = getattr(self, rows_method)
                 
-                # 设置数据行样式
-                row_num = ws.max_row
-                for col in range(1, len(headers) + 1):
-                    cell = ws.cell(row_num, col)
-                    cell.border = self.thin_border
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        # 调整列宽
-        ws.column_dimensions['A'].width = 12
-        ws.column_dimensions['B'].width = 20
-        ws.column_dimensions['C'].width = 10
-        ws.column_dimensions['D'].width = 10
-        ws.column_dimensions['E'].width = 12
-        ws.column_dimensions['F'].width = 12
-        ws.column_dimensions['G'].width = 80  # 消息内容列
-        ws.column_dimensions['H'].width = 12
-        ws.column_dimensions['I'].width = 20
+                # 大小未知，按ZIP64写入以支持超过4GB的条目
+                with zf.open(filename, 'w', force_zip64=True) as entry:
+                    text = io.TextIOWrapper(entry, encoding='utf-8', newline='')
+                    writer = csv.writer(text)
+                    writer.writerow(headers)
+                    for group in groups_factory():
+                        writer.writerows(build_rows(as_export_group(group)))
+                    text.flush()
+                    text.detach()
     
-    def export_to_json(self, groups, output_path=None):
+    def export_to_json(self, groups, output_path=None, total=None):
         """导出为JSON格式（适合AI分析）"""
         if output_path is None:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             output_path = f'茶文化课程数据_{timestamp}.json'
         
-        data = {
-            'export_time': datetime.now().isoformat(),
-            'total_groups': len(groups),
-            'groups': []
-        }
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for chunk in self.iter_json(groups, total=total):
+                f.write(chunk)
         
+        return output_path
+    
+    def iter_json(self, groups, total=None):
+        """
+        流式生成JSON文档（逐个小组序列化，不在内存中构建完整数据）
+        
+        Args:
+            groups: ExportGroup或StudentGroup对象的列表或迭代器
+            total: 数据总数，为None时使用len(groups)
+        
+        Yields:
+            str
+        """
+        if total is None:
+            groups = list(groups)
+            total = len(groups)
+        
+        yield '{\n'
+        yield f'  "export_time": {json.dumps(datetime.now().isoformat())},\n'
+        yield f'  "total_groups": {total},\n'
+        yield '  "groups": ['
+        
+        first = True
         for group in groups:
-            group_data = {
-                'group_info': {
-                    'group_number': group.group_number,
-                    'school': group.school,
-                    'grade': group.grade,
-                    'class_number': group.class_number,
-                    'activity_date': group.activity_date.isoformat() if group.activity_date else None,
-                    'submit_time': group.submit_time.isoformat() if group.submit_time else None,
-                    'members': [m.member_name for m in group.members]
-                },
-                'task1': group.task1.to_dict() if group.task1 else None,
-                'task2': group.task2.to_dict() if group.task2 else None,
-                'thinking_questions': {
-                    t.question_type: t.answer
-                    for t in group.thinking_questions
-                },
-                'chat_messages': [
-                    {
-                        'index': msg.message_index,
-                        'role': msg.role,
-                        'content': msg.content
-                    }
-                    for msg in sorted(group.chat_messages, key=lambda x: x.message_index)
-                ],
-                'statistics': {
-                    'student_questions': len([m for m in group.chat_messages if m.role == 'user']),
-                    'ai_responses': len([m for m in group.chat_messages if m.role == 'assistant']),
-                    'task1_char_count': group.get_task1_char_count(),
-                    'task2_char_count': group.get_task2_char_count()
-                }
-            }
-            data['groups'].append(group_data)
+            group_json = json.dumps(self.group_to_json_dict(as_export_group(group)), ensure_ascii=False, indent=2)
+            # 与整体文档的缩进层级保持一致
+            group_json = group_json.replace('\n', '\n    ')
+            yield ('\n    ' if first else ',\n    ') + group_json
+            first = False
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        yield '\n  ]\n}\n' if not first else ']\n}\n'
+    
+    def iter_ndjson(self, groups):
+        """
+        流式生成NDJSON（每行一个小组，适合逐行读取的AI分析流水线）
         
-        return output_path
-
+        Yields:
+            str
+        """
+        for group in groups:
+            yield json.dumps(self.group_to_json_dict(as_export_group(group)), ensure_ascii=False) + '\n'
+    
+    def iter_jsonl_shards(self, groups, app=None, **options):
+        """
+        流式生成JSONL分片压缩包内容（用于HTTP流式响应）
+        
+        Args:
+            groups: ExportGroup或StudentGroup对象的迭代器
+            app: Flask应用，groups在生成过程中需要访问数据库时提供
+            options: 传给 write_jsonl_shards 的分片参数
+        
+        Yields:
+            bytes
+        """
+        return iter_writer(lambda f: self.write_jsonl_shards(groups, f, **options), app=app)
+    
+    def write_jsonl_shards(self, groups, fileobj, max_bytes, max_tokens, workers):
+        """
+        将小组按顺序写成多个JSONL分片（gzip压缩），打包为ZIP并附带清单 manifest.json
+        
+        每行一个小组（与NDJSON导出相同）；分片的未压缩字节数不超过 max_bytes，
+        估算token数不超过 max_tokens（单个小组超过上限时独占一个分片）。
+        序列化在当前线程按顺序进行以确定分片边界，压缩和校验和计算在线程池中并行执行，
+        完成的分片按顺序写入ZIP；同时进行中的分片数有上限，内存占用与数据总量无关
+        
+        Args:
+            groups: ExportGroup或StudentGroup对象的迭代器
+            fileobj: 可写的文件对象（支持不可seek的流）
+            max_bytes: 每个分片的最大字节数（未压缩），0表示不限（默认值见配置 EXPORT_SHARD_MAX_BYTES）
+            max_tokens: 每个分片的最大估算token数，0表示不限（EXPORT_SHARD_MAX_TOKENS）
+            workers: 并行压缩的线程数（EXPORT_SHARD_WORKERS）
+        """
+        shards = []
+        pending = deque()
+        position = 0  # 已写出的小组数（分片范围为导出顺序中的位置，从1开始）
+        
+        with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_STORED) as zf, \
+                ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='jsonl-shard') as executor:
+            
+            def write_shard(future, first_group, first_id, last_id):
+                info, compressed = future.result()
+                info.update({
+                    'first_group': first_group,
+                    'last_group': first_group + info['group_count'] - 1,
+                    'first_group_id': first_id,
+                    'last_group_id': last_id
+                })
+                # 分片已经过gzip压缩，ZIP中直接存储
+                zf.writestr(info['file'], compressed)
+                shards.append(info)
+            
+            def flush():
+                nonlocal lines, size, tokens
+                future = executor.submit(
+                    _build_shard, len(shards) + len(pending) + 1, lines, tokens if max_tokens else None
+                )
+                pending.append((future, position - len(lines) + 1, line_ids[0], line_ids[-1]))
+                lines, size, tokens = [], 0, 0
+                line_ids.clear()
+                # 限制进行中的分片数量
+                while len(pending) > max(1, workers) * 2:
+                    write_shard(*pending.popleft())
+            
+            lines, size, tokens = [], 0, 0
+            line_ids = []
+            for group in groups:
+                group = as_export_group(group)
+                line = json.dumps(self.group_to_json_dict(group), ensure_ascii=False) + '\n'
+                data = line.encode('utf-8')
+                line_tokens = estimate_tokens(line) if max_tokens else 0
+                
+                if lines and (
+                    (max_bytes and size + len(data) > max_bytes)
+                    or (max_tokens and tokens + line_tokens > max_tokens)
+                ):
+                    flush()
+                
+                lines.append(data)
+                line_ids.append(group.id)
+                size += len(data)
+                tokens += line_tokens
+                position += 1
+            
+            if lines:
+                flush()
+            while pending:
+                write_shard(*pending.popleft())
+            
+            manifest = {
+                'export_time': datetime.now().isoformat(),
+                'format': 'jsonl',
+                'compression': 'gzip',
+                'total_groups': position,
+                'shard_count': len(shards),
+                'max_bytes': max_bytes,
+                'max_tokens': max_tokens,
+                'token_estimate': '中日韩文字每字1个token，其他字符每4个字符1个token',
+                'shards': shards
+            }
+            zf.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2))
+    
+    def group_to_json_dict(self, group):
+        """将单个小组（ExportGroup）转换为JSON导出结构"""
+        return {
+            'group_info': {
+                'group_number': group.group_number,
+                'school': group.school,
+                'grade': group.grade,
+                'class_number': group.class_number,
+                'activity_date': group.activity_date.isoformat() if group.activity_date else None,
+                'submit_time': group.submit_time.isoformat() if group.submit_time else None,
+                'members': group.members
+            },
+            'task1': group.task1.to_dict() if group.task1 else None,
+            'task2': group.task2.to_dict() if group.task2 else None,
+            'thinking_questions': group.thinking,
+            'chat_messages': [
+                {
+                    'index': message_index,
+                    'role': role,
+                    'content': content
+                }
+                for message_index, role, content, _ in group.chat_messages
+            ],
+            'statistics': {
+                'student_questions': group.user_question_count,
+                'ai_responses': group.assistant_count,
+                'task1_char_count': group.task1.char_count if group.task1 else 0,
+                'task2_char_count': group.task2.char_count if group.task2 else 0
+            }
+        }
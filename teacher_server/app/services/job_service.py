@@ -0,0 +1,338 @@
+"""
+后台导出任务服务
+大批量导出（Excel/JSON/NDJSON/CSV/JSONL分片/批量PDF）和PDF报告在有限大小的后台线程池中生成，不占用处理请求的线程：
+- 提交后立即返回任务ID，页面通过轮询或SSE查看进度（已处理的小组数）
+- 生成的文件写入导出缓存，完成后通过固定的下载地址获取
+- 相同内容（缓存键相同）的任务正在进行时直接返回该任务
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import threading
+import traceback
+import uuid
+from app.models import StudentGroup
+from app.services.change_service import get_latest_cursor
+from app.services.export_loader import count_export_groups, iter_export_groups, iter_export_rows, PDF_RELATIONS
+from app.services.export_service import DataExportService, EXPORT_FORMATS, CSV_TABLES
+from app.services.pdf_batch_service import pdf_batch, write_class_report
+from app.services.pdf_cache_service import PDF_SUFFIX, pdf_cache_key, load_pdf_group, render_cached_pdf
+from app.services.stats_service import get_class_summary
+from app.utils.disk_cache import export_cache, pdf_cache
+from app.utils.helpers import make_export_filename, make_pdf_filename
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ExportJob:
+    """单个后台导出任务"""
+
+    def __init__(self, job_type, params, cache_key, suffix, mimetype, download_name, total=0, cache=export_cache):
+        self.id = uuid.uuid4().hex
+        self.job_type = job_type
+        self.params = params
+        self.cache_key = cache_key
+        self.suffix = suffix
+        self.mimetype = mimetype
+        self.download_name = download_name
+        self.cache = cache  # 生成的文件所在的磁盘缓存
+        self.status = QUEUED
+        self.processed = 0
+        self.total = total
+        self.message = ''
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self.revision = 0
+        self._condition = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def update(self, **fields):
+        """更新任务状态并通知等待进度的连接"""
+        with self._condition:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            if self.finished and self.finished_at is None:
+                self.finished_at = datetime.now()
+            self.revision += 1
+            self._condition.notify_all()
+
+    def advance(self, count=1):
+        """已处理的小组数增加"""
+        with self._condition:
+            self.processed += count
+            self.revision += 1
+            self._condition.notify_all()
+
+    def wait_for_update(self, revision, timeout=None):
+        """等待任务状态变化，返回最新的版本号"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.revision != revision, timeout)
+            return self.revision
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'job_id': self.id,
+            'type': self.job_type,
+            'params': self.params,
+            'status': self.status,
+            'processed': self.processed,
+            'total': self.total,
+            'message': self.message,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'status_url': f'/api/jobs/{self.id}',
+            'events_url': f'/api/jobs/{self.id}/events',
+            'download_url': f'/api/jobs/{self.id}/download' if self.status == DONE else None
+        }
+
+
+# 导出任务参数中的筛选条件（其余为格式相关的参数）
+_FILTER_PARAMS = ('school', 'grade', 'class_number')
+
+
+def _export_cache_key(export_format, school, grade, class_number, options=None):
+    """数据导出的缓存键（包含当前的数据版本）"""
+    cache_key = ('export', export_format, school, grade, class_number, get_latest_cursor())
+    if options:
+        cache_key += (tuple(sorted(options.items())),)
+    return cache_key
+
+
+def _counting(job, rows):
+    """遍历数据行的同时累计进度"""
+    for row in rows:
+        yield row
+        job.advance()
+
+
+class JobManager:
+    """后台导出任务队列（有界线程池 + 待处理任务数上限）"""
+
+    def __init__(self):
+        self._app = None
+        self._executor = None
+        self._jobs = {}
+        self._active = {}  # 缓存键 → 进行中的任务
+        self._lock = threading.Lock()
+        self.max_pending = 20
+        self.ttl_seconds = 3600
+
+    def init_app(self, app):
+        """根据应用配置创建线程池"""
+        self._app = app
+        self.max_pending = app.config.get('EXPORT_JOB_MAX_PENDING', self.max_pending)
+        self.ttl_seconds = app.config.get('EXPORT_JOB_TTL_SECONDS', self.ttl_seconds)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config.get('EXPORT_JOB_WORKERS', 2),
+            thread_name_prefix='export-job'
+        )
+
+    def get(self, job_id):
+        """按ID查找任务"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def submit_export(self, export_format, school='', grade='', class_number='', options=None):
+        """
+        提交数据导出任务
+
+        Args:
+            options: 格式相关的参数（JSONL分片的 max_bytes / max_tokens），计入缓存键
+
+        Returns:
+            (任务, 错误信息)
+        """
+        if export_format not in EXPORT_FORMATS:
+            return None, f'不支持的导出格式: {export_format}'
+
+        total = count_export_groups(school, grade, class_number)
+        if not total:
+            return None, '没有数据可导出'
+
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        cache_key = _export_cache_key(export_format, school, grade, class_number, options)
+        if export_format == 'csv':
+            # 每个CSV文件遍历一次全部小组
+            total *= len(CSV_TABLES)
+
+        job = ExportJob(
+            export_format,
+            {'school': school, 'grade': grade, 'class_number': class_number, **(options or {})},
+            cache_key, extension, mimetype,
+            make_export_filename(school, grade, class_number, extension),
+            total=total
+        )
+        return self._submit(job, self._run_export)
+
+    def submit_pdf(self, submission_id):
+        """
+        提交单个小组的PDF报告任务
+
+        Returns:
+            (任务, 错误信息)
+        """
+        group = StudentGroup.query.filter_by(submission_id=submission_id).first()
+        if not group:
+            return None, '学生数据不存在'
+
+        job = ExportJob(
+            'pdf',
+            {'submission_id': submission_id},
+            pdf_cache_key(submission_id, group.updated_at), PDF_SUFFIX, 'application/pdf',
+            make_pdf_filename(group),
+            total=1,
+            cache=pdf_cache
+        )
+        return self._submit(job, self._run_pdf)
+
+    def _submit(self, job, runner):
+        """登记任务并放入线程池（已缓存的直接完成，相同任务进行中时返回该任务）"""
+        if job.cache.get(job.cache_key, job.suffix) is not None:
+            job.update(status=DONE, processed=job.total)
+            with self._lock:
+                self._jobs[job.id] = job
+            return job, None
+
+        with self._lock:
+            self._prune()
+
+            active = self._active.get(job.cache_key)
+            if active is not None:
+                return active, None
+
+            if len(self._active) >= self.max_pending:
+                return None, '导出任务过多，请稍后再试'
+
+            self._jobs[job.id] = job
+            self._active[job.cache_key] = job
+
+        self._executor.submit(self._run, job, runner)
+        return job, None
+
+    def _run(self, job, runner):
+        """在线程池中执行任务"""
+        job.update(status=RUNNING)
+        try:
+            with self._app.app_context():
+                runner(job)
+            job.update(status=DONE, processed=job.total)
+        except Exception as e:
+            traceback.print_exc()
+            job.update(status=FAILED, message=f'导出失败: {str(e)}')
+        finally:
+            with self._lock:
+                if self._active.get(job.cache_key) is job:
+                    del self._active[job.cache_key]
+
+    def _rekey(self, job, cache_key):
+        """更换任务的缓存键，进行中任务的登记随之更换（相同内容的新请求按新键找到该任务）"""
+        with self._lock:
+            if self._active.get(job.cache_key) is job:
+                del self._active[job.cache_key]
+                self._active.setdefault(cache_key, job)
+            job.cache_key = cache_key
+
+    def _put_export(self, job, write_func):
+        """
+        生成导出文件并写入导出缓存
+
+        生成期间数据发生变化时文件不按数据版本缓存（以后的请求不会拿到过期的文件），
+        只以任务自己的键保存供本任务下载
+        """
+        version = job.cache_key[5]
+        private_key = ('export_job', job.id)
+        export_cache.put(
+            job.cache_key, write_func, job.suffix,
+            validate=lambda: get_latest_cursor() == version,
+            fallback_key=private_key
+        )
+        if export_cache.get(job.cache_key, job.suffix) is None:
+            self._rekey(job, private_key)
+
+    def _run_export(self, job):
+        """生成数据导出文件并写入导出缓存"""
+        export_format = job.job_type
+        school = job.params['school']
+        grade = job.params['grade']
+        class_number = job.params['class_number']
+
+        # 排队期间数据又有更新时，按开始生成时的数据版本写入缓存
+        key_options = {name: value for name, value in job.params.items() if name not in _FILTER_PARAMS}
+        self._rekey(job, _export_cache_key(export_format, school, grade, class_number, key_options))
+        if export_cache.get(job.cache_key, job.suffix) is not None:
+            return
+
+        if export_format == 'pdf_zip':
+            self._put_export(
+                job,
+                lambda f: pdf_batch.write_zip(
+                    _counting(job, iter_export_groups(school, grade, class_number, relations=PDF_RELATIONS)), f
+                )
+            )
+            return
+
+        if export_format == 'class_pdf':
+            self._put_export(
+                job,
+                lambda f: write_class_report(
+                    f, school, grade, class_number,
+                    groups=_counting(job, iter_export_groups(school, grade, class_number, relations=PDF_RELATIONS))
+                )
+            )
+            return
+
+        class_stats = None
+        options = None
+        if export_format == 'excel':
+            class_stats = get_class_summary(school, grade, class_number)
+        elif export_format == 'jsonl_shards':
+            options = {
+                'max_bytes': job.params['max_bytes'],
+                'max_tokens': job.params['max_tokens'],
+                'workers': self._app.config['EXPORT_SHARD_WORKERS']
+            }
+
+        total = count_export_groups(school, grade, class_number)
+        self._put_export(
+            job,
+            lambda f: DataExportService().write_export(
+                export_format,
+                lambda: _counting(job, iter_export_rows(school, grade, class_number)),
+                f,
+                class_stats=class_stats,
+                total=total,
+                options=options
+            )
+        )
+
+    def _run_pdf(self, job):
+        """生成PDF报告并写入PDF报告缓存"""
+        group = load_pdf_group(job.params['submission_id'])
+        if not group:
+            raise ValueError('学生数据不存在')
+
+        # 提交任务后数据又有更新时，按最新数据生成
+        self._rekey(job, pdf_cache_key(group.submission_id, group.updated_at))
+        render_cached_pdf(group)
+
+    def _prune(self):
+        """清理已结束且超过保留时间的任务（调用方持有锁）"""
+        now = datetime.now()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and (now - job.finished_at).total_seconds() > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_manager = JobManager()
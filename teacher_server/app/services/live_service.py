@@ -0,0 +1,163 @@
+"""
+实时提交推送服务（Server-Sent Events）
+学生提交或删除数据后，向已连接的教师端页面推送小组摘要和班级统计（读取 class_stats 汇总表），
+每个事件只渲染一次，所有订阅者共享同一份消息
+"""
+from datetime import datetime
+import json
+import queue
+import threading
+from flask import render_template
+from app.services.stats_service import get_class_summary
+
+# 每个订阅者最多积压的消息数，超出后通知页面整体刷新
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def format_sse(event, data):
+    """格式化为SSE消息"""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class Subscriber:
+    """单个SSE连接"""
+
+    def __init__(self, school='', grade='', class_number='', start_date=None, end_date=None):
+        self.school = school
+        self.grade = grade
+        self.class_number = class_number
+        self.start_date = start_date
+        self.end_date = end_date
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def matches(self, school, grade, class_number, submit_time=None):
+        """判断事件是否符合该连接的筛选条件（与列表页筛选规则一致）"""
+        if self.school and self.school not in (school or ''):
+            return False
+        if self.grade and self.grade != grade:
+            return False
+        if self.class_number and self.class_number != class_number:
+            return False
+        if submit_time is not None:
+            if self.start_date and submit_time < self.start_date:
+                return False
+            if self.end_date and submit_time > self.end_date:
+                return False
+        return True
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+
+class LiveFeed:
+    """进程内发布/订阅"""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    @property
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def subscribe(self, **filters):
+        subscriber = Subscriber(**filters)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, message, school, grade, class_number, submit_time=None):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if subscriber.matches(school, grade, class_number, submit_time):
+                subscriber.put(message)
+
+
+live_feed = LiveFeed()
+
+
+def _empty_counters(school, grade, class_number):
+    """班级已无数据时的统计"""
+    return {
+        'school': school,
+        'grade': grade,
+        'class_number': class_number,
+        'groups': 0,
+        'task1': 0,
+        'task2': 0,
+        'thinking1': 0,
+        'thinking2': 0,
+        'creative': 0,
+        'user_questions': 0
+    }
+
+
+def _publish_class_counters(school, grade, class_number):
+    """推送单个班级的最新统计"""
+    counters = get_class_summary(school, grade, class_number)
+    # contains 筛选可能匹配到名称更长的学校，这里只取完全相同的班级
+    counters = next(
+        (c for c in counters if c['school'] == school),
+        _empty_counters(school, grade, class_number)
+    )
+    live_feed.publish(format_sse('stats', counters), school, grade, class_number)
+
+
+def publish_group_update(group):
+    """
+    推送小组新增/更新事件（在提交事务之后调用）
+
+    Args:
+        group: StudentGroup对象
+    """
+    if not live_feed.has_subscribers:
+        return
+
+    try:
+        summary = group.to_dict()
+        summary['html'] = render_template('_student_row.html', student=group)
+        message = format_sse('group', summary)
+        live_feed.publish(message, group.school, group.grade, group.class_number, group.submit_time)
+        _publish_class_counters(group.school, group.grade, group.class_number)
+    except Exception as e:
+        print(f"推送提交事件失败: {e}")
+
+
+def publish_group_deleted(submission_id, school, grade, class_number):
+    """推送小组删除事件（在删除事务之后调用）"""
+    if not live_feed.has_subscribers:
+        return
+
+    try:
+        message = format_sse('deleted', {'submission_id': submission_id})
+        live_feed.publish(message, school, grade, class_number)
+        _publish_class_counters(school, grade, class_number)
+    except Exception as e:
+        print(f"推送删除事件失败: {e}")
+
+
+def parse_date_filters(start_date, end_date):
+    """解析列表页的日期筛选参数（无效格式忽略）"""
+    start_datetime = None
+    end_datetime = None
+    if start_date:
+        try:
+            start_datetime = datetime.strptime(start_date, '%Y-%m-%d')
+        except ValueError:
+            pass
+    if end_date:
+        try:
+            end_datetime = datetime.strptime(end_date, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
+        except ValueError:
+            pass
+    return start_datetime, end_datetime
@@ -0,0 +1,101 @@
+"""
+成员检索服务
+支持按姓名精确匹配、姓名前缀、拼音首字母前缀查找学生所在小组
+"""
+from sqlalchemy import case, inspect, text
+from app import db
+from app.models import StudentGroup, GroupMember
+from app.utils.pinyin import get_name_initials, is_initials_query
+
+# 前缀查询的上界字符，使 "col >= q AND col < q + MAX" 可以走索引
+_PREFIX_UPPER_BOUND = chr(0x10FFFF)
+
+
+def _prefix_filter(column, prefix):
+    """构建可利用索引的前缀范围条件（避免 LIKE 在 SQLite 中无法走索引）"""
+    return (column >= prefix) & (column < prefix + _PREFIX_UPPER_BOUND)
+
+
+def ensure_member_name_index():
+    """
+    旧数据库升级：添加 name_initials 字段和姓名检索索引，回填拼音首字母（启动时执行，已完成时跳过）
+
+    Returns:
+        本次回填的成员数
+    """
+    columns = [column['name'] for column in inspect(db.engine).get_columns('group_members')]
+    if 'name_initials' not in columns:
+        db.session.execute(text("ALTER TABLE group_members ADD COLUMN name_initials VARCHAR(50)"))
+
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_group_members_member_name ON group_members (member_name)"
+    ))
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_group_members_name_initials ON group_members (name_initials)"
+    ))
+
+    members = GroupMember.query.filter(GroupMember.name_initials.is_(None)).all()
+    for member in members:
+        member.name_initials = get_name_initials(member.member_name)
+    db.session.commit()
+    return len(members)
+
+
+def search_members(keyword, school='', grade='', class_number='', limit=20):
+    """
+    检索小组成员
+
+    Args:
+        keyword: 检索词，中文姓名（精确或前缀）或拼音首字母（如 "zs"）
+        school: 学校筛选（可选）
+        grade: 年级筛选（可选）
+        class_number: 班级筛选（可选）
+        limit: 最大返回条数
+
+    Returns:
+        匹配结果列表，精确匹配排在最前
+    """
+    keyword = (keyword or '').strip()
+    if not keyword:
+        return []
+
+    if is_initials_query(keyword):
+        keyword = keyword.lower()
+        condition = _prefix_filter(GroupMember.name_initials, keyword)
+        match_order = case((GroupMember.name_initials == keyword, 0), else_=1)
+    else:
+        # 前缀范围已包含精确匹配，单个范围条件可以走一次索引范围扫描
+        condition = _prefix_filter(GroupMember.member_name, keyword)
+        match_order = case((GroupMember.member_name == keyword, 0), else_=1)
+
+    query = db.session.query(GroupMember, StudentGroup).join(
+        StudentGroup, GroupMember.group_id == StudentGroup.id
+    ).filter(condition)
+
+    if school:
+        query = query.filter(StudentGroup.school.contains(school))
+    if grade:
+        query = query.filter(StudentGroup.grade == grade)
+    if class_number:
+        query = query.filter(StudentGroup.class_number == class_number)
+
+    rows = query.order_by(
+        match_order,
+        GroupMember.member_name,
+        StudentGroup.submit_time.desc()
+    ).limit(limit).all()
+
+    results = []
+    for member, group in rows:
+        results.append({
+            'member_name': member.member_name,
+            'member_index': member.member_index,
+            'name_initials': member.name_initials,
+            'submission_id': group.submission_id,
+            'school': group.school,
+            'grade': group.grade,
+            'class_number': group.class_number,
+            'group_number': group.group_number,
+            'activity_date': group.activity_date.isoformat() if group.activity_date else None
+        })
+    return results
@@ -0,0 +1,173 @@
+"""
+批量PDF报告服务
+ReportLab排版是单线程的CPU密集计算，按班级归档时在多个工作进程中并行生成各小组的PDF：
+- 主进程按导出顺序分批读取小组（关联数据已加载），脱离会话后序列化传给工作进程
+- 工作进程用 PDFExportService.generate_group_pdf 在内存中生成PDF并返回字节
+- 先完成的先写入ZIP，边生成边流式输出；同时进行中的小组数有上限，内存占用与班级大小无关
+
+另提供合并的班级报告（write_class_report）：所有小组排版为一个PDF文档
+"""
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+import io
+import os
+import threading
+import traceback
+import zipfile
+from app.services.export_loader import iter_export_groups, PDF_RELATIONS
+from app.services.pdf_service import get_pdf_renderer
+from app.services.stats_service import get_class_summary
+from app.utils.helpers import make_pdf_filename
+from app.utils.photo_storage import photo_storage
+from app.utils.streaming import iter_writer
+
+def _init_worker(storage_settings=None):
+    """工作进程初始化：按主进程的配置创建照片存储，预先加载字体和样式"""
+    if storage_settings:
+        photo_storage.configure(storage_settings)
+    get_pdf_renderer()
+
+
+def _render_group(group):
+    """在工作进程中生成单个小组的PDF，返回字节"""
+    buffer = io.BytesIO()
+    get_pdf_renderer().generate_group_pdf(group, buffer)
+    return buffer.getvalue()
+
+
+def _unique_name(name, used):
+    """ZIP内文件名重复时追加序号"""
+    if name not in used:
+        used.add(name)
+        return name
+    stem, ext = os.path.splitext(name)
+    index = 2
+    while f'{stem}_{index}{ext}' in used:
+        index += 1
+    name = f'{stem}_{index}{ext}'
+    used.add(name)
+    return name
+
+
+def write_class_report(fileobj, school='', grade='', class_number='', groups=None):
+    """
+    生成合并的班级报告（封面为班级统计汇总，之后每个小组一节）
+
+    Args:
+        fileobj: 可写的文件对象
+        school: 学校（模糊匹配）
+        grade: 年级
+        class_number: 班级
+        groups: 可选，按筛选条件读取的小组迭代器（如需统计进度时传入包装后的迭代器）
+    """
+    if groups is None:
+        groups = iter_export_groups(school, grade, class_number, relations=PDF_RELATIONS)
+    filters = [part for part in (school, grade, f'{class_number}班' if class_number else '') if part]
+    get_pdf_renderer().generate_class_report(
+        groups,
+        fileobj,
+        class_stats=get_class_summary(school, grade, class_number),
+        title=' '.join(filters) or '全部班级'
+    )
+
+
+class PDFBatchRenderer:
+    """多进程批量生成PDF报告（进程池在首次使用时创建，之后复用）"""
+
+    def __init__(self, workers=None):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """读取配置的工作进程数"""
+        self.workers = app.config.get('PDF_BATCH_WORKERS') or self.workers
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    initargs=(photo_storage.settings,)
+                )
+            return self._executor
+
+    def shutdown(self):
+        """关闭进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def iter_zip(self, groups, app=None):
+        """
+        流式生成PDF压缩包内容（用于HTTP流式响应）
+
+        Args:
+            groups: 已加载关联数据的 StudentGroup 迭代器（如 iter_export_groups）
+            app: Flask应用，groups在生成过程中需要访问数据库时提供
+
+        Yields:
+            bytes
+        """
+        return iter_writer(lambda f: self.write_zip(groups, f), app=app)
+
+    def write_zip(self, groups, fileobj):
+        """
+        并行生成各小组的PDF并按完成顺序写入ZIP
+
+        单个小组生成失败时不中断整个压缩包，失败的小组列在 errors.txt 中
+
+        Args:
+            groups: 已加载关联数据的 StudentGroup 迭代器
+            fileobj: 可写的文件对象（支持不可seek的流）
+        """
+        executor = self._get_executor()
+        max_pending = self.workers * 2
+        pending = {}  # future → 文件名
+        used_names = set()
+        errors = []
+
+        # PDF内容已压缩，ZIP中直接存储
+        with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_STORED) as zf:
+
+            def write_done(done):
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        zf.writestr(name, future.result())
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        traceback.print_exc()
+                        errors.append(f'{name}: {e}')
+
+            try:
+                for group in groups:
+                    name = _unique_name(make_pdf_filename(group), used_names)
+                    pending[executor.submit(_render_group, group)] = name
+                    if len(pending) >= max_pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        write_done(done)
+
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    write_done(done)
+            except BrokenProcessPool:
+                # 工作进程异常退出后进程池不可再用，下次使用时重新创建
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                raise
+            finally:
+                # 客户端断开或读取数据出错时取消尚未开始的任务
+                for future in pending:
+                    future.cancel()
+
+            if errors:
+                zf.writestr('errors.txt', '以下报告生成失败：\n' + '\n'.join(errors) + '\n')
+
+
+# 批量PDF生成器
+pdf_batch = PDFBatchRenderer()
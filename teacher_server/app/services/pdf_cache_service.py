@@ -0,0 +1,125 @@
+"""
+PDF报告缓存服务
+同一份小组报告会被多次下载（教师查看、家长会、归档），生成后按 (submission_id, updated_at) 缓存到磁盘：
+- 小组数据更新后 updated_at 变化，旧报告不再命中，按LRU逐步淘汰
+- 相同报告同时被多次请求时只生成一次
+- 可选：学生提交后（一段时间内没有新的提交时）在后台预先生成报告
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import traceback
+from sqlalchemy.orm import selectinload
+from app.models import StudentGroup
+from app.services.pdf_service import get_pdf_renderer
+from app.utils.disk_cache import pdf_cache
+from app.utils.singleflight import SingleFlight
+
+# 缓存文件扩展名
+PDF_SUFFIX = '.pdf'
+
+# 进行中的PDF生成（相同报告只生成一次）
+pdf_flights = SingleFlight()
+
+
+def pdf_cache_key(submission_id, updated_at):
+    """PDF报告的缓存键"""
+    return ('pdf', submission_id, updated_at)
+
+
+def load_pdf_group(submission_id):
+    """加载生成报告所需的小组数据（关联数据用IN查询一次性加载）"""
+    return StudentGroup.query.options(
+        selectinload(StudentGroup.members),
+        selectinload(StudentGroup.task1),
+        selectinload(StudentGroup.task2),
+        selectinload(StudentGroup.thinking_questions),
+        selectinload(StudentGroup.chat_messages),
+        selectinload(StudentGroup.photos)
+    ).filter_by(submission_id=submission_id).first()
+
+
+def render_cached_pdf(group, timeout=None):
+    """
+    获取小组的PDF报告文件（未缓存时生成并写入缓存）
+
+    Args:
+        group: 已加载关联数据的 StudentGroup
+        timeout: 相同报告正在生成时最多等待的秒数，超时后自行生成
+
+    Returns:
+        缓存文件路径
+    """
+    key = pdf_cache_key(group.submission_id, group.updated_at)
+    path = pdf_cache.get(key, PDF_SUFFIX)
+    if path is not None:
+        return path
+
+    def render():
+        cached = pdf_cache.get(key, PDF_SUFFIX)
+        if cached is not None:
+            return cached
+        return pdf_cache.put(key, lambda f: get_pdf_renderer().generate_group_pdf(group, f), PDF_SUFFIX)
+
+    path, _ = pdf_flights.do(key, render, timeout=timeout)
+    return path
+
+
+class PDFPrerenderer:
+    """
+    提交后在后台预先生成PDF报告
+
+    同一小组的提交通常分多次到达（基本信息、任务一、任务二……），
+    每次提交都重新计时，超过 delay 秒没有新的提交后才生成，避免为中间状态生成报告
+    """
+
+    def __init__(self):
+        self._app = None
+        self._executor = None
+        self._timers = {}  # submission_id → 计时器
+        self._lock = threading.Lock()
+        self.enabled = False
+        self.delay = 30
+
+    def init_app(self, app):
+        """根据应用配置启用后台预生成"""
+        self._app = app
+        self.enabled = app.config.get('PDF_PRERENDER', False)
+        self.delay = app.config.get('PDF_PRERENDER_DELAY_SECONDS', self.delay)
+        if self.enabled and self._executor is None:
+            # 单线程执行，不与请求争抢CPU
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-prerender')
+
+    def schedule(self, submission_id):
+        """登记一次提交（未启用时不做任何事）"""
+        if not self.enabled or not submission_id:
+            return
+
+        timer = threading.Timer(self.delay, self._enqueue, args=(submission_id,))
+        timer.daemon = True
+        with self._lock:
+            previous = self._timers.pop(submission_id, None)
+            if previous is not None:
+                previous.cancel()
+            self._timers[submission_id] = timer
+        timer.start()
+
+    def _enqueue(self, submission_id):
+        with self._lock:
+            if self._timers.get(submission_id) is not threading.current_thread():
+                return
+            del self._timers[submission_id]
+        self._executor.submit(self._render, submission_id)
+
+    def _render(self, submission_id):
+        """在应用上下文中生成并缓存报告（已缓存时跳过）"""
+        try:
+            with self._app.app_context():
+                group = load_pdf_group(submission_id)
+                if group is not None:
+                    render_cached_pdf(group)
+        except Exception:
+            traceback.print_exc()
+
+
+# PDF报告后台预生成
+pdf_prerenderer = PDFPrerenderer()
@@ -1,6 +1,9 @@
 """
 PDF导出服务
 为每个小组生成精美的PDF报告，方便教师留档和展示
+
+字体查找和注册在进程内只执行一次；样式、单元格样式和表格样式在创建服务时一次性构建，
+通过 get_pdf_renderer() 获取进程内共享的服务实例，每次生成PDF只有排版本身的开销
 """
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
@@ -11,13 +14,89 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 import os
 import sys
+import threading
 
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from config import Config
+from app.services.photo_service import get_pdf_derivative
+
+# 中文字体候选路径
+FONT_PATHS = [
+    'C:/Windows/Fonts/simhei.ttf',  # 黑体
+    'C:/Windows/Fonts/simsun.ttc',  # 宋体
+    'C:/Windows/Fonts/msyh.ttc',    # 微软雅黑
+    '/System/Library/Fonts/PingFang.ttc',  # macOS
+    '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',  # Linux
+]
+
+# 注册后的中文字体名
+FONT_NAME = 'Chinese'
+
+# 报告中每张照片的最大显示尺寸
+PHOTO_MAX_WIDTH = 7.5 * cm
+PHOTO_MAX_HEIGHT = 6 * cm
+
+_font_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def register_chinese_font():
+    """
+    查找并注册中文字体（进程内只执行一次，结果缓存）
+    
+    Returns:
+        注册成功的字体路径（已预先注册时返回字体名）；未找到时返回None
+    """
+    with _font_lock:
+        # 已由其他代码注册过（如打包环境预先注册）时直接使用
+        if FONT_NAME in pdfmetrics.getRegisteredFontNames():
+            return FONT_NAME
+        
+        try:
+            for font_path in FONT_PATHS:
+                if os.path.exists(font_path):
+                    try:
+                        pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+                        print(f"成功注册字体: {font_path}")
+                        return font_path
+                    except:
+                        continue
+            
+            print("警告: 未找到中文字体，将使用默认字体（可能无法显示中文）")
+        except Exception as e:
+            print(f"注册字体失败: {e}")
+        return None
+
+
+class _StreamingStory(list):
+    """
+    按需补充内容的story
+    
+    ReportLab排版时每处理一个元素都会调用 len()，剩余元素不足时从 sections 迭代器
+    取出下一段内容（一个小组的全部元素），不需要事先构建整个文档的story
+    """
+    
+    # 剩余元素少于该数量时补充（保证 keepWithNext 等向后查看的逻辑有足够的元素）
+    LOW_WATER = 20
+    
+    def __init__(self, sections):
+        super().__init__()
+        self._sections = iter(sections)
+        self._exhausted = False
+    
+    def __len__(self):
+        while not self._exhausted and list.__len__(self) < self.LOW_WATER:
+            try:
+                self.extend(next(self._sections))
+            except StopIteration:
+                self._exhausted = True
+        return list.__len__(self)
+
 
 class PDFExportService:
     """PDF导出服务类"""
@@ -29,36 +108,11 @@ class PDFExportService:
         # 创建样式
         self.styles = getSampleStyleSheet()
         self._create_custom_styles()
+        self._create_table_styles()
     
     def _register_fonts(self):
-        """注册中文字体"""
-        try:
-            # 尝试使用系统字体
-            # Windows系统字体路径
-            font_paths = [
-                'C:/Windows/Fonts/simhei.ttf',  # 黑体
-                'C:/Windows/Fonts/simsun.ttc',  # 宋体
-                'C:/Windows/Fonts/msyh.ttc',    # 微软雅黑
-                '/System/Library/Fonts/PingFang.ttc',  # macOS
-                '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',  # Linux
-            ]
-            
-            font_registered = False
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    try:
-                        pdfmetrics.registerFont(TTFont('Chinese', font_path))
-                        font_registered = True
-                        print(f"成功注册字体: {font_path}")
-                        break
-                    except:
-                        continue
-            
-            if not font_registered:
-                print("警告: 未找到中文字体，将使用默认字体（可能无法显示中文）")
-                
-        except Exception as e:
-            print(f"注册字体失败: {e}")
+        """注册中文字体（进程内只查找一次）"""
+        register_chinese_font()
     
     def _create_custom_styles(self):
         """创建自定义样式"""
@@ -113,6 +167,114 @@ class PDFExportService:
             fontSize=9,
             textColor=colors.HexColor('#666666')
         )
+        
+        # 信息表格单元格样式（支持自动换行）
+        self.info_cell_style = ParagraphStyle(
+            'InfoCellStyle',
+            parent=self.body_style,
+            fontName='Chinese',
+            fontSize=10,
+            leading=14,
+            wordWrap='CJK'
+        )
+        
+        # 感官记录表格单元格样式（居中，支持自动换行）
+        self.cell_style = ParagraphStyle(
+            'CellStyle',
+            parent=self.body_style,
+            fontName='Chinese',
+            fontSize=9,
+            leading=12,
+            alignment=TA_CENTER,
+            wordWrap='CJK'
+        )
+        
+        # 对话框样式（支持中文换行）
+        self.chat_style = ParagraphStyle(
+            'ChatStyle',
+            parent=self.body_style,
+            fontName='Chinese',
+            fontSize=10,
+            leading=16,
+            wordWrap='CJK'
+        )
+    
+    def _create_table_styles(self):
+        """创建表格样式（各表格共用，不在每次生成时重建）"""
+        # 基本信息表格
+        self.basic_info_table_style = TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Chinese'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#E8F5E9')),
+            ('BACKGROUND', (2, 0), (2, -1), colors.HexColor('#E8F5E9')),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#2E7D32')),
+            ('TEXTCOLOR', (2, 0), (2, -1), colors.HexColor('#2E7D32')),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, colors.HexColor('#F5F5F5')]),
+            ('PADDING', (0, 0), (-1, -1), 8),
+        ])
+        
+        # 感官记录表格
+        self.sensory_table_style = TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Chinese'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4CAF50')),
+            ('BACKGROUND', (0, 1), (0, -1), colors.HexColor('#E8F5E9')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('TEXTCOLOR', (0, 1), (0, -1), colors.HexColor('#2E7D32')),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('PADDING', (0, 0), (-1, -1), 6),
+        ])
+        
+        # 通用表格
+        self.table_style = TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Chinese'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#E8F5E9')),
+            ('BACKGROUND', (2, 0), (2, -1), colors.HexColor('#E8F5E9')),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#2E7D32')),
+            ('TEXTCOLOR', (2, 0), (2, -1), colors.HexColor('#2E7D32')),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('PADDING', (0, 0), (-1, -1), 8),
+        ])
+        
+        # 班级报告封面汇总表
+        self.cover_table_style = TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Chinese'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4CAF50')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F5F5F5')]),
+            ('PADDING', (0, 0), (-1, -1), 4),
+        ])
+        
+        # 照片（每行两张，居中）
+        self.photo_table_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('PADDING', (0, 0), (-1, -1), 4),
+        ])
+        
+        # 对话框（学生 / 茶助教 两种背景色）
+        self.chat_table_styles = {
+            role: TableStyle([
+                ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor(bg_color)),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                ('PADDING', (0, 0), (-1, -1), 10),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ])
+            for role, bg_color in (('user', '#E8F5E9'), ('assistant', '#F3E5F5'))
+        }
     
     def generate_group_pdf(self, group, output_path=None):
         """
@@ -131,14 +293,7 @@ class PDFExportService:
             output_path = filename
         
         # 创建PDF文档
-        doc = SimpleDocTemplate(
-            output_path,
-            pagesize=A4,
-            rightMargin=2*cm,
-            leftMargin=2*cm,
-            topMargin=2*cm,
-            bottomMargin=2*cm
-        )
+        doc = self._create_document(output_path)
         
         # 构建内容
         story = []
@@ -147,6 +302,68 @@ class PDFExportService:
         story.append(Paragraph("茶文化课程学习报告", self.title_style))
         story.append(Spacer(1, 0.5*cm))
         
+        # 添加各部分内容
+        self._add_group_sections(story, group)
+        
+        # 添加页脚信息
+        self._add_footer(story)
+        
+        # 生成PDF
+        doc.build(story)
+        
+        return output_path
+    
+    def generate_class_report(self, groups, output_path, class_stats=None, title=None):
+        """
+        生成合并的班级报告：封面汇总（班级统计）+ 每个小组一节，作为一个PDF文档排版
+        
+        groups 按需逐个读取：排版时只保留尚未排版的少量内容，已排版的小组即可被回收；
+        字体在整个文档中只嵌入一次，内容相同的图片也只嵌入一次
+        
+        Args:
+            groups: 已加载关联数据的 StudentGroup 迭代器（如 iter_export_groups）
+            output_path: 输出路径或可写的文件对象
+            class_stats: 封面使用的班级统计（get_class_summary 的结果）
+            title: 封面副标题（如筛选条件）
+        
+        Returns:
+            output_path
+        """
+        doc = self._create_document(output_path)
+        
+        cover = []
+        self._add_cover(cover, class_stats or [], title)
+        
+        def sections():
+            yield cover
+            for index, group in enumerate(groups, 1):
+                story = [PageBreak()]
+                group_num = f"第{group.group_number}组" if group.group_number else f"小组{index}（未设置编号）"
+                story.append(Paragraph(f"{group.school} {group.grade}{group.class_number}班 {group_num}", self.title_style))
+                story.append(Spacer(1, 0.3*cm))
+                self._add_group_sections(story, group)
+                yield story
+            footer = []
+            self._add_footer(footer)
+            yield footer
+        
+        doc.build(_StreamingStory(sections()))
+        
+        return output_path
+    
+    def _create_document(self, output_path):
+        """创建A4文档（output_path 可以是路径或文件对象）"""
+        return SimpleDocTemplate(
+            output_path,
+            pagesize=A4,
+            rightMargin=2*cm,
+            leftMargin=2*cm,
+            topMargin=2*cm,
+            bottomMargin=2*cm
+        )
+    
+    def _add_group_sections(self, story, group):
+        """添加一个小组的各部分内容（基本信息、任务一、任务二、思考题、问答记录）"""
         # 添加基本信息
         self._add_basic_info(story, group)
         story.append(Spacer(1, 0.5*cm))
@@ -169,16 +386,40 @@ class PDFExportService:
         # 添加茶助教问答记录
         if group.chat_messages:
             self._add_chat_messages(story, group)
-        
-        # 添加页脚信息
+    
+    def _add_footer(self, story):
+        """添加页脚信息（生成时间）"""
         story.append(Spacer(1, 1*cm))
         footer_text = f"生成时间：{datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')}"
         story.append(Paragraph(footer_text, self.small_style))
+    
+    def _add_cover(self, story, class_stats, title=None):
+        """添加班级报告封面：各班级的提交和完成情况汇总"""
+        story.append(Spacer(1, 3*cm))
+        story.append(Paragraph("茶文化课程班级报告", self.title_style))
+        if title:
+            story.append(Paragraph(title, self.heading3_style))
+        story.append(Spacer(1, 1*cm))
         
-        # 生成PDF
-        doc.build(story)
-        
-        return output_path
+        story.append(Paragraph("班级数据汇总", self.heading2_style))
+        data = [['学校', '年级', '班级', '提交组数', '任务一', '任务二', '思考题一', '思考题二', '创意题', '平均提问数']]
+        total_groups = 0
+        for item in class_stats:
+            groups_count = item['groups']
+            total_groups += groups_count
+            average = f"{item['user_questions'] / groups_count:.1f}" if groups_count else '0'
+            data.append([
+                Paragraph(item['school'] or '', self.info_cell_style),
+                item['grade'], f"{item['class_number']}班", groups_count,
+                item['task1'], item['task2'], item['thinking1'], item['thinking2'], item['creative'],
+                average
+            ])
+        
+        table = Table(data, colWidths=[3.2*cm, 1.4*cm, 1.3*cm, 1.5*cm, 1.3*cm, 1.3*cm, 1.5*cm, 1.5*cm, 1.3*cm, 1.6*cm], repeatRows=1)
+        table.setStyle(self.cover_table_style)
+        story.append(table)
+        story.append(Spacer(1, 0.5*cm))
+        story.append(Paragraph(f"共 {len(class_stats)} 个班级，{total_groups} 个小组", self.body_style))
     
     def _add_basic_info(self, story, group):
         """添加学生基本信息"""
@@ -194,19 +435,7 @@ class PDFExportService:
         ]
         
         table = Table(data, colWidths=[3*cm, 4*cm, 3*cm, 4*cm])
-        table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Chinese'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#E8F5E9')),
-            ('BACKGROUND', (2, 0), (2, -1), colors.HexColor('#E8F5E9')),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#2E7D32')),
-            ('TEXTCOLOR', (2, 0), (2, -1), colors.HexColor('#2E7D32')),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, colors.HexColor('#F5F5F5')]),
-            ('PADDING', (0, 0), (-1, -1), 8),
-        ]))
+        table.setStyle(self.basic_info_table_style)
         story.append(table)
         
         # 小组成员
@@ -224,15 +453,7 @@ class PDFExportService:
         if task1.tea_name or task1.teacher_tea_name or task1.tea_category:
             story.append(Paragraph("（一）茶品信息", self.heading3_style))
             
-            # 创建单元格样式（支持自动换行）
-            info_cell_style = ParagraphStyle(
-                'InfoCellStyle',
-                parent=self.body_style,
-                fontName='Chinese',
-                fontSize=10,
-                leading=14,
-                wordWrap='CJK'
-            )
+            info_cell_style = self.info_cell_style
             
             info_data = [
                 ['茶品名', Paragraph(task1.tea_name or '未填写', info_cell_style), 
@@ -251,16 +472,7 @@ class PDFExportService:
         story.append(Paragraph("（二）同款茶不同形态的感官记录", self.heading3_style))
         records = task1.get_sensory_records()
         
-        # 创建表格单元格样式（支持自动换行）
-        cell_style = ParagraphStyle(
-            'CellStyle',
-            parent=self.body_style,
-            fontName='Chinese',
-            fontSize=9,
-            leading=12,
-            alignment=TA_CENTER,
-            wordWrap='CJK'
-        )
+        cell_style = self.cell_style
         
         # 将所有单元格文本包裹在Paragraph中
         sensory_data = [
@@ -283,18 +495,7 @@ class PDFExportService:
         ]
         
         table = Table(sensory_data, colWidths=[2.5*cm, 3*cm, 3*cm, 3*cm, 3*cm])
-        table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Chinese'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4CAF50')),
-            ('BACKGROUND', (0, 1), (0, -1), colors.HexColor('#E8F5E9')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('TEXTCOLOR', (0, 1), (0, -1), colors.HexColor('#2E7D32')),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('PADDING', (0, 0), (-1, -1), 6),
-        ]))
+        table.setStyle(self.sensory_table_style)
         story.append(table)
         
         # 思考题
@@ -302,6 +503,9 @@ class PDFExportService:
             story.append(Spacer(1, 0.3*cm))
             story.append(Paragraph("（三）品评其他组同类的茶滋味，有何异同？为什么？", self.heading3_style))
             story.append(Paragraph(task1.reflection_answer, self.body_style))
+        
+        # 照片
+        self._add_photos(story, group, 'task1')
     
     def _add_task2(self, story, group):
         """添加任务二数据"""
@@ -312,15 +516,7 @@ class PDFExportService:
         # 茶品信息
         story.append(Paragraph("（一）第二次冲泡的关键因素控制及茶汤的特点记录", self.heading3_style))
         
-        # 创建单元格样式（支持自动换行）
-        task2_cell_style = ParagraphStyle(
-            'Task2CellStyle',
-            parent=self.body_style,
-            fontName='Chinese',
-            fontSize=10,
-            leading=14,
-            wordWrap='CJK'
-        )
+        task2_cell_style = self.info_cell_style
         
         data = [
             ['茶品名', Paragraph(task2.tea_name or '未填写', task2_cell_style), 
@@ -346,6 +542,9 @@ class PDFExportService:
             story.append(Spacer(1, 0.3*cm))
             story.append(Paragraph("（二）现冲泡的茶滋味是否符合心中的？你觉得符合预期/不符合预期的关键点在哪里？", self.heading3_style))
             story.append(Paragraph(task2.reflection_answer, self.body_style))
+        
+        # 照片
+        self._add_photos(story, group, 'task2')
     
     def _add_thinking_questions(self, story, group):
         """添加思考题"""
@@ -357,6 +556,7 @@ class PDFExportService:
             story.append(Paragraph("通过今天的课程，你们对茶文化有了哪些新的认识？你们喜欢课程的哪些环节？还有没有其他想要了解的茶文化内容？", self.body_style))
             if thinking_dict['thinking1'].answer:
                 story.append(Paragraph(thinking_dict['thinking1'].answer, self.body_style))
+            self._add_photos(story, group, 'thinking1')
             story.append(Spacer(1, 0.3*cm))
         
         # 思考题二
@@ -365,6 +565,7 @@ class PDFExportService:
             story.append(Paragraph("通过亲身体验，感受茶文化，你觉得茶为什么可以成为'中国文化名片'？", self.body_style))
             if thinking_dict['thinking2'].answer:
                 story.append(Paragraph(thinking_dict['thinking2'].answer, self.body_style))
+            self._add_photos(story, group, 'thinking2')
             story.append(Spacer(1, 0.3*cm))
         
         # 创意题
@@ -372,6 +573,7 @@ class PDFExportService:
             story.append(Paragraph("六、创意题", self.heading2_style))
             if thinking_dict['creative'].answer:
                 story.append(Paragraph(thinking_dict['creative'].answer, self.body_style))
+            self._add_photos(story, group, 'creative')
             story.append(Spacer(1, 0.3*cm))
     
     def _add_chat_messages(self, story, group):
@@ -393,30 +595,13 @@ class PDFExportService:
         
         for i, msg in enumerate(chat_messages[:display_count]):
             role_name = "👤 学生" if msg.role == 'user' else "🤖 茶助教"
-            bg_color = colors.HexColor('#E8F5E9') if msg.role == 'user' else colors.HexColor('#F3E5F5')
-            
-            # 创建对话框样式（支持自动换行）
-            chat_style = ParagraphStyle(
-                'ChatStyle',
-                parent=self.body_style,
-                fontName='Chinese',
-                fontSize=10,
-                leading=16,
-                wordWrap='CJK'  # 支持中文换行
-            )
             
             # 使用Paragraph对象处理文本，确保长文本能自动换行
-            content_paragraph = Paragraph(f"<b>{role_name}：</b>{msg.content}", chat_style)
+            content_paragraph = Paragraph(f"<b>{role_name}：</b>{msg.content}", self.chat_style)
             
             data = [[content_paragraph]]
             table = Table(data, colWidths=[14*cm])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, -1), bg_color),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('PADDING', (0, 0), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ]))
+            table.setStyle(self.chat_table_styles['user' if msg.role == 'user' else 'assistant'])
             story.append(table)
             story.append(Spacer(1, 0.2*cm))
         
@@ -424,18 +609,57 @@ class PDFExportService:
             remaining = len(chat_messages) - display_count
             story.append(Paragraph(f"（还有 {remaining} 条对话未显示，请查看完整数据）", self.small_style))
     
+    def _add_photos(self, story, group, photo_type):
+        """
+        添加某一部分的照片（每行两张）
+        
+        使用缩小后的派生图（见 photo_service.get_pdf_derivative），原图缺失的照片跳过
+        """
+        photos = sorted(
+            (p for p in group.photos if p.photo_type == photo_type),
+            key=lambda p: p.photo_index
+        )
+        
+        images = []
+        for photo in photos:
+            derivative = get_pdf_derivative(photo)
+            if derivative is None:
+                continue
+            path, (width, height) = derivative
+            
+            # 按比例缩放到单元格内
+            scale = min(PHOTO_MAX_WIDTH / width, PHOTO_MAX_HEIGHT / height)
+            images.append(Image(str(path), width=width * scale, height=height * scale))
+        
+        if not images:
+            return
+        
+        story.append(Spacer(1, 0.3*cm))
+        rows = [images[i:i + 2] for i in range(0, len(images), 2)]
+        if len(rows[-1]) < 2:
+            rows[-1].append('')
+        table = Table(rows, colWidths=[PHOTO_MAX_WIDTH + 0.5*cm] * 2)
+        table.setStyle(self.photo_table_style)
+        story.append(table)
+    
     def _get_table_style(self):
         """获取通用表格样式"""
-        return TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Chinese'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#E8F5E9')),
-            ('BACKGROUND', (2, 0), (2, -1), colors.HexColor('#E8F5E9')),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#2E7D32')),
-            ('TEXTCOLOR', (2, 0), (2, -1), colors.HexColor('#2E7D32')),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('PADDING', (0, 0), (-1, -1), 8),
-        ])
+        return self.table_style
+
 
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_pdf_renderer():
+    """
+    获取进程内共享的PDF导出服务（首次调用时初始化字体和样式）
+    
+    样式对象在生成过程中只读，多个线程可以同时使用同一个实例生成PDF
+    """
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = PDFExportService()
+    return _renderer
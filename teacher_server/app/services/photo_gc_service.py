@@ -0,0 +1,314 @@
+"""
+照片文件回收服务
+对照数据库中引用的照片与照片存储中的照片（本机目录、打包文件或对象存储，见 app/utils/photo_storage.py）：
+- 没有任何 Photo 记录引用的照片（孤立照片）移入隔离目录或直接删除，对应的PDF派生图一并删除
+- Photo 记录引用但文件不存在的照片列入报告
+- 按文件名哈希分为若干片，定时任务每次只检查和处理一片，逐步覆盖全部照片；
+  列出照片存储和读取数据库引用（只查询 file_name 一列）每次仍是完整的，分片减少的是逐个检查、移动和删除的照片数
+- 照片存储和派生图目录同时扫描，孤立照片分批在线程池中检查和处理
+- 最近写入的文件（可能属于尚未提交的事务）跳过；处理前再查一次数据库确认仍未被引用
+- 默认只报告且不定时运行，移动或删除照片需要在配置中开启
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import os
+import shutil
+import threading
+import time
+import traceback
+import zlib
+from app import db
+from app.models import Photo
+from app.utils.photo_storage import photo_storage
+
+# 处理方式：只报告 / 移入隔离目录 / 删除
+GC_MODES = ('report', 'quarantine', 'delete')
+
+# 报告中最多列出的文件名数量
+_REPORT_LIMIT = 200
+
+# 每批处理和确认的文件数
+_BATCH_SIZE = 500
+
+
+def shard_of(file_name, shards):
+    """照片所属的分片"""
+    return zlib.crc32(file_name.encode('utf-8')) % shards
+
+
+def _batches(items, size=_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def load_referenced(shard_ids, shards):
+    """
+    数据库中引用的照片文件名（只保留指定分片）
+
+    分片按文件名的crc32计算，无法在SQL中筛选：逐行读取全部 file_name 后在内存中过滤
+    """
+    referenced = set()
+    for (file_name,) in db.session.query(Photo.file_name).yield_per(1000):
+        if shard_of(file_name, shards) in shard_ids:
+            referenced.add(file_name)
+    return referenced
+
+
+def _still_unreferenced(file_names):
+    """处理前再次查询数据库，排除扫描期间新提交的照片"""
+    referenced = set()
+    for batch in _batches(file_names):
+        referenced.update(
+            name for (name,) in db.session.query(Photo.file_name).filter(Photo.file_name.in_(batch))
+        )
+    return [name for name in file_names if name not in referenced]
+
+
+def _scan_photos(shard_ids, shards):
+    """照片存储中属于指定分片的照片文件名"""
+    return {name for name in photo_storage.names() if shard_of(name, shards) in shard_ids}
+
+
+def _stat_photos(names):
+    """一批照片的 (文件名, (字节数, 修改时间))，已不存在的照片跳过"""
+    stats = []
+    for name in names:
+        stat = photo_storage.stat(name)
+        if stat is not None:
+            stats.append((name, stat))
+    return stats
+
+
+def _scan_derivatives(folder, shard_ids, shards):
+    """派生图目录中属于指定分片的文件：(派生图, 原图文件名)"""
+    derivatives = []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                # <原图文件名去掉扩展名>_<尺寸>.jpg 或生成中断留下的 <...>.<pid>.tmp
+                stem = entry.name.split('.', 1)[0].rsplit('_', 1)[0]
+                source_name = stem + '.jpg'
+                if shard_of(source_name, shards) in shard_ids:
+                    derivatives.append((entry, source_name))
+    except FileNotFoundError:
+        pass
+    return derivatives
+
+
+class PhotoReconciler:
+    """孤立照片回收（可按配置定时运行）"""
+
+    def __init__(self):
+        self._app = None
+        self._timer = None
+        self._running = threading.Lock()
+        self._next_shard = 0
+        self.mode = 'report'
+        self.interval = 0
+        self.shards = 24
+        self.grace_seconds = 3600
+        self.workers = 4
+        self.max_orphan_ratio = 0.5
+        self.upload_folder = None
+        self.quarantine_folder = None
+        self.last_report = None
+
+    def init_app(self, app):
+        """读取配置，设置了运行间隔时启动定时任务"""
+        self._app = app
+        self.mode = app.config.get('PHOTO_GC_MODE', self.mode)
+        self.interval = app.config.get('PHOTO_GC_INTERVAL_SECONDS', self.interval)
+        self.shards = max(1, app.config.get('PHOTO_GC_SHARDS', self.shards))
+        self.grace_seconds = app.config.get('PHOTO_GC_GRACE_SECONDS', self.grace_seconds)
+        self.workers = app.config.get('PHOTO_GC_WORKERS', self.workers)
+        self.max_orphan_ratio = app.config.get('PHOTO_GC_MAX_ORPHAN_RATIO', self.max_orphan_ratio)
+        self.upload_folder = Path(app.config['UPLOAD_FOLDER'])
+        self.quarantine_folder = Path(app.config['PHOTO_GC_QUARANTINE_FOLDER'])
+        if self.interval and self._timer is None:
+            self._schedule()
+
+    def _schedule(self):
+        self._timer = threading.Timer(self.interval, self._tick)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _tick(self):
+        """定时任务：处理下一个分片"""
+        try:
+            with self._app.app_context():
+                self.run()
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self._schedule()
+
+    def run(self, mode=None, full=False):
+        """
+        执行一次回收（需要在应用上下文中调用）
+
+        Args:
+            mode: 处理方式（report/quarantine/delete），默认使用配置 PHOTO_GC_MODE
+            full: 为真时一次处理全部分片，否则只处理下一个分片
+
+        Returns:
+            报告字典；已有回收在进行时返回None
+        """
+        mode = mode or self.mode
+        if mode not in GC_MODES:
+            raise ValueError(f'不支持的处理方式: {mode}')
+
+        if not self._running.acquire(blocking=False):
+            return None
+        try:
+            if full:
+                shard_ids = set(range(self.shards))
+            else:
+                shard_ids = {self._next_shard}
+                self._next_shard = (self._next_shard + 1) % self.shards
+            report = self._reconcile(shard_ids, mode)
+            self.last_report = report
+            return report
+        finally:
+            self._running.release()
+
+    def _reconcile(self, shard_ids, mode):
+        started = time.time()
+        cutoff = started - self.grace_seconds
+        report = {
+            'mode': mode,
+            'shards': sorted(shard_ids),
+            'shard_count': self.shards,
+            'started_at': datetime.fromtimestamp(started).isoformat(),
+            'scanned': 0,
+            'referenced': 0,
+            'orphan_count': 0,
+            'orphan_bytes': 0,
+            'orphans': [],
+            'skipped_recent': 0,
+            'derivatives_removed': 0,
+            'missing_count': 0,
+            'missing': [],
+            'errors': [],
+            'aborted': False
+        }
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='photo-gc') as executor:
+            # 照片存储和派生图目录同时扫描，期间在当前线程加载数据库引用
+            photos_future = executor.submit(_scan_photos, shard_ids, self.shards)
+            derivatives_future = executor.submit(
+                _scan_derivatives, self.upload_folder / 'pdf', shard_ids, self.shards
+            )
+            referenced = load_referenced(shard_ids, self.shards)
+            stored = photos_future.result()
+            derivatives = derivatives_future.result()
+
+            report['scanned'] = len(stored)
+            report['referenced'] = len(referenced)
+
+            # 数据库引用但不存在的照片
+            missing = sorted(referenced - stored)
+            report['missing_count'] = len(missing)
+            report['missing'] = missing[:_REPORT_LIMIT]
+            if missing:
+                print(f"[照片回收] {len(missing)} 张照片文件不存在，例如: {missing[0]}")
+
+            # 没有被引用的照片（跳过最近写入的）
+            candidates = []
+            for stats in executor.map(_stat_photos, _batches(sorted(stored - referenced))):
+                for name, (size, mtime) in stats:
+                    if mtime > cutoff:
+                        report['skipped_recent'] += 1
+                    else:
+                        candidates.append((name, size))
+
+            confirmed = set(_still_unreferenced([name for name, _ in candidates]))
+            orphans = [candidate for candidate in candidates if candidate[0] in confirmed]
+            report['orphan_count'] = len(orphans)
+            report['orphan_bytes'] = sum(size for _, size in orphans)
+            report['orphans'] = [name for name, _ in orphans][:_REPORT_LIMIT]
+
+            # 数据库为空或连错数据库时几乎所有照片都是“孤立”的，这种情况下不处理
+            if (mode != 'report' and len(orphans) > 10
+                    and len(orphans) > report['scanned'] * self.max_orphan_ratio):
+                report['aborted'] = True
+                report['errors'].append(
+                    f'孤立照片占比过高（{len(orphans)}/{report["scanned"]}），未做处理，请确认数据库配置'
+                )
+                mode = 'report'
+
+            if mode != 'report':
+                quarantine = self.quarantine_folder / datetime.now().strftime('%Y%m%d')
+                errors = executor.map(
+                    lambda batch: self._dispose(batch, mode, quarantine), _batches(orphans)
+                )
+                for batch_errors in errors:
+                    report['errors'].extend(batch_errors)
+
+                # 原图未被引用（或已移走）的派生图和生成中断留下的临时文件直接删除，需要时可以重新生成
+                stale = [
+                    entry for entry, source_name in derivatives
+                    if (source_name not in referenced or entry.name.endswith('.tmp'))
+                    and _is_older(entry, cutoff)
+                ]
+                for batch_errors in executor.map(_remove_files, _batches(stale)):
+                    report['errors'].extend(batch_errors)
+                report['derivatives_removed'] = len(stale)
+
+        report['errors'] = report['errors'][:_REPORT_LIMIT]
+        report['duration_seconds'] = round(time.time() - started, 3)
+        if report['orphan_count'] or report['errors']:
+            print(
+                f"[照片回收] 分片 {report['shards'][:5]}: 孤立照片 {report['orphan_count']} 张"
+                f"（{report['orphan_bytes']} 字节，{mode}），错误 {len(report['errors'])} 个"
+            )
+        return report
+
+    def _dispose(self, orphans, mode, quarantine):
+        """移走或删除一批孤立照片，返回错误信息列表"""
+        errors = []
+        for name, _ in orphans:
+            try:
+                if mode == 'quarantine':
+                    quarantine.mkdir(parents=True, exist_ok=True)
+                    path = photo_storage.local_path(name)
+                    if path is not None:
+                        shutil.move(path, str(quarantine / name))
+                        continue
+                    # 打包存储或对象存储中的照片：复制到本机隔离目录后删除
+                    data = photo_storage.get(name)
+                    if data is None:
+                        continue
+                    (quarantine / name).write_bytes(data)
+                photo_storage.delete(name)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                errors.append(f'{name}: {e}')
+        return errors
+
+
+def _is_older(entry, cutoff):
+    try:
+        return entry.stat().st_mtime <= cutoff
+    except OSError:
+        return False
+
+
+def _remove_files(entries):
+    """删除一批文件，返回错误信息列表"""
+    errors = []
+    for entry in entries:
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            errors.append(f'{entry.name}: {e}')
+    return errors
+
+
+# 孤立照片回收
+photo_reconciler = PhotoReconciler()
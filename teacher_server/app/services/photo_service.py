@@ -1,5 +1,17 @@
 """
 照片处理服务
+
+PDF报告使用缩小后的照片副本（派生图）：首次使用时生成，保存在原图旁边的 pdf 子目录中，
+之后直接复用，报告不再嵌入数MB的原图
+
+页面显示的缩略图按请求的尺寸生成，保存在缩略图缓存（thumb_cache，按LRU淘汰）中
+
+照片原图通过 photo_storage 读写（本机文件、打包文件或S3兼容对象存储，见 app/utils/photo_storage.py），
+生成派生图和缩略图时通过 open_photo_source / get_photo_mtime 读取
+
+照片文件与数据库事务同步（register_photo_file_cleanup）：
+- 更新提交时替换下来的旧照片，事务提交成功后才删除文件
+- 事务回滚时删除本次事务中新写入的照片文件
 """
 import os
 import base64
@@ -7,6 +19,7 @@ from pathlib import Path
 from datetime import datetime
 from PIL import Image
 import io
+import uuid
 from app import db
 from app.models import Photo
 from pathlib import Path
@@ -14,6 +27,18 @@ import sys
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from config import Config
+from app.utils.disk_cache import thumb_cache
+from app.utils.photo_storage import photo_storage
+from app.utils.singleflight import SingleFlight
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# 进行中的缩略图生成（同一缩略图只生成一次）
+thumbnail_flights = SingleFlight()
+
+# 会话中待处理的照片文件（session.info 中的键）
+_WRITTEN_KEY = 'photo_files_written'
+_REPLACED_KEY = 'photo_files_replaced'
 
 def save_photo_from_base64(base64_str, group_id, photo_type, photo_index, submission_id):
     """
@@ -43,20 +68,18 @@ def save_photo_from_base64(base64_str, group_id, photo_type, photo_index, submis
         # 重新打开图片（verify后需要重新打开）
         img = Image.open(io.BytesIO(image_data))
         
-        # 生成文件名
+        # 生成文件名（随机后缀保证唯一：同一秒内重新提交时不会覆盖待删除的旧照片，照片URL也不会指向新内容）
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        file_name = f"{submission_id}_{photo_type}_{photo_index}_{timestamp}.jpg"
-        
-        # 确保目录存在
-        upload_folder = Path(Config.UPLOAD_FOLDER)
-        upload_folder.mkdir(parents=True, exist_ok=True)
+        file_name = f"{submission_id}_{photo_type}_{photo_index}_{timestamp}_{uuid.uuid4().hex[:8]}.jpg"
         
-        # 保存文件
-        file_path = upload_folder / file_name
-        img.save(file_path, 'JPEG', quality=85)
+        # 保存到照片存储（记录中的路径和URL与存储方式无关）
+        file_path = Path(Config.UPLOAD_FOLDER) / file_name
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=85)
+        file_size = photo_storage.put(file_name, buffer.getvalue())
         
-        # 获取文件大小
-        file_size = file_path.stat().st_size
+        # 事务回滚时删除
+        db.session.info.setdefault(_WRITTEN_KEY, []).append(file_name)
         
         # 创建Photo记录
         photo = Photo(
@@ -89,9 +112,7 @@ def delete_photo(photo):
     
     try:
         # 删除文件
-        file_path = Path(Config.UPLOAD_FOLDER) / Path(photo.file_path).name
-        if file_path.exists():
-            file_path.unlink()
+        remove_photo_file(photo)
         
         # 删除数据库记录
         db.session.delete(photo)
@@ -100,3 +121,204 @@ def delete_photo(photo):
         print(f"删除照片失败: {e}")
         return False
 
+
+def remove_photo_file(photo):
+    """删除照片原图（单独文件或打包存储中的记录）和派生图"""
+    remove_photo_file_by_name(get_photo_path(photo).name)
+
+
+def remove_photo_file_by_name(file_name):
+    """按文件名删除照片原图和派生图"""
+    photo_storage.delete(file_name)
+    _remove_derivatives(Path(Config.UPLOAD_FOLDER) / file_name)
+
+
+def discard_photos(group_id, photo_type):
+    """
+    删除小组某一类型的照片记录（更新提交时替换旧照片）
+    
+    文件在事务提交成功后才删除，提交失败时旧照片仍然完整
+    """
+    query = Photo.query.filter_by(group_id=group_id, photo_type=photo_type)
+    file_names = [Path(file_path).name for (file_path,) in query.with_entities(Photo.file_path)]
+    query.delete()
+    _discard_after_commit(file_names)
+
+
+def discard_photo_files(photos):
+    """照片记录在当前事务中删除（如删除小组时级联删除），文件在事务提交成功后删除"""
+    _discard_after_commit([get_photo_path(photo).name for photo in photos])
+
+
+def _discard_after_commit(file_names):
+    db.session.info.setdefault(_REPLACED_KEY, []).extend(file_names)
+
+
+def _after_commit(session):
+    """事务提交后删除被替换的旧照片文件（本次事务中重新写入的同名照片除外）"""
+    written = set(session.info.pop(_WRITTEN_KEY, ()))
+    for file_name in session.info.pop(_REPLACED_KEY, ()):
+        if file_name in written:
+            continue
+        try:
+            remove_photo_file_by_name(file_name)
+        except Exception as e:
+            print(f"删除旧照片文件失败: {file_name}, 错误: {e}")
+
+
+def _after_rollback(session, previous_transaction):
+    """事务回滚后删除本次事务中写入的照片文件（只处理最外层事务）"""
+    if previous_transaction.parent is not None:
+        return
+    replaced = set(session.info.pop(_REPLACED_KEY, ()))
+    for file_name in session.info.pop(_WRITTEN_KEY, ()):
+        if file_name in replaced:
+            # 回滚后旧记录恢复，仍引用这个文件
+            continue
+        try:
+            remove_photo_file_by_name(file_name)
+        except Exception as e:
+            print(f"删除未提交的照片文件失败: {file_name}, 错误: {e}")
+
+
+def register_photo_file_cleanup():
+    """注册照片文件与事务同步的监听器（重复调用不会重复注册）"""
+    if not event.contains(Session, 'after_commit', _after_commit):
+        event.listen(Session, 'after_commit', _after_commit)
+    if not event.contains(Session, 'after_soft_rollback', _after_rollback):
+        event.listen(Session, 'after_soft_rollback', _after_rollback)
+
+
+def get_photo_path(photo):
+    """照片原图的文件路径"""
+    return Path(Config.UPLOAD_FOLDER) / Path(photo.file_path).name
+
+def get_photo_mtime(file_name):
+    """照片原图的修改时间（打包存储中为写入时间），照片不存在时返回None"""
+    stat = photo_storage.stat(file_name)
+    return stat[1] if stat is not None else None
+
+def open_photo_source(file_name):
+    """
+    获取照片原图的读取来源（本机文件直接返回路径，其他存储读入内存）
+    
+    Args:
+        file_name: 照片文件名
+    
+    Returns:
+        文件路径或内存文件对象（都可以直接传给 Image.open）；照片不存在时返回None
+    """
+    path = photo_storage.local_path(file_name)
+    if path is not None:
+        return path
+    
+    data = photo_storage.get(file_name)
+    return io.BytesIO(data) if data is not None else None
+
+def get_pdf_derivative(photo, max_size=None, quality=None):
+    """
+    获取照片用于PDF报告的缩小副本（不存在或比原图旧时生成）
+    
+    Args:
+        photo: Photo对象
+        max_size: 最长边像素数，默认使用配置 PDF_PHOTO_MAX_SIZE
+        quality: JPEG质量，默认使用配置 PDF_PHOTO_QUALITY
+    
+    Returns:
+        (派生图路径, (宽, 高))；原图不存在或无法读取时返回None
+    """
+    max_size = max_size or Config.PDF_PHOTO_MAX_SIZE
+    quality = quality or Config.PDF_PHOTO_QUALITY
+    
+    photo_path = get_photo_path(photo)
+    target = photo_path.parent / 'pdf' / f"{photo_path.stem}_{max_size}.jpg"
+    
+    source_mtime = get_photo_mtime(photo_path.name)
+    if source_mtime is None:
+        return None
+    
+    try:
+        if target.stat().st_mtime >= source_mtime:
+            # 只读取文件头获取尺寸
+            with Image.open(target) as img:
+                return target, img.size
+    except OSError:
+        pass
+    
+    try:
+        # 先写临时文件再替换（多个进程同时生成时不会读到不完整的文件）
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f"{target.stem}.{os.getpid()}.tmp")
+        size = save_downscaled(open_photo_source(photo_path.name), tmp_path, max_size, quality)
+        os.replace(tmp_path, target)
+        return target, size
+    except Exception as e:
+        print(f"生成照片缩略图失败: {photo.file_path}, 错误: {e}")
+        return None
+
+def save_downscaled(source, output, max_size, quality):
+    """
+    将图片按比例缩小到最长边不超过 max_size 并保存为JPEG
+    
+    Args:
+        source: 原图路径或可读的文件对象
+        output: 输出路径或可写的文件对象
+        max_size: 最长边像素数
+        quality: JPEG质量
+    
+    Returns:
+        缩小后的 (宽, 高)
+    """
+    with Image.open(source) as img:
+        # JPEG按目标尺寸直接以缩小比例解码，不解码完整分辨率
+        img.draft('RGB', (max_size, max_size))
+        img = img.convert('RGB')
+        img.thumbnail((max_size, max_size), Image.LANCZOS)
+        img.save(output, 'JPEG', quality=quality, optimize=True)
+        return img.size
+
+def get_thumbnail(file_name, size):
+    """
+    获取照片的缩略图（按允许的尺寸向上取整，未缓存时生成）
+    
+    Args:
+        file_name: 照片文件名
+        size: 请求的最长边像素数
+    
+    Returns:
+        (缩略图路径, 缓存键)；照片不存在时返回 (None, None)。缓存键可用于生成ETag
+    """
+    sizes = sorted(Config.THUMBNAIL_SIZES)
+    size = next((s for s in sizes if s >= size), sizes[-1])
+    
+    source_mtime = get_photo_mtime(file_name)
+    if source_mtime is None:
+        return None, None
+    
+    # 原图被替换后修改时间变化，旧缩略图不再命中
+    key = ('thumb', file_name, size, source_mtime)
+    path = thumb_cache.get(key, '.jpg')
+    if path is not None:
+        return path, key
+    
+    def generate():
+        cached = thumb_cache.get(key, '.jpg')
+        if cached is not None:
+            return cached
+        return thumb_cache.put(
+            key, lambda f: save_downscaled(open_photo_source(file_name), f, size, Config.THUMBNAIL_QUALITY), '.jpg'
+        )
+    
+    path, _ = thumbnail_flights.do(key, generate, timeout=30)
+    return path, key
+
+def remove_photo_derivatives(photo):
+    """删除照片的派生图"""
+    _remove_derivatives(get_photo_path(photo))
+
+def _remove_derivatives(source):
+    for path in (source.parent / 'pdf').glob(f"{source.stem}_*.jpg"):
+        try:
+            path.unlink()
+        except OSError:
+            pass
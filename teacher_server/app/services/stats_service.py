@@ -0,0 +1,195 @@
+"""
+班级统计服务
+统计在SQL中聚合，结果写入 class_stats 汇总表；
+每次提交/删除只刷新受影响的班级，统计页面和Excel摘要直接读取汇总表
+"""
+from datetime import datetime
+from sqlalchemy import func, case
+from app import db
+from app.models import (
+    StudentGroup, Task1Data, Task2Data, ThinkingQuestion, ChatMessage, ClassStats
+)
+
+# 汇总表中的计数字段
+_COUNT_FIELDS = (
+    'group_count', 'task1_count', 'task2_count',
+    'thinking1_count', 'thinking2_count', 'creative_count',
+    'user_question_count'
+)
+
+
+def _aggregate_query():
+    """按 学校/年级/班级/活动日期 聚合统计（每个学生组只对应一行，避免JOIN放大计数）"""
+    thinking = db.session.query(
+        ThinkingQuestion.group_id.label('group_id'),
+        func.max(case((ThinkingQuestion.question_type == 'thinking1', 1), else_=0)).label('thinking1'),
+        func.max(case((ThinkingQuestion.question_type == 'thinking2', 1), else_=0)).label('thinking2'),
+        func.max(case((ThinkingQuestion.question_type == 'creative', 1), else_=0)).label('creative')
+    ).group_by(ThinkingQuestion.group_id).subquery()
+
+    questions = db.session.query(
+        ChatMessage.group_id.label('group_id'),
+        func.count(ChatMessage.id).label('count')
+    ).filter(ChatMessage.role == 'user').group_by(ChatMessage.group_id).subquery()
+
+    return db.session.query(
+        StudentGroup.school,
+        StudentGroup.grade,
+        StudentGroup.class_number,
+        StudentGroup.activity_date,
+        func.count(StudentGroup.id),
+        func.count(Task1Data.id),
+        func.count(Task2Data.id),
+        func.coalesce(func.sum(thinking.c.thinking1), 0),
+        func.coalesce(func.sum(thinking.c.thinking2), 0),
+        func.coalesce(func.sum(thinking.c.creative), 0),
+        func.coalesce(func.sum(questions.c.count), 0)
+    ).outerjoin(
+        Task1Data, Task1Data.group_id == StudentGroup.id
+    ).outerjoin(
+        Task2Data, Task2Data.group_id == StudentGroup.id
+    ).outerjoin(
+        thinking, thinking.c.group_id == StudentGroup.id
+    ).outerjoin(
+        questions, questions.c.group_id == StudentGroup.id
+    ).group_by(
+        StudentGroup.school,
+        StudentGroup.grade,
+        StudentGroup.class_number,
+        StudentGroup.activity_date
+    )
+
+
+def _apply_counts(stats, row):
+    """将聚合结果写入汇总行"""
+    for field, value in zip(_COUNT_FIELDS, row[4:]):
+        setattr(stats, field, int(value or 0))
+    stats.updated_at = datetime.utcnow()
+
+
+def refresh_class_stats(school, grade, class_number, activity_date):
+    """
+    刷新单个班级某天的统计（在提交/删除的事务内调用，随业务数据一起提交）
+
+    Args:
+        school: 学校
+        grade: 年级
+        class_number: 班级
+        activity_date: 活动日期
+    """
+    row = _aggregate_query().filter(
+        StudentGroup.school == school,
+        StudentGroup.grade == grade,
+        StudentGroup.class_number == class_number,
+        StudentGroup.activity_date == activity_date
+    ).first()
+
+    stats = ClassStats.query.filter_by(
+        school=school,
+        grade=grade,
+        class_number=class_number,
+        activity_date=activity_date
+    ).first()
+
+    if row is None:
+        # 该班级当天已无数据
+        if stats:
+            db.session.delete(stats)
+        return
+
+    if stats is None:
+        stats = ClassStats(
+            school=school,
+            grade=grade,
+            class_number=class_number,
+            activity_date=activity_date
+        )
+        db.session.add(stats)
+
+    _apply_counts(stats, row)
+
+
+def rebuild_class_stats():
+    """
+    全量重建统计汇总表（用于首次启用或数据修复）
+
+    Returns:
+        重建的班级统计行数
+    """
+    ClassStats.query.delete()
+    count = 0
+    for row in _aggregate_query().all():
+        stats = ClassStats(
+            school=row[0],
+            grade=row[1],
+            class_number=row[2],
+            activity_date=row[3]
+        )
+        _apply_counts(stats, row)
+        db.session.add(stats)
+        count += 1
+    db.session.commit()
+    return count
+
+
+def ensure_class_stats():
+    """汇总表为空但已有数据时（旧数据库升级后）自动重建"""
+    if ClassStats.query.first() is None and StudentGroup.query.first() is not None:
+        count = rebuild_class_stats()
+        print(f"[班级统计] 已根据现有数据重建 {count} 条班级统计")
+
+
+def _filtered_stats_query(query, school='', grade='', class_number='', start_date=None, end_date=None):
+    """应用与列表页一致的筛选条件"""
+    if school:
+        query = query.filter(ClassStats.school.contains(school))
+    if grade:
+        query = query.filter(ClassStats.grade == grade)
+    if class_number:
+        query = query.filter(ClassStats.class_number == class_number)
+    if start_date:
+        query = query.filter(ClassStats.activity_date >= start_date)
+    if end_date:
+        query = query.filter(ClassStats.activity_date <= end_date)
+    return query
+
+
+def get_class_stats(school='', grade='', class_number='', start_date=None, end_date=None):
+    """获取按活动日期细分的班级统计"""
+    query = _filtered_stats_query(
+        ClassStats.query, school, grade, class_number, start_date, end_date
+    )
+    rows = query.order_by(
+        ClassStats.school, ClassStats.grade, ClassStats.class_number, ClassStats.activity_date
+    ).all()
+    return [row.to_dict() for row in rows]
+
+
+def get_class_summary(school='', grade='', class_number='', start_date=None, end_date=None):
+    """
+    获取按班级汇总的统计（跨活动日期求和）
+
+    Returns:
+        列表，每项为 {school, grade, class_number, groups, task1, task2,
+        thinking1, thinking2, creative, user_questions}
+    """
+    query = db.session.query(
+        ClassStats.school,
+        ClassStats.grade,
+        ClassStats.class_number,
+        *[func.sum(getattr(ClassStats, field)) for field in _COUNT_FIELDS]
+    )
+    query = _filtered_stats_query(query, school, grade, class_number, start_date, end_date)
+    rows = query.group_by(
+        ClassStats.school, ClassStats.grade, ClassStats.class_number
+    ).order_by(
+        ClassStats.school, ClassStats.grade, ClassStats.class_number
+    ).all()
+
+    keys = ('groups', 'task1', 'task2', 'thinking1', 'thinking2', 'creative', 'user_questions')
+    results = []
+    for row in rows:
+        item = {'school': row[0], 'grade': row[1], 'class_number': row[2]}
+        item.update({key: int(value or 0) for key, value in zip(keys, row[3:])})
+        results.append(item)
+    return results
@@ -0,0 +1,148 @@
+"""
+进程内响应缓存
+- 全局数据版本号：缓存键包含版本号，数据变化后旧缓存自然失效。
+  版本号由数据库中的最新变更游标和进程内计数器组成：多个进程或多台服务器共用数据库时，
+  其他进程提交的数据同样使本进程的缓存失效
+- LRU淘汰，按响应体字节数限制内存占用
+"""
+from collections import OrderedDict
+from functools import wraps
+import threading
+from flask import request, make_response, Response
+
+
+class DataVersion:
+    """全局数据版本号（数据库中的版本 + 进程内计数器）"""
+
+    def __init__(self):
+        self._value = 0
+        self._source = None
+        self._lock = threading.Lock()
+
+    def init_app(self, source):
+        """
+        设置数据库中的版本来源
+
+        Args:
+            source: 返回当前数据版本的函数（需要在应用上下文中调用），如最新的变更游标
+        """
+        self._source = source
+
+    @property
+    def current(self):
+        if self._source is None:
+            return self._value
+        return self._source(), self._value
+
+    def bump(self):
+        """数据发生变化时调用，返回新的版本号"""
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+class ResponseCache:
+    """按字节数限制大小的LRU响应缓存"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """从应用配置读取缓存大小"""
+        self.max_bytes = app.config.get('RESPONSE_CACHE_MAX_BYTES', self.max_bytes)
+        self.clear()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        size = len(entry['body'])
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old['body'])
+
+            self._entries[key] = entry
+            self._size += size
+
+            # 超出容量时淘汰最久未使用的条目
+            while self._size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted['body'])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @property
+    def size(self):
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+
+data_version = DataVersion()
+response_cache = ResponseCache()
+
+# 缓存响应时保留的响应头
+_CACHED_HEADERS = ('ETag', 'Cache-Control')
+
+
+def normalize_args(args):
+    """规范化查询参数：去除首尾空白、丢弃空值并排序"""
+    items = []
+    for key, value in args.items(multi=True):
+        value = value.strip()
+        if value:
+            items.append((key, value))
+    return tuple(sorted(items))
+
+
+def cached_response(view):
+    """
+    视图缓存装饰器
+
+    缓存键为 (端点, 路径参数, 规范化的查询参数, 数据版本号)，
+    只缓存状态码为200的响应
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = data_version.current
+        key = (
+            request.endpoint,
+            tuple(sorted((request.view_args or {}).items())),
+            normalize_args(request.args),
+            version
+        )
+
+        entry = response_cache.get(key)
+        if entry is not None:
+            response = Response(entry['body'], status=200, mimetype=entry['mimetype'])
+            response.headers.extend(entry['headers'])
+            return response.make_conditional(request)
+
+        response = make_response(view(*args, **kwargs))
+
+        # 渲染期间数据已变化时不写入缓存，避免缓存过期数据
+        if response.status_code == 200 and not response.is_streamed and version == data_version.current:
+            response_cache.set(key, {
+                'body': response.get_data(),
+                'mimetype': response.mimetype,
+                'headers': [(name, response.headers[name]) for name in _CACHED_HEADERS if name in response.headers]
+            })
+
+        return response
+
+    return wrapper
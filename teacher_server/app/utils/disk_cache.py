@@ -0,0 +1,212 @@
+"""
+磁盘文件缓存
+用于缓存导出文件等生成成本高的产物：
+- 缓存键由调用方给出（如 筛选条件 + 格式 + 数据版本），数据变化后旧文件不再命中，按LRU逐步淘汰
+- 总大小超过磁盘预算时淘汰最久未使用的文件
+- 先写入临时文件，完整生成后再原子替换为正式文件；生成失败或客户端断开时删除临时文件
+"""
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import uuid
+from pathlib import Path
+
+# 未完成的临时文件后缀
+_TMP_SUFFIX = '.tmp'
+
+
+class DiskCache:
+    """按总字节数限制大小的LRU磁盘缓存"""
+
+    def __init__(self, directory=None, max_bytes=512 * 1024 * 1024):
+        self.directory = Path(directory) if directory else None
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # 文件名 → 字节数，按最近使用排序
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, directory, max_bytes=None):
+        """设置缓存目录并加载已有的缓存文件（清理上次运行遗留的临时文件）"""
+        self.directory = Path(directory)
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        files = []
+        for path in self.directory.iterdir():
+            if not path.is_file():
+                continue
+            if path.name.endswith(_TMP_SUFFIX):
+                self._remove_file(path)
+                continue
+            stat = path.stat()
+            files.append((stat.st_mtime, path.name, stat.st_size))
+
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            for _, name, size in sorted(files):
+                self._entries[name] = size
+                self._size += size
+            self._evict()
+
+    @staticmethod
+    def make_name(key, suffix=''):
+        """由缓存键生成文件名"""
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return digest + suffix
+
+    def get(self, key, suffix=''):
+        """
+        查找缓存文件
+
+        Returns:
+            文件路径，未命中时返回None
+        """
+        if self.directory is None:
+            return None
+
+        name = self.make_name(key, suffix)
+        path = self.directory / name
+        with self._lock:
+            if name not in self._entries:
+                return None
+            if not path.exists():
+                self._size -= self._entries.pop(name)
+                return None
+            self._entries.move_to_end(name)
+
+        # 更新修改时间，重启后仍能按最近使用顺序淘汰
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, key, write_func, suffix='', validate=None, fallback_key=None):
+        """
+        生成并缓存文件
+
+        Args:
+            key: 缓存键
+            write_func: 接收可写二进制文件对象的函数
+            suffix: 文件扩展名
+            validate: 可选，生成完毕后返回False时不以 key 写入缓存（如生成期间数据已变化）
+            fallback_key: validate() 为假时改用的缓存键（如只供一个任务下载）；为None时丢弃文件
+
+        Returns:
+            缓存文件路径；没有写入缓存时返回None
+        """
+        tmp_path = self._tmp_path()
+        try:
+            with open(tmp_path, 'wb') as f:
+                write_func(f)
+        except BaseException:
+            self._remove_file(tmp_path)
+            raise
+
+        if validate is not None and not validate():
+            if fallback_key is None:
+                self._remove_file(tmp_path)
+                return None
+            key = fallback_key
+        return self._commit(tmp_path, self.make_name(key, suffix))
+
+    def tee(self, key, chunks, suffix='', validate=None):
+        """
+        边产出内容边写入缓存（用于流式响应）
+
+        全部内容产出完毕且 validate() 为真时才写入缓存；
+        生成出错或客户端中途断开时丢弃临时文件
+
+        Args:
+            key: 缓存键
+            chunks: 字节块（或字符串块，按UTF-8编码）迭代器
+            suffix: 文件扩展名
+            validate: 可选，返回False时不写入缓存（如生成期间数据已变化）
+
+        Yields:
+            与 chunks 相同的内容
+        """
+        if self.directory is None:
+            yield from chunks
+            return
+
+        tmp_path = self._tmp_path()
+        committed = False
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                    yield chunk
+            if validate is None or validate():
+                self._commit(tmp_path, self.make_name(key, suffix))
+                committed = True
+        finally:
+            if not committed:
+                self._remove_file(tmp_path)
+
+    def clear(self):
+        """删除所有缓存文件"""
+        with self._lock:
+            names = list(self._entries)
+            self._entries.clear()
+            self._size = 0
+        for name in names:
+            self._remove_file(self.directory / name)
+
+    @property
+    def size(self):
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _tmp_path(self):
+        return self.directory / f'{uuid.uuid4().hex}{_TMP_SUFFIX}'
+
+    def _commit(self, tmp_path, name):
+        """临时文件替换为正式缓存文件并登记"""
+        path = self.directory / name
+        size = os.path.getsize(tmp_path)
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            # 同名文件正在被读取（Windows）时放弃本次缓存
+            self._remove_file(tmp_path)
+            return path if path.exists() else None
+
+        with self._lock:
+            old = self._entries.pop(name, None)
+            if old is not None:
+                self._size -= old
+            self._entries[name] = size
+            self._size += size
+            self._evict()
+        return path
+
+    def _evict(self):
+        """超出磁盘预算时淘汰最久未使用的文件（至少保留最新的一个）"""
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._size -= size
+            self._remove_file(self.directory / name)
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            # 文件正在被读取时（Windows）删除会失败，下次启动时重新登记后再淘汰
+            pass
+
+
+# 导出文件缓存
+export_cache = DiskCache()
+
+# PDF报告缓存（按 submission_id + updated_at）
+pdf_cache = DiskCache()
+
+# 照片缩略图缓存（按 文件名 + 尺寸 + 原图修改时间）
+thumb_cache = DiskCache()
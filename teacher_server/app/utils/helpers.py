@@ -2,6 +2,9 @@
 辅助函数
 """
 from datetime import datetime
+import hashlib
+import unicodedata
+from urllib.parse import quote
 
 def format_datetime(dt):
     """格式化日期时间"""
@@ -19,3 +22,41 @@ def format_date(d):
         return d
     return d.strftime('%Y-%m-%d')
 
+
+def make_etag(*parts):
+    """根据若干字段生成ETag（如 submission_id + updated_at）"""
+    raw = '|'.join(
+        part.isoformat() if isinstance(part, datetime) else str(part)
+        for part in parts
+    )
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+def make_content_disposition(download_name):
+    """生成附件下载的 Content-Disposition 头（支持中文文件名）"""
+    try:
+        download_name.encode('ascii')
+        return f'attachment; filename="{download_name}"'
+    except UnicodeEncodeError:
+        simple_name = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        quoted_name = quote(download_name, safe="!#$&+^`|~")
+        return f"attachment; filename=\"{simple_name}\"; filename*=UTF-8''{quoted_name}"
+
+def make_export_filename(school, grade, class_number, extension):
+    """根据筛选条件生成导出文件的下载文件名"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    
+    filename_parts = ['茶文化课程数据']
+    if school:
+        filename_parts.append(school)
+    if grade:
+        filename_parts.append(grade)
+    if class_number:
+        filename_parts.append(f'{class_number}班')
+    filename_parts.append(timestamp)
+    
+    return '_'.join(filename_parts) + extension
+
+def make_pdf_filename(group):
+    """生成单个小组PDF报告的下载文件名"""
+    group_num = f"小组{group.group_number}" if group.group_number else "未设置编号"
+    return f"茶文化课程报告_{group.school}_{group.grade}{group.class_number}班_{group_num}.pdf"
@@ -0,0 +1,231 @@
+"""
+照片打包存储（可选）
+照片按天追加写入一个打包文件（uploads/packs/YYYYMMDD.pack），偏移量和长度记录在同名索引文件（.idx）中：
+- 每张照片只需一次追加写入，照片目录中不再产生成千上万个小文件（目录列表、备份、杀毒扫描都更快）
+- 读取时按索引从打包文件中截取（mmap），照片URL和文件名不变
+- 只追加不修改：删除照片时在索引中追加删除标记，打包文件中的空间不回收
+- 多个进程可以同时写入：追加照片和索引行时持有打包目录的文件锁（pack.lock）
+
+索引文件每行一条记录：文件名\\t偏移量\\t长度\\t写入时间戳（长度为-1表示已删除）；
+启动时读取全部索引，之后只读取新增的行；写入中断产生的不完整行会被忽略
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import mmap
+import os
+import threading
+import time
+
+try:
+    import msvcrt
+except ImportError:  # 非Windows系统使用 fcntl
+    msvcrt = None
+    import fcntl
+
+_PACK_SUFFIX = '.pack'
+_INDEX_SUFFIX = '.idx'
+_LOCK_NAME = 'pack.lock'
+_DELETED = -1
+
+# 未找到照片时重新读取索引的最小间隔（秒）
+_REFRESH_INTERVAL = 1.0
+
+
+class PackedPhoto:
+    """打包存储中的一张照片"""
+
+    __slots__ = ('pack_name', 'offset', 'length', 'mtime')
+
+    def __init__(self, pack_name, offset, length, mtime):
+        self.pack_name = pack_name
+        self.offset = offset
+        self.length = length
+        self.mtime = mtime
+
+
+class PhotoPackStore:
+    """按天追加写入的照片打包存储"""
+
+    def __init__(self):
+        self.directory = None
+        self.enabled = False
+        self._entries = {}  # 文件名 → PackedPhoto
+        self._maps = {}  # 打包文件名 → mmap
+        self._index_offsets = {}  # 索引文件名 → 已读取到的位置
+        self._refreshed_at = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def open(self, directory):
+        """打开打包目录并加载全部索引（照片存储配置为 'pack' 时由 photo_storage 调用）"""
+        with self._lock:
+            self.directory = Path(directory)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._entries = {}
+            self._maps = {}
+            self._index_offsets = {}
+            self.enabled = True
+        self.refresh()
+
+    def refresh(self):
+        """
+        读取各索引文件新增的记录
+
+        多进程部署时其他进程写入的照片在这里变为可见；每个索引文件只从上次读取的位置继续读
+        """
+        with self._lock:
+            self._refreshed_at = time.monotonic()
+            for index_path in sorted(self.directory.glob('*' + _INDEX_SUFFIX)):
+                start = self._index_offsets.get(index_path.name, 0)
+                if index_path.stat().st_size <= start:
+                    continue
+                with open(index_path, 'rb') as f:
+                    f.seek(start)
+                    data = f.read()
+                # 写入中断或正在写入的不完整行留到下次读取
+                complete = data.rfind(b'\n') + 1
+                self._index_offsets[index_path.name] = start + complete
+                self._load_lines(index_path.stem + _PACK_SUFFIX, data[:complete])
+
+    def _load_lines(self, pack_name, data):
+        """解析索引行（调用方持有锁）"""
+        for line in data.decode('utf-8', errors='replace').splitlines():
+            try:
+                name, offset, length, mtime = line.split('\t')
+                offset, length, mtime = int(offset), int(length), float(mtime)
+            except ValueError:
+                continue
+            if length == _DELETED:
+                self._entries.pop(name, None)
+            else:
+                self._entries[name] = PackedPhoto(pack_name, offset, length, mtime)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, name):
+        """
+        查找照片记录，不存在时返回None
+
+        未找到时重新读取索引（其他进程可能刚写入），每秒最多一次
+        """
+        entry = self._entries.get(name)
+        if entry is None and self.enabled and time.monotonic() - self._refreshed_at >= _REFRESH_INTERVAL:
+            self.refresh()
+            entry = self._entries.get(name)
+        return entry
+
+    def names(self):
+        """所有照片的文件名"""
+        return list(self._entries)
+
+    def append(self, name, data):
+        """
+        追加一张照片到当天的打包文件
+
+        先写入照片数据再写入索引行，写入中断时索引中不会出现指向不完整数据的记录
+
+        Returns:
+            PackedPhoto
+        """
+        day = datetime.now().strftime('%Y%m%d')
+        pack_path = self.directory / (day + _PACK_SUFFIX)
+        index_path = self.directory / (day + _INDEX_SUFFIX)
+        mtime = time.time()
+
+        # 线程锁之外再持有文件锁：其他进程不会在确定偏移量和写入索引之间追加数据
+        with self._write_lock, _file_lock(self.directory / _LOCK_NAME):
+            with open(pack_path, 'ab', buffering=0) as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(data)
+                os.fsync(f.fileno())
+            self._append_index(index_path, f'{name}\t{offset}\t{len(data)}\t{mtime}\n')
+
+        entry = PackedPhoto(pack_path.name, offset, len(data), mtime)
+        with self._lock:
+            self._entries[name] = entry
+        return entry
+
+    def read(self, name):
+        """
+        读取照片内容
+
+        Returns:
+            bytes；不存在时返回None
+        """
+        entry = self.get(name)
+        if entry is None:
+            return None
+        end = entry.offset + entry.length
+        return self._mapped(entry.pack_name, end)[entry.offset:end]
+
+    def delete(self, name):
+        """在索引中追加删除标记（打包文件中的数据不回收）"""
+        with self._lock:
+            entry = self._entries.pop(name, None)
+        if entry is None:
+            return False
+        index_path = self.directory / (Path(entry.pack_name).stem + _INDEX_SUFFIX)
+        with self._write_lock, _file_lock(self.directory / _LOCK_NAME):
+            self._append_index(index_path, f'{name}\t0\t{_DELETED}\t{time.time()}\n')
+        return True
+
+    @staticmethod
+    def _append_index(index_path, line):
+        with open(index_path, 'a+b') as f:
+            # 上次写入中断留下不完整的行时先换行，避免与新记录连成一行
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    line = '\n' + line
+            f.write(line.encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _mapped(self, pack_name, end):
+        """
+        获取打包文件的只读映射（当天的打包文件继续增长时重新映射）
+
+        旧的映射不主动关闭：正在读取它的线程仍持有引用，读取完后自动释放
+        """
+        with self._lock:
+            mapped = self._maps.get(pack_name)
+            if mapped is None or len(mapped) < end:
+                with open(self.directory / pack_name, 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[pack_name] = mapped
+            return mapped
+
+
+@contextmanager
+def _file_lock(path):
+    """跨进程的排他文件锁（阻塞直到获得）"""
+    with open(path, 'a+b') as f:
+        if msvcrt is not None:
+            # 锁定文件的第一个字节；LK_LOCK 重试约10秒仍未获得时报错，继续等待
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+# 照片打包存储
+photo_pack = PhotoPackStore()
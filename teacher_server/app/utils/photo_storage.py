@@ -0,0 +1,339 @@
+"""
+照片存储后端
+照片原图统一通过 put / get / stream / delete / exists / stat 读写，按配置 PHOTO_STORAGE 选择后端：
+- 'files'：uploads/photos 下每张照片一个文件（默认）
+- 'pack'：按天追加写入打包文件（见 app/utils/photo_pack.py），启用前保存的单独文件仍可读取
+- 's3'：S3兼容的对象存储（AWS S3、MinIO等），多台服务器共用同一份照片；需要安装 boto3
+
+照片地址（/static/photos/<文件名>）不变，对象存储时重定向到预签名URL或配置的公开地址；
+PDF派生图和缩略图仍缓存在各服务器本机
+"""
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import quote
+import io
+import os
+import threading
+from werkzeug.utils import safe_join
+from app.utils.photo_pack import photo_pack
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # 未安装 boto3 时只能使用本机存储
+    boto3 = None
+
+    class ClientError(Exception):
+        pass
+
+# 初始化存储后端用到的配置项（批量PDF的工作进程用同样的配置初始化）
+STORAGE_SETTINGS = (
+    'PHOTO_STORAGE', 'UPLOAD_FOLDER', 'PHOTO_PACK_FOLDER',
+    'PHOTO_S3_BUCKET', 'PHOTO_S3_PREFIX', 'PHOTO_S3_ENDPOINT_URL', 'PHOTO_S3_REGION',
+    'PHOTO_S3_ACCESS_KEY', 'PHOTO_S3_SECRET_KEY', 'PHOTO_S3_REDIRECT',
+    'PHOTO_S3_PRESIGN_SECONDS', 'PHOTO_S3_PUBLIC_URL'
+)
+
+
+class LocalPhotoStorage:
+    """本机目录，每张照片一个文件"""
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+
+    def put(self, name, data):
+        """保存照片（先写临时文件再替换），返回字节数"""
+        self.folder.mkdir(parents=True, exist_ok=True)
+        path = self.folder / name
+        tmp_path = path.with_name(f'{name}.{os.getpid()}.tmp')
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    def get(self, name):
+        """读取照片内容，不存在时返回None"""
+        path = self.local_path(name)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def stream(self, name):
+        """打开照片用于读取（调用方负责关闭），不存在时返回None"""
+        path = self.local_path(name)
+        if path is None:
+            return None
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            return None
+
+    def delete(self, name):
+        """删除照片，返回照片原来是否存在"""
+        path = self.local_path(name)
+        if path is None:
+            return False
+        try:
+            os.unlink(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def exists(self, name):
+        return self.local_path(name) is not None
+
+    def stat(self, name):
+        """照片的 (字节数, 修改时间)，不存在时返回None"""
+        path = self.local_path(name)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime
+
+    def local_path(self, name):
+        """照片在本机的文件路径（可直接发送或交给反向代理），不存在时返回None"""
+        path = safe_join(str(self.folder), name)
+        if path is None or not os.path.isfile(path):
+            return None
+        return path
+
+    def url(self, name):
+        """本机存储不重定向"""
+        return None
+
+    def names(self):
+        """所有照片的文件名（包括写入中断留下的临时文件）"""
+        try:
+            with os.scandir(self.folder) as entries:
+                return [entry.name for entry in entries if entry.is_file()]
+        except FileNotFoundError:
+            return []
+
+
+class PackedPhotoStorage:
+    """按天打包存储；读取和删除时兼顾启用前保存的单独文件"""
+
+    def __init__(self, pack, files):
+        self.pack = pack
+        self.files = files
+
+    def put(self, name, data):
+        return self.pack.append(name, data).length
+
+    def get(self, name):
+        data = self.pack.read(name)
+        return data if data is not None else self.files.get(name)
+
+    def stream(self, name):
+        data = self.pack.read(name)
+        return io.BytesIO(data) if data is not None else self.files.stream(name)
+
+    def delete(self, name):
+        # 两处都删除（同名照片可能在启用打包存储前后各保存过一次）
+        deleted = self.pack.delete(name)
+        return self.files.delete(name) or deleted
+
+    def exists(self, name):
+        return self.pack.get(name) is not None or self.files.exists(name)
+
+    def stat(self, name):
+        entry = self.pack.get(name)
+        if entry is not None:
+            return entry.length, entry.mtime
+        return self.files.stat(name)
+
+    def local_path(self, name):
+        """只有单独保存的照片有本机路径"""
+        if self.pack.get(name) is not None:
+            return None
+        return self.files.local_path(name)
+
+    def url(self, name):
+        return None
+
+    def names(self):
+        return list(dict.fromkeys(self.pack.names() + self.files.names()))
+
+
+class S3PhotoStorage:
+    """
+    S3兼容的对象存储
+
+    照片按 <prefix><文件名> 保存；文件名唯一且内容不变，照片的 (字节数, 修改时间) 缓存在内存中，
+    生成缩略图、PDF派生图前检查照片时不必每次请求对象存储
+    """
+
+    _STAT_CACHE_SIZE = 10000
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, access_key=None,
+                 secret_key=None, redirect=True, presign_seconds=3600, public_url=None, client=None):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("照片存储配置为 's3'，但未安装 boto3（pip install boto3）")
+            client = boto3.client(
+                's3',
+                endpoint_url=endpoint_url,
+                region_name=region,
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key
+            )
+        if not bucket:
+            raise ValueError('未配置 PHOTO_S3_BUCKET')
+
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix or ''
+        self.redirect = redirect
+        self.presign_seconds = presign_seconds
+        self.public_url = public_url.rstrip('/') if public_url else None
+        # 重定向响应的浏览器缓存时间（预签名URL过期前）
+        self.url_max_age = None if self.public_url else presign_seconds // 2
+        self._stats = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, name):
+        return self.prefix + name
+
+    def put(self, name, data):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._key(name),
+            Body=data,
+            ContentType='image/jpeg',
+            CacheControl='public, max-age=31536000, immutable'
+        )
+        self._forget(name)
+        return len(data)
+
+    def get(self, name):
+        body = self.stream(name)
+        if body is None:
+            return None
+        try:
+            return body.read()
+        finally:
+            body.close()
+
+    def stream(self, name):
+        """对象内容的流（botocore StreamingBody，调用方负责关闭），不存在时返回None"""
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(name))['Body']
+        except ClientError as e:
+            if _is_not_found(e):
+                return None
+            raise
+
+    def delete(self, name):
+        """删除对象（对象存储的删除不区分是否存在，总是返回True）"""
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+        self._forget(name)
+        return True
+
+    def exists(self, name):
+        return self.stat(name) is not None
+
+    def stat(self, name):
+        with self._lock:
+            stat = self._stats.get(name)
+            if stat is not None:
+                self._stats.move_to_end(name)
+                return stat
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+        except ClientError as e:
+            if _is_not_found(e):
+                return None
+            raise
+
+        stat = (head['ContentLength'], head['LastModified'].timestamp())
+        with self._lock:
+            self._stats[name] = stat
+            while len(self._stats) > self._STAT_CACHE_SIZE:
+                self._stats.popitem(last=False)
+        return stat
+
+    def local_path(self, name):
+        return None
+
+    def url(self, name):
+        """浏览器直接访问的地址（公开地址或预签名URL）；配置为不重定向时返回None，由服务器转发内容"""
+        if not self.redirect:
+            return None
+        if self.public_url:
+            return f'{self.public_url}/{quote(self._key(name))}'
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self._key(name)},
+            ExpiresIn=self.presign_seconds
+        )
+
+    def names(self):
+        """逐页列出所有照片的文件名"""
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get('Contents', ()):
+                yield item['Key'][len(self.prefix):]
+
+    def _forget(self, name):
+        with self._lock:
+            self._stats.pop(name, None)
+
+
+def _is_not_found(error):
+    return error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+
+class PhotoStorage:
+    """当前使用的照片存储后端（按配置创建，方法调用转给后端）"""
+
+    def __init__(self):
+        self.backend = None
+        self.settings = {}
+
+    def init_app(self, app):
+        """按应用配置创建存储后端"""
+        self.configure({key: app.config.get(key) for key in STORAGE_SETTINGS})
+
+    def configure(self, settings):
+        """按配置项创建存储后端（也用于批量PDF的工作进程）"""
+        kind = settings.get('PHOTO_STORAGE') or 'files'
+        files = LocalPhotoStorage(settings['UPLOAD_FOLDER'])
+        if kind == 'files':
+            backend = files
+        elif kind == 'pack':
+            photo_pack.open(settings['PHOTO_PACK_FOLDER'])
+            backend = PackedPhotoStorage(photo_pack, files)
+        elif kind == 's3':
+            backend = S3PhotoStorage(
+                settings.get('PHOTO_S3_BUCKET'),
+                prefix=settings.get('PHOTO_S3_PREFIX'),
+                endpoint_url=settings.get('PHOTO_S3_ENDPOINT_URL'),
+                region=settings.get('PHOTO_S3_REGION'),
+                access_key=settings.get('PHOTO_S3_ACCESS_KEY'),
+                secret_key=settings.get('PHOTO_S3_SECRET_KEY'),
+                redirect=settings.get('PHOTO_S3_REDIRECT', True),
+                presign_seconds=settings.get('PHOTO_S3_PRESIGN_SECONDS') or 3600,
+                public_url=settings.get('PHOTO_S3_PUBLIC_URL')
+            )
+        else:
+            raise ValueError(f'不支持的照片存储方式: {kind}')
+
+        self.settings = settings
+        self.backend = backend
+
+    def __getattr__(self, name):
+        backend = self.__dict__.get('backend')
+        if backend is None:
+            raise RuntimeError('照片存储尚未初始化（需要先调用 init_app）')
+        return getattr(backend, name)
+
+
+# 照片存储
+photo_storage = PhotoStorage()
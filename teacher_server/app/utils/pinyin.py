@@ -0,0 +1,77 @@
+"""
+拼音首字母工具
+用于成员姓名的拼音首字母检索（如 "zs" → 张三）
+"""
+import re
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:  # 未安装 pypinyin 时退回到 GB2312 区位表
+    lazy_pinyin = None
+
+# GB2312 一级汉字按拼音排序，每个字母对应的起始区位码
+_GB2312_BOUNDARIES = [
+    (0xB0A1, 'a'), (0xB0C5, 'b'), (0xB2C1, 'c'), (0xB4EE, 'd'),
+    (0xB6EA, 'e'), (0xB7A2, 'f'), (0xB8C1, 'g'), (0xB9FE, 'h'),
+    (0xBBF7, 'j'), (0xBFA6, 'k'), (0xC0AC, 'l'), (0xC2E8, 'm'),
+    (0xC4C3, 'n'), (0xC5B6, 'o'), (0xC5BE, 'p'), (0xC6DA, 'q'),
+    (0xC8BB, 'r'), (0xC8F6, 's'), (0xCBFA, 't'), (0xCDDA, 'w'),
+    (0xCEF4, 'x'), (0xD1B9, 'y'), (0xD4D1, 'z'),
+]
+_GB2312_END = 0xD7F9
+
+_INITIALS_PATTERN = re.compile(r'^[a-z]+$')
+
+
+def _char_initial(char):
+    """获取单个字符的首字母（无法识别时返回空字符串）"""
+    if char.isascii():
+        return char.lower() if char.isalpha() else ''
+
+    try:
+        encoded = char.encode('gb2312')
+    except UnicodeEncodeError:
+        return ''
+    if len(encoded) != 2:
+        return ''
+
+    code = (encoded[0] << 8) + encoded[1]
+    if code < _GB2312_BOUNDARIES[0][0] or code > _GB2312_END:
+        return ''
+
+    initial = ''
+    for start, letter in _GB2312_BOUNDARIES:
+        if code < start:
+            break
+        initial = letter
+    return initial
+
+
+def get_name_initials(name):
+    """
+    计算姓名的拼音首字母（小写）
+
+    Args:
+        name: 姓名
+
+    Returns:
+        拼音首字母字符串，例如 "张三" → "zs"
+    """
+    if not name:
+        return ''
+
+    name = name.strip()
+    if lazy_pinyin is not None:
+        # 非汉字部分与退回方式的处理相同：保留英文字母，丢弃其他字符
+        letters = lazy_pinyin(
+            name, style=Style.FIRST_LETTER,
+            errors=lambda chars: [_char_initial(char) for char in chars]
+        )
+        return ''.join(letter.lower() for letter in letters if letter.isalpha())
+
+    return ''.join(_char_initial(char) for char in name)
+
+
+def is_initials_query(text):
+    """判断检索词是否为拼音首字母（纯英文字母）"""
+    return bool(text) and bool(_INITIALS_PATTERN.match(text.lower()))
@@ -0,0 +1,87 @@
+"""
+并发请求合并（single-flight）
+相同键的请求同时到达时只执行一次计算，其余请求等待并共享结果
+"""
+import threading
+
+
+class Flight:
+    """一次进行中的计算"""
+
+    def __init__(self):
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """等待计算完成，超时返回False"""
+        return self._done.wait(timeout)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+
+class SingleFlight:
+    """按键合并进行中的计算"""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key):
+        """
+        登记一次计算
+
+        Returns:
+            (Flight, 是否为执行者)；已有相同键的计算在进行时返回该计算，调用方应等待其完成
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = Flight()
+            self._flights[key] = flight
+            return flight, True
+
+    def finish(self, key, flight, result=None, error=None):
+        """结束计算并唤醒等待者（重复调用无副作用）"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if not flight.done:
+            flight.result = result
+            flight.error = error
+            flight._done.set()
+
+    def do(self, key, func, timeout=None):
+        """
+        执行或等待相同键的计算
+
+        Args:
+            key: 计算的键
+            func: 无参函数
+            timeout: 等待其他请求的最长秒数，超时后自行计算
+
+        Returns:
+            (结果, 是否共享了其他请求的结果)
+        """
+        flight, is_leader = self.begin(key)
+
+        if not is_leader:
+            if flight.wait(timeout):
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result, True
+            return func(), False
+
+        try:
+            result = func()
+        except BaseException as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result=result)
+        return result, False
+
+    def __len__(self):
+        return len(self._flights)
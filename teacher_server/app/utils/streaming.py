@@ -0,0 +1,108 @@
+"""
+流式输出工具
+将"写入文件对象"的生成过程（如 openpyxl 保存工作簿）转换为可迭代的字节块，
+用于 HTTP 流式响应，内存占用与文件大小无关
+"""
+import queue
+import threading
+
+_DONE = object()
+
+
+class _WriterError:
+    """后台写入线程中抛出的异常"""
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class _QueueWriter:
+    """
+    只支持顺序写入的文件对象，写入内容按块放入队列
+    （不提供 tell/seek，zipfile 会自动以流式模式写入）
+    """
+
+    def __init__(self, chunks, cancelled, chunk_size):
+        self._chunks = chunks
+        self._cancelled = cancelled
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+
+    def write(self, data):
+        if self._cancelled.is_set():
+            raise IOError('客户端已断开连接')
+        self._buffer += data
+        while len(self._buffer) >= self._chunk_size:
+            self._put(bytes(self._buffer[:self._chunk_size]))
+            del self._buffer[:self._chunk_size]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close_buffer(self):
+        """写入剩余内容"""
+        if self._buffer:
+            self._put(bytes(self._buffer))
+            self._buffer = bytearray()
+
+    def _put(self, item):
+        # 队列满时等待消费，客户端断开后立即停止
+        while not self._cancelled.is_set():
+            try:
+                self._chunks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise IOError('客户端已断开连接')
+
+
+def iter_writer(write_func, app=None, chunk_size=64 * 1024, max_chunks=16):
+    """
+    在后台线程中执行 write_func(fileobj)，逐块产出写入的内容
+
+    Args:
+        write_func: 接收一个可写文件对象的函数
+        app: Flask应用，提供时后台线程在应用上下文中执行（可访问数据库）
+        chunk_size: 每块字节数
+        max_chunks: 队列中最多缓存的块数（限制内存）
+
+    Yields:
+        bytes
+    """
+    chunks = queue.Queue(maxsize=max_chunks)
+    cancelled = threading.Event()
+    writer = _QueueWriter(chunks, cancelled, chunk_size)
+
+    def run():
+        try:
+            if app is not None:
+                with app.app_context():
+                    write_func(writer)
+            else:
+                write_func(writer)
+            writer.close_buffer()
+            item = _DONE
+        except BaseException as e:
+            item = _WriterError(e)
+
+        while not cancelled.is_set():
+            try:
+                chunks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = chunks.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _WriterError):
+                raise item.exc
+            yield item
+    finally:
+        cancelled.set()
@@ -22,9 +22,98 @@ class Config:
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB
     ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif'}
     
+    # 照片存储方式：'files' 每张照片一个文件；'pack' 按天追加写入打包文件（照片数量很多时减少小文件）；
+    # 's3' 保存到S3兼容的对象存储（AWS S3、MinIO等，多台服务器共用，需要安装 boto3）
+    PHOTO_STORAGE = os.environ.get('PHOTO_STORAGE') or 'files'
+    PHOTO_PACK_FOLDER = BASE_DIR / 'uploads' / 'packs'
+    
+    # S3兼容对象存储：桶、对象键前缀、服务地址（MinIO 如 'http://127.0.0.1:9000'，AWS S3 留空）、区域和访问密钥
+    PHOTO_S3_BUCKET = os.environ.get('PHOTO_S3_BUCKET')
+    PHOTO_S3_PREFIX = os.environ.get('PHOTO_S3_PREFIX', 'photos/')
+    PHOTO_S3_ENDPOINT_URL = os.environ.get('PHOTO_S3_ENDPOINT_URL')
+    PHOTO_S3_REGION = os.environ.get('PHOTO_S3_REGION')
+    PHOTO_S3_ACCESS_KEY = os.environ.get('PHOTO_S3_ACCESS_KEY')
+    PHOTO_S3_SECRET_KEY = os.environ.get('PHOTO_S3_SECRET_KEY')
+    
+    # 照片请求重定向到对象存储（False 时由服务器读取后转发）：
+    # 配置了 PHOTO_S3_PUBLIC_URL（公开读的桶或CDN地址）时重定向到该地址，否则重定向到有效期 PHOTO_S3_PRESIGN_SECONDS 秒的预签名URL
+    PHOTO_S3_REDIRECT = True
+    PHOTO_S3_PRESIGN_SECONDS = 3600
+    PHOTO_S3_PUBLIC_URL = os.environ.get('PHOTO_S3_PUBLIC_URL')
+    
+    # 孤立照片回收：没有数据库记录引用的照片只报告（report）、移入隔离目录（quarantine）或删除（delete）
+    # 照片按文件名分为 PHOTO_GC_SHARDS 片，每 PHOTO_GC_INTERVAL_SECONDS 秒处理一片（默认0：不定时运行，需要时手动开启）；
+    # 最近 PHOTO_GC_GRACE_SECONDS 秒内写入的文件跳过；孤立照片占比超过 PHOTO_GC_MAX_ORPHAN_RATIO 时只报告不处理
+    PHOTO_GC_MODE = 'report'
+    PHOTO_GC_INTERVAL_SECONDS = 0
+    PHOTO_GC_SHARDS = 24
+    PHOTO_GC_GRACE_SECONDS = 3600
+    PHOTO_GC_WORKERS = 4
+    PHOTO_GC_MAX_ORPHAN_RATIO = 0.5
+    PHOTO_GC_QUARANTINE_FOLDER = BASE_DIR / 'uploads' / 'orphans'
+    
     # 分页配置
     ITEMS_PER_PAGE = 20
     
+    # 响应缓存配置（列表页、学生列表/详情API）
+    RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024  # 32MB
+    
+    # 导出文件缓存（按筛选条件、格式和数据版本缓存，超出预算时按LRU淘汰）
+    CACHE_FOLDER = BASE_DIR / 'cache'
+    EXPORT_CACHE_FOLDER = CACHE_FOLDER / 'exports'
+    EXPORT_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512MB
+    
+    # PDF报告缓存（按 submission_id + updated_at 缓存，超出预算时按LRU淘汰）
+    PDF_CACHE_FOLDER = CACHE_FOLDER / 'pdfs'
+    PDF_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256MB
+    
+    # 提交后在后台预先生成PDF报告（最后一次提交后等待的秒数）
+    PDF_PRERENDER = False
+    PDF_PRERENDER_DELAY_SECONDS = 30
+    
+    # PDF报告中嵌入的照片：缩小副本的最长边（像素）和JPEG质量
+    PDF_PHOTO_MAX_SIZE = 800
+    PDF_PHOTO_QUALITY = 75
+    
+    # 照片缩略图：可用的尺寸（最长边像素，请求的尺寸向上取整）、JPEG质量和磁盘缓存
+    THUMBNAIL_SIZES = (200, 400, 800)
+    THUMBNAIL_QUALITY = 80
+    THUMB_CACHE_FOLDER = CACHE_FOLDER / 'thumbs'
+    THUMB_CACHE_MAX_BYTES = 128 * 1024 * 1024  # 128MB
+    
+    # 照片和缩略图的浏览器缓存时间（文件名唯一，内容不会变化）
+    PHOTO_CACHE_MAX_AGE = 365 * 24 * 3600
+    
+    # 部署在反向代理后时由代理发送照片文件：
+    # nginx 设置 PHOTO_X_ACCEL_PREFIX 为指向 uploads/photos 的 internal location（如 '/protected-photos/'）；
+    # Apache/lighttpd 设置 USE_X_SENDFILE = True（Flask内置）
+    PHOTO_X_ACCEL_PREFIX = None
+    
+    # 相同导出正在生成时，后到的请求最多等待的秒数（超时后自行生成）
+    EXPORT_WAIT_SECONDS = 120
+    
+    # 后台导出任务：线程数、最多同时排队/执行的任务数、完成后保留任务信息的秒数
+    EXPORT_JOB_WORKERS = 2
+    EXPORT_JOB_MAX_PENDING = 20
+    EXPORT_JOB_TTL_SECONDS = 3600
+    
+    # JSONL分片导出：每个分片的默认字节上限（未压缩）和估算token上限（0表示不限）、并行压缩线程数
+    EXPORT_SHARD_MAX_BYTES = 8 * 1024 * 1024  # 8MB
+    EXPORT_SHARD_MAX_TOKENS = 0
+    EXPORT_SHARD_WORKERS = 4
+    
+    # 数据变更日志保留：超过天数或超出条数的旧变更定期清理（0表示不限），清理间隔（秒）
+    # 下游拉取的游标早于已清理的变更时需要重新全量同步
+    CHANGE_LOG_RETENTION_DAYS = 30
+    CHANGE_LOG_MAX_ROWS = 200000
+    CHANGE_LOG_PRUNE_INTERVAL_SECONDS = 3600
+    
+    # 批量PDF报告的工作进程数（None表示按CPU核数，最多4个）
+    PDF_BATCH_WORKERS = None
+    
+    # 实时推送（SSE）心跳间隔（秒）
+    LIVE_KEEPALIVE_SECONDS = 15
+    
     # 日志配置
     LOG_FILE = BASE_DIR / 'logs' / 'app.log'
     LOG_LEVEL = 'INFO'
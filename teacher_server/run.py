@@ -1,25 +1,31 @@
 """
 启动脚本
+
+创建应用和启动服务器都放在 __main__ 中：批量PDF的工作进程（Windows 和打包后的可执行文件使用 spawn 方式启动）
+会重新导入本模块，不能在导入时创建应用（建表、后台线程池、定时任务）
 """
 import os
-from app import create_app
+import sys
+import multiprocessing
 
-# 获取环境变量
-config_name = os.environ.get('FLASK_ENV', 'development')
 
-# 创建应用
-app = create_app(config_name)
+def main():
+    from app import create_app
+
+    # 获取环境变量
+    config_name = os.environ.get('FLASK_ENV', 'development')
+
+    # 创建应用
+    app = create_app(config_name)
 
-if __name__ == '__main__':
     # 判断是否为打包后的可执行文件
-    import sys
     if getattr(sys, 'frozen', False):
         # 打包后的可执行文件
         debug_mode = False
     else:
         # 开发环境
         debug_mode = True
-    
+
     # 运行应用
     app.run(
         host='0.0.0.0',
@@ -27,3 +33,8 @@ if __name__ == '__main__':
         debug=debug_mode
     )
 
+
+if __name__ == '__main__':
+    # 打包后的可执行文件中启动的工作进程在这里接管执行，必须在创建应用之前调用
+    multiprocessing.freeze_support()
+    main()
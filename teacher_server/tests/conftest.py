@@ -0,0 +1,60 @@
+"""
+测试公共夹具
+每个测试使用独立的临时数据库和照片目录，不影响项目目录中的数据
+"""
+import base64
+import io
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DEV_DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    upload_folder = tmp_path / 'photos'
+    upload_folder.mkdir()
+
+    # 服务模块通过 config.Config 读取照片目录
+    import config
+    monkeypatch.setattr(config.Config, 'UPLOAD_FOLDER', upload_folder)
+
+    from app import create_app
+    from app.utils.photo_storage import photo_storage
+    from app.services.photo_gc_service import photo_reconciler
+
+    app = create_app('development')
+    app.config.update(
+        TESTING=True,
+        UPLOAD_FOLDER=upload_folder,
+        PHOTO_GC_QUARANTINE_FOLDER=tmp_path / 'orphans'
+    )
+    photo_storage.init_app(app)
+    photo_reconciler.init_app(app)
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def jpeg_base64(color=(200, 30, 30)):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffer, 'JPEG')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def make_payload(names=('张三', '李四'), class_number='3', photo=None):
+    """一次小组提交（任务一带一张照片）"""
+    return {
+        'studentInfo': {
+            'school': '一中', 'grade': '高一', 'classNumber': class_number, 'date': '2026-10-19',
+            'memberCount': len(names), 'memberNames': list(names), 'groupNumber': 1
+        },
+        'task1': {'teaName': '龙井', 'photos': [photo or jpeg_base64()]}
+    }
@@ -0,0 +1,54 @@
+"""
+数据变更日志：保留期限清理和过旧游标
+"""
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import ChangeLog
+from app.services.change_service import get_latest_cursor, prune_change_log
+from conftest import make_payload
+
+
+def _submit(client, count):
+    for index in range(count):
+        client.post('/api/submit', json=make_payload(names=(f'学生{index}',), class_number=str(index)))
+
+
+def test_prune_by_max_rows_keeps_latest(app, client):
+    _submit(client, 3)
+    with app.app_context():
+        latest = get_latest_cursor()
+        assert prune_change_log(max_rows=2) > 0
+        assert ChangeLog.query.count() == 2
+        assert get_latest_cursor() == latest
+
+
+def test_prune_by_age_keeps_latest(app, client):
+    """全部变更都过期时仍保留最新一条（数据版本号不回退）"""
+    _submit(client, 2)
+    with app.app_context():
+        latest = get_latest_cursor()
+        ChangeLog.query.update({ChangeLog.changed_at: datetime.utcnow() - timedelta(days=60)})
+        db.session.commit()
+
+        prune_change_log(retention_days=30)
+        assert [row.id for row in ChangeLog.query.all()] == [latest]
+
+
+def test_stale_cursor_rejected(app, client):
+    _submit(client, 3)
+    response = client.get('/api/changes?since=0')
+    assert response.status_code == 200
+    first_cursor = response.get_json()['data'][0]['cursor']
+
+    with app.app_context():
+        prune_change_log(max_rows=2)
+        latest = get_latest_cursor()
+
+    response = client.get(f'/api/changes?since={first_cursor}')
+    assert response.status_code == 410
+    assert response.get_json()['latest_cursor'] == latest
+
+    # 从最新游标继续拉取不受影响
+    assert client.get(f'/api/changes?since={latest - 1}').status_code == 200
+    assert client.get(f'/api/changes?since={latest}').get_json()['data'] == []
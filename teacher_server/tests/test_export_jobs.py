@@ -0,0 +1,122 @@
+"""
+后台导出任务：缓存键中的数据版本
+"""
+from app.services import job_service
+from app.services.change_service import get_latest_cursor
+from app.services.job_service import job_manager, DONE
+from app.utils.disk_cache import export_cache
+from conftest import make_payload
+
+
+def test_export_job_keys_cache_by_data_at_start(app, client, tmp_path, monkeypatch):
+    """排队期间又有提交时，导出文件按开始生成时的数据版本缓存"""
+    export_cache.init_app(tmp_path / 'exports', 64 * 1024 * 1024)
+    client.post('/api/submit', json=make_payload())
+
+    # 提交后先不执行，模拟任务在线程池中排队
+    queued = []
+    monkeypatch.setattr(job_manager._executor, 'submit', lambda *args: queued.append(args))
+    with app.app_context():
+        job, error = job_manager.submit_export('csv')
+        assert error is None
+        submitted_cursor = job.cache_key[5]
+
+    client.post('/api/submit', json=make_payload(names=('王五',), class_number='4'))
+
+    fn, job, runner = queued[0]
+    fn(job, runner)
+    assert job.status == DONE
+
+    with app.app_context():
+        latest_cursor = get_latest_cursor()
+    assert latest_cursor != submitted_cursor
+    assert job.cache_key[5] == latest_cursor
+    assert export_cache.get(job.cache_key, job.suffix) is not None
+    assert job not in job_manager._active.values()
+
+
+def _queue_jobs(monkeypatch):
+    """提交的任务先不执行，由测试逐个运行"""
+    queued = []
+    monkeypatch.setattr(job_manager._executor, 'submit', lambda *args: queued.append(args))
+    return queued
+
+
+def _during_export(monkeypatch, action):
+    """导出第一个小组时执行一次 action"""
+    counting = job_service._counting
+    pending = [action]
+
+    def hooked(job, rows):
+        for row in counting(job, rows):
+            if pending:
+                pending.pop()()
+            yield row
+
+    monkeypatch.setattr(job_service, '_counting', hooked)
+
+
+def test_export_job_not_cached_when_data_changes_during_export(app, client, tmp_path, monkeypatch):
+    """生成期间又有提交时，文件只供本任务下载，不按数据版本缓存"""
+    export_cache.init_app(tmp_path / 'exports', 64 * 1024 * 1024)
+    client.post('/api/submit', json=make_payload())
+    queued = _queue_jobs(monkeypatch)
+    _during_export(monkeypatch, lambda: client.post('/api/submit', json=make_payload(names=('王五',))))
+
+    with app.app_context():
+        job, _ = job_manager.submit_export('csv')
+        versioned_key = job.cache_key
+    fn, job, runner = queued[0]
+    fn(job, runner)
+
+    assert job.status == DONE
+    assert job.cache_key == ('export_job', job.id)
+    assert export_cache.get(versioned_key, job.suffix) is None
+    assert client.get(f'/api/jobs/{job.id}/download').status_code == 200
+
+
+def test_running_export_job_found_by_start_key(app, client, tmp_path, monkeypatch):
+    """任务开始时更换了缓存键，相同内容的新请求仍返回进行中的任务"""
+    export_cache.init_app(tmp_path / 'exports', 64 * 1024 * 1024)
+    client.post('/api/submit', json=make_payload())
+    queued = _queue_jobs(monkeypatch)
+
+    with app.app_context():
+        job, _ = job_manager.submit_export('csv')
+    client.post('/api/submit', json=make_payload(names=('王五',)))
+
+    resubmitted = []
+    _during_export(monkeypatch, lambda: resubmitted.append(job_manager.submit_export('csv')[0]))
+    fn, job, runner = queued[0]
+    fn(job, runner)
+
+    assert resubmitted == [job]
+    assert len(queued) == 1
+
+
+def test_jsonl_shards_use_configured_defaults(app, client, tmp_path, monkeypatch):
+    """分片参数未指定时取自配置（流式导出与后台任务相同）"""
+    import io
+    import json
+    import zipfile
+
+    export_cache.init_app(tmp_path / 'exports', 64 * 1024 * 1024)
+    for index in range(3):
+        client.post('/api/submit', json=make_payload(names=(f'学生{index}',), class_number=str(index)))
+    app.config.update(EXPORT_SHARD_MAX_BYTES=1, EXPORT_SHARD_WORKERS=1)
+
+    def shard_count(data):
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            return len(json.loads(zf.read('manifest.json'))['shards'])
+
+    # 每个分片最多1字节：每个小组独占一个分片
+    assert shard_count(client.get('/export/jsonl-shards').data) == 3
+
+    # 清空缓存，后台任务重新生成
+    export_cache.clear()
+    queued = _queue_jobs(monkeypatch)
+    assert client.post('/api/jobs', json={'type': 'jsonl_shards'}).status_code in (200, 202)
+    fn, job, runner = queued[0]
+    fn(job, runner)
+    assert job.status == DONE
+    assert shard_count(client.get(f'/api/jobs/{job.id}/download').data) == 3
@@ -0,0 +1,38 @@
+"""
+导出数据分批加载：跨批次保持导出顺序
+"""
+from app.models import StudentGroup
+from app.services.export_loader import iter_export_groups, iter_export_rows
+from conftest import make_payload
+
+
+def _submit(client, names, group_number, class_number):
+    payload = make_payload(names=names, class_number=class_number)
+    payload['studentInfo']['groupNumber'] = group_number
+    client.post('/api/submit', json=payload)
+
+
+def test_chunks_follow_export_order(app, client):
+    """编号升序（未编号即编号为0的排最后）、同编号按提交时间降序，分批读取时顺序不变"""
+    for index, group_number in enumerate([3, 1, 0, 2, 1, 3, 0]):
+        # 各小组在不同班级，同编号的提交不会合并
+        _submit(client, (f'学生{index}',), group_number, str(index))
+
+    with app.app_context():
+        groups = StudentGroup.query.all()
+        assert len(groups) == 7
+        expected = [
+            group.id for group in sorted(
+                groups,
+                key=lambda group: (
+                    group.group_number if group.group_number is not None else 999999,
+                    -group.submit_time.timestamp(),
+                    -group.id
+                )
+            )
+        ]
+
+        assert [group.id for group in iter_export_groups(chunk_size=2)] == expected
+        rows = list(iter_export_rows(chunk_size=3))
+        assert [row.id for row in rows] == expected
+        assert all(len(row.members) == 1 for row in rows)
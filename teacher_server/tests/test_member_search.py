@@ -0,0 +1,34 @@
+"""
+成员检索：旧数据库启动时自动升级
+"""
+from sqlalchemy import text
+
+from app import db
+from conftest import make_payload
+
+
+def _search(client, keyword):
+    return [item['member_name'] for item in client.get(f'/api/members/search?q={keyword}').get_json()['data']]
+
+
+def test_search_by_name_prefix_and_initials(client):
+    client.post('/api/submit', json=make_payload(names=('张三', '张三丰', '李四')))
+
+    assert _search(client, '张三') == ['张三', '张三丰']
+    assert _search(client, 'zs') == ['张三', '张三丰']
+
+
+def test_old_database_upgraded_at_startup(app, client):
+    """缺少 name_initials 字段的旧数据库：启动时添加字段并回填"""
+    client.post('/api/submit', json=make_payload(names=('张三', '李四')))
+    with app.app_context():
+        db.session.execute(text('DROP INDEX ix_group_members_name_initials'))
+        db.session.execute(text('ALTER TABLE group_members DROP COLUMN name_initials'))
+        db.session.commit()
+        db.engine.dispose()
+
+    from app import create_app
+    upgraded = create_app('development').test_client()
+
+    assert _search(upgraded, '张三') == ['张三']
+    assert _search(upgraded, 'ls') == ['李四']
@@ -0,0 +1,101 @@
+"""
+照片文件与数据库事务同步：重新提交替换照片、事务回滚
+"""
+import os
+
+from app import db
+from app.services import data_service
+from app.models import Photo, StudentGroup
+from app.services.photo_service import save_photo_from_base64
+from app.utils.photo_storage import photo_storage
+from conftest import jpeg_base64, make_payload
+
+
+def _photo_names(app):
+    with app.app_context():
+        return {photo.file_name for photo in Photo.query.all()}
+
+
+def test_resubmit_replaces_photo_files(app, client):
+    """同一秒内重新提交：新照片保留，旧照片在提交后删除"""
+    response = client.post('/api/submit', json=make_payload())
+    submission_id = response.get_json()['submissionId']
+    old_names = _photo_names(app)
+
+    payload = make_payload(photo=jpeg_base64((30, 200, 30)))
+    payload['submissionId'] = submission_id
+    response = client.post('/api/submit', json=payload)
+    assert response.status_code == 200
+
+    new_names = _photo_names(app)
+    assert len(new_names) == 1
+    assert new_names.isdisjoint(old_names)
+
+    upload_folder = app.config['UPLOAD_FOLDER']
+    for name in new_names:
+        assert (upload_folder / name).is_file()
+        assert client.get(f'/static/photos/{name}').status_code == 200
+    for name in old_names:
+        assert not (upload_folder / name).exists()
+
+
+def test_resubmit_replaces_packed_photos(app, client, tmp_path):
+    """打包存储：旧照片追加删除标记，新照片仍可读取"""
+    app.config.update(PHOTO_STORAGE='pack', PHOTO_PACK_FOLDER=tmp_path / 'packs')
+    photo_storage.init_app(app)
+
+    response = client.post('/api/submit', json=make_payload())
+    payload = make_payload(photo=jpeg_base64((30, 200, 30)))
+    payload['submissionId'] = response.get_json()['submissionId']
+    old_names = _photo_names(app)
+    client.post('/api/submit', json=payload)
+
+    new_names = _photo_names(app)
+    assert new_names.isdisjoint(old_names)
+    for name in new_names:
+        assert photo_storage.exists(name)
+    for name in old_names:
+        assert not photo_storage.exists(name)
+
+
+def test_rollback_removes_written_files(app, client):
+    client.post('/api/submit', json=make_payload())
+    upload_folder = app.config['UPLOAD_FOLDER']
+
+    with app.app_context():
+        group = StudentGroup.query.first()
+        photo = save_photo_from_base64(jpeg_base64(), group.id, 'task2', 0, group.submission_id)
+        assert (upload_folder / photo.file_name).is_file()
+        db.session.rollback()
+
+    assert not (upload_folder / photo.file_name).exists()
+    assert len(os.listdir(upload_folder)) == 1
+
+
+def test_delete_removes_files_after_commit(app, client):
+    submission_id = client.post('/api/submit', json=make_payload()).get_json()['submissionId']
+    names = _photo_names(app)
+
+    with app.app_context():
+        assert data_service.delete_student_data(submission_id)[0]
+
+    upload_folder = app.config['UPLOAD_FOLDER']
+    for name in names:
+        assert not (upload_folder / name).exists()
+
+
+def test_failed_delete_keeps_files(app, client, monkeypatch):
+    """删除失败（回滚）时照片记录和文件都保留"""
+    submission_id = client.post('/api/submit', json=make_payload()).get_json()['submissionId']
+    names = _photo_names(app)
+
+    def fail(*args):
+        raise RuntimeError('统计刷新失败')
+
+    monkeypatch.setattr(data_service, 'refresh_class_stats', fail)
+    with app.app_context():
+        assert not data_service.delete_student_data(submission_id)[0]
+
+    assert _photo_names(app) == names
+    for name in names:
+        assert client.get(f'/static/photos/{name}').status_code == 200
@@ -0,0 +1,101 @@
+"""
+孤立照片回收
+"""
+import os
+import time
+
+import pytest
+
+from app.services.photo_gc_service import photo_reconciler
+from app.utils.photo_storage import photo_storage
+from conftest import make_payload
+
+_OLD = time.time() - 2 * 3600
+
+
+def _write(path, mtime=_OLD):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'\xff\xd8test')
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def photos(app, client):
+    """两个小组的照片（数据库中有记录）"""
+    client.post('/api/submit', json=make_payload(('张三', '李四')))
+    client.post('/api/submit', json=make_payload(('王五', '赵六')))
+    names = photo_storage.names()
+    assert len(names) == 2
+    photo_reconciler.max_orphan_ratio = 1.0
+    return names
+
+
+def _run(app, mode):
+    with app.app_context():
+        return photo_reconciler.run(mode=mode, full=True)
+
+
+def test_not_scheduled_by_default(app):
+    assert photo_reconciler.interval == 0
+    assert photo_reconciler.mode == 'report'
+    assert photo_reconciler._timer is None
+
+
+def test_report_mode_touches_nothing(app, photos):
+    upload_folder = app.config['UPLOAD_FOLDER']
+    orphan = _write(upload_folder / 'orphan_1.jpg')
+
+    report = _run(app, 'report')
+
+    assert report['orphans'] == ['orphan_1.jpg']
+    assert orphan.exists()
+    assert all(photo_storage.exists(name) for name in photos)
+
+
+def test_quarantine_moves_only_old_orphans(app, photos):
+    upload_folder = app.config['UPLOAD_FOLDER']
+    orphan = _write(upload_folder / 'orphan_1.jpg')
+    recent = _write(upload_folder / 'orphan_2.jpg', mtime=time.time())
+    derivative = _write(upload_folder / 'pdf' / 'orphan_1_800.jpg')
+    kept_derivative = _write(upload_folder / 'pdf' / f'{photos[0][:-4]}_800.jpg')
+
+    report = _run(app, 'quarantine')
+
+    assert report['orphan_count'] == 1
+    assert report['skipped_recent'] == 1
+    assert not orphan.exists()
+    assert list((app.config['PHOTO_GC_QUARANTINE_FOLDER']).glob('*/orphan_1.jpg'))
+    assert recent.exists()
+    assert not derivative.exists()
+    assert kept_derivative.exists()
+    assert all(photo_storage.exists(name) for name in photos)
+
+
+def test_missing_files_are_reported(app, photos):
+    (app.config['UPLOAD_FOLDER'] / photos[0]).unlink()
+
+    report = _run(app, 'delete')
+
+    assert report['missing'] == [photos[0]]
+    assert photo_storage.exists(photos[1])
+
+
+def test_aborts_when_most_photos_look_orphaned(app, photos):
+    upload_folder = app.config['UPLOAD_FOLDER']
+    orphans = [_write(upload_folder / f'orphan_{index}.jpg') for index in range(20)]
+    photo_reconciler.max_orphan_ratio = 0.5
+
+    report = _run(app, 'delete')
+
+    assert report['aborted']
+    assert all(path.exists() for path in orphans)
+
+
+def test_incremental_run_covers_one_shard(app, photos):
+    with app.app_context():
+        first = photo_reconciler.run()
+        second = photo_reconciler.run()
+
+    assert len(first['shards']) == 1
+    assert second['shards'] == [(first['shards'][0] + 1) % photo_reconciler.shards]
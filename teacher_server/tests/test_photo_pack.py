@@ -0,0 +1,34 @@
+"""
+照片打包存储：多个进程同时追加
+"""
+import multiprocessing
+
+from app.utils.photo_pack import PhotoPackStore
+
+
+def _append_photos(directory, worker, count):
+    pack = PhotoPackStore()
+    pack.open(directory)
+    for index in range(count):
+        pack.append(f'{worker}_{index}.jpg', bytes([worker]) * (1000 + index * 37))
+
+
+def test_concurrent_appends_from_processes(tmp_path):
+    """各进程记录的偏移量都指向自己写入的数据"""
+    workers, count = 4, 50
+    processes = [
+        multiprocessing.Process(target=_append_photos, args=(tmp_path, worker, count))
+        for worker in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    pack = PhotoPackStore()
+    pack.open(tmp_path)
+    assert len(pack) == workers * count
+    for worker in range(workers):
+        for index in range(count):
+            assert pack.read(f'{worker}_{index}.jpg') == bytes([worker]) * (1000 + index * 37)
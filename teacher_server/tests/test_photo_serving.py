@@ -0,0 +1,43 @@
+"""
+照片访问：长期缓存、条件请求、照片被删除
+"""
+from app.utils.photo_storage import photo_storage
+from conftest import make_payload
+
+
+def _submit_packed(app, client, tmp_path):
+    app.config.update(PHOTO_STORAGE='pack', PHOTO_PACK_FOLDER=tmp_path / 'packs')
+    photo_storage.init_app(app)
+    client.post('/api/submit', json=make_payload())
+    return photo_storage.names()[0]
+
+
+def test_photo_is_cached_and_revalidated(app, client):
+    client.post('/api/submit', json=make_payload())
+    name = photo_storage.names()[0]
+
+    response = client.get(f'/static/photos/{name}')
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
+    etag = response.headers['ETag']
+    response.close()
+
+    response = client.get(f'/static/photos/{name}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+def test_packed_photo_range(app, client, tmp_path):
+    name = _submit_packed(app, client, tmp_path)
+    data = photo_storage.get(name)
+
+    response = client.get(f'/static/photos/{name}', headers={'Range': 'bytes=0-9'})
+    assert response.status_code == 206
+    assert response.data == data[:10]
+
+
+def test_photo_deleted_after_stat_is_404(app, client, tmp_path, monkeypatch):
+    name = _submit_packed(app, client, tmp_path)
+    monkeypatch.setattr(photo_storage.backend, 'get', lambda file_name: None)
+
+    response = client.get(f'/static/photos/{name}')
+    assert response.status_code == 404
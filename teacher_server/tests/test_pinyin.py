@@ -0,0 +1,27 @@
+"""
+姓名拼音首字母：pypinyin 与 GB2312 退回方式结果一致
+"""
+import pytest
+
+from app.utils import pinyin
+from app.utils.pinyin import get_name_initials
+
+NAMES = [
+    ('张三', 'zs'),
+    ('Tom李', 'toml'),
+    ('欧阳 Na-na', 'oynana'),
+    ('艾力·买买提', 'almmt'),
+    ('李Amy·Ｂ', 'lamy'),
+    ('123', ''),
+]
+
+
+@pytest.mark.parametrize('name, initials', NAMES)
+def test_name_initials(name, initials):
+    assert get_name_initials(name) == initials
+
+
+@pytest.mark.parametrize('name, initials', NAMES)
+def test_name_initials_without_pypinyin(name, initials, monkeypatch):
+    monkeypatch.setattr(pinyin, 'lazy_pinyin', None)
+    assert get_name_initials(name) == initials
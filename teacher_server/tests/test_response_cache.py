@@ -0,0 +1,21 @@
+"""
+响应缓存：数据版本取自数据库
+"""
+from app import db
+from app.models import StudentGroup
+from conftest import make_payload
+
+
+def test_cache_invalidated_by_write_from_other_process(app, client):
+    """其他进程（不经过本进程的计数器）提交的数据也使缓存失效"""
+    submission_id = client.post('/api/submit', json=make_payload()).get_json()['submissionId']
+    url = f'/api/students/{submission_id}'
+    assert client.get(url).get_json()['data']['school'] == '一中'
+
+    # 直接通过会话修改并提交，不调用 data_version.bump()，相当于另一台服务器写入
+    with app.app_context():
+        group = StudentGroup.query.filter_by(submission_id=submission_id).one()
+        group.school = '二中'
+        db.session.commit()
+
+    assert client.get(url).get_json()['data']['school'] == '二中'